@@ -0,0 +1,271 @@
+# ==========================================================================================
+# BATCH RUNNER
+# ==========================================================================================
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import signal
+import statistics
+import sys
+import time
+
+from s_cache import CompileCache
+from s_compiler import MEMOIZE, OPTIMIZATION_LEVEL, optimizeScript, parseScript
+from s_interpreter import Interpreter
+from s_lexer import SadeqLexer
+from s_parser import SadeqParser
+
+'''
+runs many scripts at once on a pool of worker processes, one per core by
+default, instead of one script per run of s_compiler.py
+
+every worker builds its lexer and parser and runs a small script through
+every phase once before it takes any work, so the parse tables and the
+engines are loaded once per worker and not once per script
+
+the output of every script is captured on its own, stdout and stderr
+together, and written next to the others under --out when it is given.
+a script that runs longer than --timeout seconds is stopped by a timer of
+its worker, one that prints more than --max-output characters is stopped
+too. the timer needs setitimer, where python has none scripts run to the end
+
+python s_batch.py INPUT --workers 8 --timeout 10 --out OUTPUT/batch
+python s_batch.py "nightly/**/*.sa" --json results.json
+
+a script ends as one of
+    ok          ran to the end
+    error       stopped by an error of the language, which exits
+    syntax      had syntax errors, what the parser recovered still ran
+    timeout     ran out of time
+    output      printed more than the cap
+    crash       raised a python exception, its name is kept
+'''
+
+EXTENSION = '.sa'
+
+# cores used when --workers is not given
+WORKERS = os.cpu_count() or 1
+
+# seconds a script may run, 0 never stops it
+TIMEOUT = 10.0
+
+# characters a script may print before it is stopped
+MAX_OUTPUT = 1 << 20
+
+WARM_UP = '''
+function f(n) { if n < 2 { return n } return f(n - 1) + f(n - 2) }
+L = []
+for i = 0 to 10 { push(L, f(i)) }
+foreach x in L { s = x }
+print(len(L))
+'''
+
+
+class ScriptTimeout(BaseException):
+    pass
+
+
+class OutputLimit(BaseException):
+    pass
+
+
+# a StringIO that stops the script once it holds more than limit characters
+class CappedOutput(io.StringIO):
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+        if self.size > self.limit:
+            super().write(text[:max(0, self.limit - self.size + len(text))])
+            raise OutputLimit()
+        return super().write(text)
+
+
+# =================================================================
+# FINDING SCRIPTS
+# =================================================================
+# the scripts of directories, searched recursively, and glob patterns, sorted and without repeats
+def findScripts(sources):
+    found = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for folder, _, files in os.walk(source):
+                found.update(os.path.join(folder, name) for name in files if name.endswith(EXTENSION))
+        else:
+            found.update(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    return sorted(found)
+
+
+# the folder the output files mirror the scripts from
+def commonRoot(paths):
+    if not paths:
+        return '.'
+    root = os.path.commonpath([os.path.abspath(path) for path in paths])
+    return root if len(paths) > 1 else os.path.dirname(root)
+
+
+# =================================================================
+# WORKERS
+# =================================================================
+# state of the worker process, set by startWorker
+worker = {}
+
+
+def startWorker(options):
+    # the pool owns interrupts, a worker only stops when it is told to
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, timedOut)
+
+    worker.update(options)
+    worker['lexer'] = SadeqLexer()
+    worker['parser'] = SadeqParser()
+    worker['cache'] = CompileCache() if options['cache'] else None
+
+    tree = worker['parser'].parse(worker['lexer'].tokenize(WARM_UP))
+    with contextlib.redirect_stdout(io.StringIO()):
+        Interpreter(tree, {}, mode=options['mode'])
+
+
+def timedOut(signum, frame):
+    raise ScriptTimeout()
+
+
+def runScript(path):
+    output = CappedOutput(worker['maxOutput'])
+    timeout = worker['timeout'] if hasattr(signal, 'setitimer') else 0
+    parser = worker['parser']
+    status, crash = 'ok', None
+
+    start = time.perf_counter()
+    clock = time.process_time()
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                tree, table, key = parseScript(path, worker['lexer'], parser, worker['cache'])
+                if parser.errors:
+                    status = 'syntax'
+                tree, _, positions = optimizeScript(tree, table, worker['level'], worker['cache'], key)
+                Interpreter(tree, {}, mode=worker['mode'], memoize=worker['memoize'], positions=positions)
+            finally:
+                if timeout:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+    except SystemExit:
+        status = 'syntax' if status == 'syntax' else 'error'
+    except ScriptTimeout:
+        status = 'timeout'
+    except OutputLimit:
+        status = 'output'
+    except Exception as e:
+        status, crash = 'crash', type(e).__name__
+    seconds = time.perf_counter() - start
+    cpu = time.process_time() - clock
+
+    text = output.getvalue()
+    if worker['out']:
+        name = os.path.join(worker['out'], os.path.relpath(os.path.abspath(path), worker['root']) + '.out')
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+        with open(name, 'w') as f:
+            f.write(text)
+
+    # only the last line goes back to the pool, the output of tens of thousands of scripts stays in the workers
+    lines = text.rstrip('\n').rsplit('\n', 1)
+    return {'path': path, 'status': status, 'crash': crash, 'seconds': seconds, 'cpu': cpu,
+            'last': lines[-1] if text else ''}
+
+
+# =================================================================
+# RUNNING
+# =================================================================
+def runBatch(paths, workers=WORKERS, timeout=TIMEOUT, mode='closure', level=OPTIMIZATION_LEVEL,
+             memoize=MEMOIZE, out=None, cache=False, maxOutput=MAX_OUTPUT, progress=None):
+    options = {'timeout': timeout, 'mode': mode, 'level': level, 'memoize': memoize, 'out': out,
+               'root': commonRoot(paths), 'cache': cache, 'maxOutput': maxOutput}
+    workers = max(1, min(workers, len(paths)))
+    # a few chunks per worker keep the pipes quiet without leaving a worker with the slow tail
+    chunk = max(1, min(64, len(paths) // (workers * 8)))
+
+    results = []
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, startWorker, (options,)) as pool:
+        for result in pool.imap_unordered(runScript, paths, chunk):
+            results.append(result)
+            if progress is not None:
+                progress(result, len(results), len(paths))
+    return {'workers': workers, 'wall': time.perf_counter() - start, 'results': results}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary(batch):
+    results = batch['results']
+    lines = [f"{len(results)} scripts on {batch['workers']} workers in {batch['wall']:.2f} s"]
+    if not results:
+        return lines[0]
+
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    lines.append('  ' + ', '.join(f'{status} {count}' for status, count in sorted(counts.items())))
+
+    latencies = sorted(result['seconds'] for result in results)
+    cpu = sum(result['cpu'] for result in results)
+    lines.append(f"  throughput {len(results) / batch['wall']:.1f} scripts/s, "
+                 f"{cpu:.2f} cpu s in scripts, {cpu / batch['wall']:.1f} cores busy")
+    lines.append(f'  latency ms  mean {statistics.mean(latencies) * 1000:.2f}'
+                 f'  p50 {percentile(latencies, 0.5) * 1000:.2f}'
+                 f'  p90 {percentile(latencies, 0.9) * 1000:.2f}'
+                 f'  p99 {percentile(latencies, 0.99) * 1000:.2f}'
+                 f'  max {latencies[-1] * 1000:.2f}')
+
+    failed = [result for result in results if result['status'] != 'ok']
+    for result in sorted(failed, key=lambda result: result['path'])[:20]:
+        detail = result['crash'] or result['last']
+        lines.append(f"  {result['status']:<8}{result['path']}  {detail}")
+    if len(failed) > 20:
+        lines.append(f'  ... {len(failed) - 20} more')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description='runs many scripts on a pool of worker processes')
+    arguments.add_argument('sources', nargs='+', help='directories of .sa scripts or glob patterns')
+    arguments.add_argument('--workers', type=int, default=WORKERS, help='worker processes')
+    arguments.add_argument('--timeout', type=float, default=TIMEOUT, help='seconds every script may run, 0 for none')
+    arguments.add_argument('--mode', default='closure', choices=Interpreter.MODES, help='engine that runs the scripts')
+    arguments.add_argument('--level', type=int, default=OPTIMIZATION_LEVEL, help='optimization level')
+    arguments.add_argument('--memoize', type=int, default=MEMOIZE, help='cache size of every pure function')
+    arguments.add_argument('--max-output', type=int, default=MAX_OUTPUT, help='characters a script may print')
+    arguments.add_argument('--out', help='folder the output of every script is written to')
+    arguments.add_argument('--cache', action='store_true', help='keep the trees of the scripts in the compile cache')
+    arguments.add_argument('--json', help='file the result of every script is written to')
+    options = arguments.parse_args(argv)
+
+    paths = findScripts(options.sources)
+    if not paths:
+        arguments.error('no scripts found')
+
+    batch = runBatch(paths, options.workers, options.timeout, options.mode, options.level, options.memoize,
+                     options.out, options.cache, options.max_output)
+    print(summary(batch))
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(batch, f, indent=2)
+    return 0 if all(result['status'] == 'ok' for result in batch['results']) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+# ==========================================================================================
+# PHASE BENCHMARKS
+# ==========================================================================================
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+
+from s_dump import writeJson, writeTree
+from s_interpreter import Interpreter
+from s_lexer import SadeqLexer
+from s_optimizer import Optimizer
+from s_parser import SadeqParser
+
+'''
+times every phase of running a script on its own: lexing, parsing,
+optimizing, dumping the tree and executing it with each engine
+
+the workloads grow the programs in INPUT with a scale factor, results are
+written as json keyed by 'workload/phase' and a run compared to an older
+result file fails when a phase got slower than the threshold allows
+
+python s_benchmark.py --scale 1 --out bench.json
+python s_benchmark.py --compare bench.json --threshold 0.1
+'''
+
+FORMAT_VERSION = 1
+
+
+# =================================================================
+# WORKLOADS
+# =================================================================
+# fibo.sa taken deep: recursion as far as the interpreter goes and recursive fibonacci
+def recursion(scale):
+    depth = int(200 * scale)
+    return f'''
+function depth(n) {{
+    if n == 0 {{ return 0 }}
+    return depth(n - 1) + 1
+}}
+function fib(n) {{
+    if n < 2 {{ return n }}
+    return fib(n - 1) + fib(n - 2)
+}}
+print(depth({depth}))
+print(fib({int(14 + 4 * min(scale, 1.5))}))
+'''
+
+
+# for.sa with loops inside loops
+def nestedLoops(scale):
+    size = int(120 * scale ** 0.5)
+    return f'''
+arr = ['phone', 'tablet', 'laptop']
+cells = []
+for i = 0 to {size} {{
+    for j = 0 to {size} {{
+        s = i * j + j
+        if s % 7 == 0 {{ push(cells, s) }}
+    }}
+}}
+foreach x in arr {{
+    for i = 1 to 3 {{
+        print(x)
+    }}
+}}
+print(len(cells))
+'''
+
+
+# fibonacci lists of fibo.sa grown long and walked, next to a long list literal
+def bigLists(scale):
+    size = int(20000 * scale)
+    literal = ', '.join(str(i % 1000) for i in range(int(5000 * scale)))
+    return f'''
+data = [{literal}]
+function fibonacci(n) {{
+    f = [0, 1]
+    for i = 2 to n {{
+        push(f, (f[i - 1] + f[i - 2]) % 1000007)
+    }}
+    return f
+}}
+L = fibonacci({size})
+M = []
+foreach x in L {{
+    if x % 2 == 0 {{ push(M, x) }}
+}}
+foreach x in data {{
+    if x % 3 == 0 {{ push(M, x) }}
+}}
+print(len(L))
+print(len(M))
+print(pop(M))
+'''
+
+
+# scopes.sa as many functions called over and over, parameters, globals and loop scopes shadowing each other
+def scopes(scale):
+    functions = int(100 * scale)
+    calls = 30
+    lines = ['x = [1, 2]', "t = 'sadeq'"]
+    for k in range(functions):
+        lines.append(f'''
+function innerScope{k}(x) {{
+    s = t
+    t = [3, 4, x]
+    foreach y in t {{
+        z = y + x + {k}
+    }}
+    return x
+}}
+for i = 0 to {calls} {{
+    innerScope{k}(i)
+}}''')
+    lines += ['print(x)', 'print(t)']
+    return '\n'.join(lines) + '\n'
+
+
+# test.sa style strings built up piece by piece
+def strings(scale):
+    size = int(5000 * scale)
+    return f'''
+s = ''
+for i = 0 to {size} {{
+    s = s + 'ab'
+    if i == {size - 1} {{ print(len(s)) }}
+}}
+words = ['phone', 'tablet', 'laptop']
+line = ''
+foreach w in words {{
+    line = line + w + ' '
+    print(line)
+}}
+'''
+
+
+# fills and sums over number lists, the loops s_idioms runs in bulk
+def numeric(scale):
+    size = int(20000 * scale)
+    return f'''
+A = []
+for i = 0 to {size} {{
+    push(A, i * 3 + 1)
+}}
+B = []
+for i = 1 to {size} {{
+    push(B, (A[i] - A[i - 1]) * 0.5)
+}}
+s = 0
+foreach x in B {{
+    s = s + x
+    if s > 100 {{ s = 0 }}
+}}
+print(len(B))
+print(s)
+'''
+
+
+WORKLOADS = {
+    'recursion': recursion,
+    'nested_loops': nestedLoops,
+    'big_lists': bigLists,
+    'scopes': scopes,
+    'strings': strings,
+    'numeric': numeric,
+}
+
+PHASES = ('lex', 'parse', 'optimize', 'dump', 'execute')
+
+MODES = ('closure', 'vm')
+
+
+# =================================================================
+# RUNNING
+# =================================================================
+# a run repeats a fast function until it takes this long and reports the time of one call
+MIN_RUN_TIME = 0.05
+
+
+def timeCalls(function, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return time.perf_counter() - start
+
+
+def measure(function, repeat):
+    number = 1
+    elapsed = timeCalls(function, number)
+    while elapsed < MIN_RUN_TIME:
+        number *= 10 if elapsed < MIN_RUN_TIME / 10 else 2
+        elapsed = timeCalls(function, number)
+
+    times = [elapsed / number] + [timeCalls(function, number) / number for _ in range(repeat - 1)]
+    return {'min': min(times), 'median': statistics.median(times), 'calls': number, 'runs': times}
+
+
+def quietly(function):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+    return run
+
+
+def benchmarkWorkload(name, script, phases, modes, repeat):
+    lexer = SadeqLexer()
+    parser = SadeqParser()
+    tokens = list(lexer.tokenize(script))
+    tree = parser.parse(iter(tokens))
+
+    def dump():
+        out = io.StringIO()
+        writeJson(tree, out)
+        writeTree(tree, out)
+
+    steps = {
+        'lex': lambda: list(lexer.tokenize(script)),
+        'parse': lambda: parser.parse(iter(tokens)),
+        'optimize': lambda: Optimizer(3).optimize(tree),
+        'dump': dump,
+    }
+
+    results = {}
+    for phase in phases:
+        if phase == 'execute':
+            for mode in modes:
+                results[f'{name}/execute:{mode}'] = measure(quietly(lambda: Interpreter(tree, {}, mode=mode)), repeat)
+        else:
+            results[f'{name}/{phase}'] = measure(steps[phase], repeat)
+    return results
+
+
+def benchmark(workloads, phases, modes, scale, repeat):
+    results = {}
+    for name in workloads:
+        results.update(benchmarkWorkload(name, WORKLOADS[name](scale), phases, modes, repeat))
+    return {
+        'version': FORMAT_VERSION,
+        'scale': scale,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'machine': f'{platform.system()} {platform.machine()}',
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+# =================================================================
+# REPORTING
+# =================================================================
+def report(run):
+    lines = [f"scale {run['scale']}, best and median of {run['repeat']} runs",
+             f'{"benchmark":<32}{"min ms":>12}{"median ms":>12}']
+    for key, result in run['results'].items():
+        lines.append(f"{key:<32}{result['min'] * 1000:>12.2f}{result['median'] * 1000:>12.2f}")
+    return '\n'.join(lines)
+
+
+# the minimum of the runs is compared, it is the least disturbed by the rest of the machine
+def compare(run, baseline, threshold):
+    lines = []
+    regressions = []
+    if baseline.get('scale') != run['scale']:
+        lines.append(f"warning: baseline ran at scale {baseline.get('scale')}, this run at {run['scale']}")
+
+    lines.append(f'{"benchmark":<32}{"before ms":>12}{"after ms":>12}{"change":>10}')
+    for key, result in run['results'].items():
+        if key not in baseline['results']:
+            continue
+        before = baseline['results'][key]['min']
+        after = result['min']
+        change = after / before - 1 if before else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        lines.append(f'{key:<32}{before * 1000:>12.2f}{after * 1000:>12.2f}{change:>+10.1%}{flag}')
+
+    lines.append(f'{len(regressions)} regressions over {threshold:.0%}' if regressions
+                 else f'no regressions over {threshold:.0%}')
+    return '\n'.join(lines), regressions
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description='times the phases of the interpreter on scalable workloads')
+    arguments.add_argument('--scale', type=float, default=1.0, help='size of the workloads')
+    arguments.add_argument('--repeat', type=int, default=5, help='runs of every benchmark')
+    arguments.add_argument('--workloads', default=','.join(WORKLOADS), help='comma separated workloads')
+    arguments.add_argument('--phases', default=','.join(PHASES), help='comma separated phases')
+    arguments.add_argument('--modes', default=','.join(MODES), help='engines the execute phase runs')
+    arguments.add_argument('--out', help='file the json results are written to')
+    arguments.add_argument('--compare', help='json results of an earlier run')
+    arguments.add_argument('--threshold', type=float, default=0.10, help='slowdown counted as a regression')
+    options = arguments.parse_args(argv)
+
+    workloads = options.workloads.split(',')
+    phases = options.phases.split(',')
+    for name in workloads:
+        if name not in WORKLOADS:
+            arguments.error(f"unknown workload '{name}', expected some of {', '.join(WORKLOADS)}")
+    for phase in phases:
+        if phase not in PHASES:
+            arguments.error(f"unknown phase '{phase}', expected some of {', '.join(PHASES)}")
+
+    # the compiled engines recurse in python for every call of the script
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+
+    run = benchmark(workloads, phases, options.modes.split(','), options.scale, options.repeat)
+    print(report(run))
+
+    if options.out:
+        with open(options.out, 'w') as f:
+            json.dump(run, f, indent=2)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        text, regressions = compare(run, baseline, options.threshold)
+        print()
+        print(text)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import time
+
+from s_lists import LISTS
+from s_strings import Rope
+
+'''
+limits of one run of the compiled engines
+
+every run is metered by a Budget, one without limits when none is given.
+the engines count a step for every loop iteration and every call of a
+user function, a loop run in bulk counts all of its iterations at once,
+and count the memory of the lists and long strings the run builds. a run
+going past a limit stops with a BudgetExceeded the caller can catch,
+instead of printing and exiting like the errors of the language
+
+    steps       loop iterations and calls the run may make
+    seconds     time the run may take, checked every CHECK_INTERVAL steps.
+                a run sharing its thread with others is charged its own
+                slices only, not the time it waited for them
+    depth       calls the run may have in progress at once. the vm keeps
+                its calls on a stack of its own and goes as deep as this
+                lets it, the closure engine recurses in python and raises
+                the recursion limit for this many, or CALL_DEPTH of
+                s_closure without a limit
+    memory      bytes the run may build, ITEM_SIZE for every list item
+                and one for every character of a rope of s_strings.
+                items popped are given back, values dropped are not
+
+a new list or rope is counted once it is made, a list repeated with * is
+counted before, so a run never holds much more than its limit
+
+the Budget of a run is kept in the parent slot of its program frame,
+which has no parent, every frame reaches it through its parents
+
+    budget = Budget(steps=10 ** 6, seconds=2.0, memory=64 << 20)
+    try:
+        Interpreter(tree, {}, budget=budget)
+    except BudgetExceeded as e:
+        e.kind, e.limit, e.used
+    budget.usage()
+'''
+
+# steps between two looks at the clock
+CHECK_INTERVAL = 1024
+
+# bytes of one list item
+ITEM_SIZE = 8
+
+
+class BudgetExceeded(Exception):
+
+    # kind is 'steps', 'seconds', 'depth' or 'memory', a depth limit of None is the end of python's stack
+    def __init__(self, kind, limit, used):
+        super().__init__(f"{kind} budget of {limit if limit is not None else 'python'} exceeded, {used} used")
+        self.kind = kind
+        self.limit = limit
+        self.used = used
+
+
+class Budget:
+
+    __slots__ = ('steps', 'seconds', 'memory', 'depth', 'deepest', 'calls',
+                 'left', 'batch', 'counted', 'allocated', 'started', 'stopped', 'deadline')
+
+    '''
+    None leaves a limit off. the engines take a step with left -= 1 and
+    call check once left is below zero, so an unlimited run only pays
+    for the count. calls counts the calls in progress in the closure
+    engine, which compares it with deepest, the depth limit or infinity.
+    a budget is started again by every run it is given to
+    '''
+    def __init__(self, steps=None, seconds=None, memory=None, depth=None):
+        self.steps = steps
+        self.seconds = seconds
+        self.memory = memory
+        self.depth = depth
+        self.deepest = depth if depth is not None else float('inf')
+        self.start()
+
+    def start(self):
+        self.calls = 0
+        self.counted = 0
+        self.allocated = 0
+        self.started = time.monotonic()
+        self.stopped = None
+        self.deadline = None if self.seconds is None else self.started + self.seconds
+        self.refill()
+
+    # the steps until the next check
+    def refill(self):
+        batch = CHECK_INTERVAL
+        if self.steps is not None:
+            batch = max(0, min(batch, self.steps - self.counted))
+        self.batch = batch
+        self.left = batch
+
+    def check(self):
+        self.counted += self.batch - self.left
+        self.batch = self.left
+        if self.steps is not None and self.counted > self.steps:
+            raise BudgetExceeded('steps', self.steps, self.counted)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded('seconds', self.seconds, round(time.monotonic() - self.started, 3))
+        self.refill()
+
+    # count steps taken at once
+    def charge(self, count):
+        self.left -= count
+        if self.left < 0:
+            self.check()
+
+    # a call past the depth limit
+    def tooDeep(self, used):
+        raise BudgetExceeded('depth', self.depth, used)
+
+    def allocate(self, size):
+        self.allocated += size
+        if self.memory is not None and self.allocated > self.memory:
+            raise BudgetExceeded('memory', self.memory, self.allocated)
+
+    def release(self, size):
+        self.allocated -= size
+
+    # a run that waited its turn is not charged the time it waited
+    def waited(self, seconds):
+        self.started += seconds
+        if self.deadline is not None:
+            self.deadline += seconds
+
+    # the end of the run, however it ended
+    def stop(self):
+        self.stopped = time.monotonic()
+
+    # what the run used so far
+    def usage(self):
+        return {
+            'steps': self.counted + self.batch - self.left,
+            'seconds': round((self.stopped or time.monotonic()) - self.started, 6),
+            'memory': self.allocated,
+        }
+
+
+# the bytes a value the engines made counts, nothing for numbers and short strings
+def sizeOf(value):
+    if isinstance(value, LISTS):
+        return ITEM_SIZE * len(value)
+    if type(value) is Rope:
+        return len(value)
+    return 0
+
+
+# the bytes a sum made beyond its left side, a rope on the left grows in place
+def addedSize(left, result):
+    size = sizeOf(result)
+    if size and type(left) is Rope and type(result) is Rope:
+        return size - len(left)
+    return size
+
+
+# the bytes count * items would take, taken before the list is repeated
+def repeatSize(left, right):
+    if isinstance(left, LISTS) and type(right) is int:
+        return ITEM_SIZE * len(left) * max(right, 0)
+    if isinstance(right, LISTS) and type(left) is int:
+        return ITEM_SIZE * len(right) * max(left, 0)
+    return 0
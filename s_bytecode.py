@@ -0,0 +1,835 @@
+import operator
+import sys
+from operator import length_hint
+
+from s_budget import ITEM_SIZE, Budget, addedSize, repeatSize, sizeOf
+from s_closure import CONDITIONS, SIZED
+from s_frames import Function
+from s_idioms import FALLBACK, BulkLoop, recognize
+from s_lists import BUILTINS, LISTS, NumberList, makeList
+from s_memo import MemoCache, memoKey, pureFunctions, storeResult
+from s_optimizer import hasCalls, mutatedLists
+from s_output import display, linesWritten, writeLine
+from s_positions import where
+from s_resolver import UNSET, Scope, asList, definesFunction, globalFrame, lookup, newFrame, storeGlobals
+from s_strings import ROPE_SIZE, STRINGS, Rope, concat, typeOf
+
+'''
+lowers the tuple tree of SadeqParser to a flat instruction stream and runs
+it on a stack machine
+
+every instruction takes two slots in the code list: the opcode and one
+argument (a slot, an index into consts/refs, a count or a jump target)
+variables are resolved to frame slots by s_resolver while compiling
+'''
+
+# =================================================================
+# OPCODES
+# =================================================================
+OPNAMES = (
+    'LOAD_CONST',      # push consts[arg]
+    'LOAD_FAST',       # push slot arg of the current frame, always set
+    'LOAD_VAR',        # push the variable refs[arg] = (name, candidates)
+    'STORE_FAST',      # pop into slot arg of the current frame
+    'BUILD_LIST',      # pop arg values into a new list
+    'LIST_INDEX',      # pop index and list, push list[index], consts[arg] names the list
+    'POP_LIST',        # pop list, push list.pop(), consts[arg] names the list
+    'PUSH_LIST',       # pop value and list, append value to list
+    'COMPARE',         # pop two values, push COMPARISONS[arg] of them
+    'BINARY_ADD',      # pop two values, push their sum
+    'BINARY_OP',       # pop two values, push ARITHMETIC[arg] of them
+    'LEN',             # pop value, push its length
+    'LOAD_HOISTED',    # push the kept value of refs[arg] = (name, depth, slot, end) and jump to end, or the lines written
+    'STORE_HOISTED',   # pop value, keep it in refs[arg] when no line was written since LOAD_HOISTED, push it
+    'PRINT',           # pop value and print it
+    'POP_TOP',         # drop the top of the stack
+    'JUMP',            # continue at arg
+    'JUMP_IF_FALSE',   # pop value, continue at arg if it is false
+    'ENTER_SCOPE',     # open a fori / foreach frame with arg slots
+    'EXIT_SCOPE',      # close the innermost fori / foreach frame
+    'SETUP_FORI',      # pop limit, push an iterator from slot arg to limit
+    'SETUP_FOREACH',   # pop list or string, push an iterator over it, over the array of a number list when arg is 1
+    'FOR_ITER',        # push the next item, or drop the iterator and jump to arg
+    'BULK_LOOP',       # run the loop of the iterator or list on top of the stack in bulk, empty it if done
+    'DEF_FUNCTION',    # push a function of the code object consts[arg]
+    'CALL_FUNCTION',   # call consts[arg] = (name, candidates, argc), push its result
+    'TAIL_CALL',       # CALL_FUNCTION of return f(...), runs f in place of the current function when it can
+    'RETURN_VALUE',    # pop value, leave the current function with it from any loop depth
+    'END',             # leave the current function or the program
+)
+
+(LOAD_CONST, LOAD_FAST, LOAD_VAR, STORE_FAST, BUILD_LIST, LIST_INDEX, POP_LIST, PUSH_LIST,
+ COMPARE, BINARY_ADD, BINARY_OP, LEN, LOAD_HOISTED, STORE_HOISTED, PRINT, POP_TOP, JUMP, JUMP_IF_FALSE,
+ ENTER_SCOPE, EXIT_SCOPE, SETUP_FORI, SETUP_FOREACH, FOR_ITER, BULK_LOOP,
+ DEF_FUNCTION, CALL_FUNCTION, TAIL_CALL, RETURN_VALUE, END) = range(len(OPNAMES))
+
+COMPARISONS = tuple(CONDITIONS)
+
+ARITHMETIC = {
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+}
+ARITHMETIC_NAMES = tuple(ARITHMETIC)
+ARITHMETIC_OPS = tuple(ARITHMETIC.values())
+MULTIPLY = ARITHMETIC_NAMES.index('*')
+
+
+class CodeObject:
+
+    def __init__(self, name, code, consts, refs, slots, parameters=(), pooled=True, notes=None, positions=None):
+        self.name = name
+        self.code = code
+        self.consts = consts
+        self.refs = refs
+
+        # slot numbers of the scope the code runs in, by name
+        self.slots = slots
+        self.size = len(slots)
+        self.parameters = parameters
+        self.pooled = pooled
+
+        # MemoCache of a pure function when memoization is on
+        self.memo = None
+
+        # variable names by instruction position, only read by the disassembler
+        self.notes = notes or {}
+
+        # (line, column) of the instructions that can fail, only read when an error is reported
+        self.positions = positions or {}
+
+
+# =================================================================
+# COMPILER
+# =================================================================
+class BytecodeCompiler:
+
+    # positions of s_positions place the instructions of a node in the source
+    def __init__(self, name='<program>', scope=None, parameters=(), memoize=0, pure=frozenset(), positions=None):
+        self.name = name
+        self.scope = scope or Scope('program')
+        self.parameters = parameters
+        self.memoize = memoize
+        self.pure = pure
+        self.code = []
+        self.consts = []
+        self.refs = []
+        self.notes = {}
+        self.nodePositions = positions or {}
+        self.positions = {}
+        self.constIndex = {}
+
+        # (start, break jumps) of the loops being compiled, innermost last
+        self.loops = []
+
+    # node is given for instructions that can fail, their errors name its position
+    def emit(self, opcode, arg=0, note=None, node=None):
+        self.code.append(opcode)
+        self.code.append(arg)
+        if note is not None:
+            self.notes[len(self.code) - 2] = note
+        if node is not None and id(node) in self.nodePositions:
+            self.positions[len(self.code) - 2] = self.nodePositions[id(node)][1:]
+        return len(self.code) - 1
+
+    # jump targets are only known after the jumped-over code is emitted
+    def patch(self, argPosition, target=None):
+        self.code[argPosition] = len(self.code) if target is None else target
+
+    def addConst(self, value):
+        key = (type(value), value)
+        if key not in self.constIndex:
+            self.constIndex[key] = len(self.consts)
+            self.consts.append(value)
+        return self.constIndex[key]
+
+    def compileProgram(self, tree):
+        self.scope.collect(tree)
+        self.statement(tree, self.scope)
+        self.emit(END)
+        return CodeObject(self.name, self.code, tuple(self.consts), tuple(self.refs), dict(self.scope.slots),
+                          self.parameters, not definesFunction(tree), self.notes, self.positions)
+
+    # ===================================================
+    # VARIABLES
+    # ===================================================
+    def load(self, name, scope, node=None):
+        candidates, certain = scope.resolve(name)
+        if certain and len(candidates) == 1 and candidates[0][0] == 0:
+            self.emit(LOAD_FAST, candidates[0][1], name)
+        else:
+            self.refs.append((name, candidates))
+            self.emit(LOAD_VAR, len(self.refs) - 1, name, node)
+
+    def store(self, name, scope):
+        self.emit(STORE_FAST, scope.declare(name), name)
+
+    # ===================================================
+    # STATEMENTS
+    # ===================================================
+    def statement(self, node, scope):
+        if node is None:
+            return
+        if isinstance(node, list):
+            for x in node:
+                self.statement(x, scope)
+            return
+
+        kind = node[0]
+        if kind == 'var_assign':
+            self.expr(node[2], scope)
+            self.store(node[1], scope)
+
+        elif kind == 'list_assign':
+            items = asList(node[2])
+            for x in items:
+                self.expr(x, scope)
+            self.emit(BUILD_LIST, len(items))
+            self.store(node[1], scope)
+
+        elif kind == 'push':
+            self.load(node[1], scope, node)
+            self.expr(node[2], scope)
+            self.emit(PUSH_LIST, node=node)
+
+        elif kind == 'print':
+            self.expr(node[1], scope)
+            self.emit(PRINT)
+
+        elif kind == 'return':
+            if node[1][0] == 'func_call' and self.scope.kind == 'function':
+                self.call(node[1], scope, TAIL_CALL)
+            else:
+                self.expr(node[1], scope)
+            self.emit(RETURN_VALUE)
+
+        elif kind == 'break' or kind == 'continue':
+            if not self.loops:
+                writeLine(f"SyntaxError: '{kind}' outside loop" + where(self.nodePositions.get(id(node))))
+                exit()
+
+            start, breaks = self.loops[-1]
+            if kind == 'continue':
+                self.emit(JUMP, start)
+            else:
+                # the iterator of the loop is on top of the stack
+                self.emit(POP_TOP)
+                breaks.append(self.emit(JUMP))
+
+        elif kind == 'if_stmt':
+            self.ifStatement(node[1], scope)
+
+        elif kind == 'fori_loop':
+            self.foriLoop(node, scope)
+
+        elif kind == 'foreach_loop':
+            self.foreachLoop(node, scope)
+
+        elif kind == 'func_def':
+            parameters = tuple(asList(node[2]))
+            functionScope = Scope('function', scope, parameters)
+            function = BytecodeCompiler(node[1], functionScope, parameters, self.memoize, self.pure,
+                                        self.nodePositions).compileProgram(node[3])
+            if id(node) in self.pure:
+                function.memo = MemoCache(node[1], self.memoize)
+            self.emit(DEF_FUNCTION, self.addConst(function))
+            self.store(node[1], scope)
+
+        elif kind in ('func_call', 'pop', '+') or kind in ARITHMETIC or kind in CONDITIONS:
+            # expression used as a statement, its value is dropped
+            self.expr(node, scope)
+            self.emit(POP_TOP)
+
+    def ifStatement(self, node, scope):
+        branches = [(node[1], node[2])]
+        for branch in asList(node[3]):
+            if branch[0] == 'else_if':
+                branches.append((branch[1], branch[2]))
+            elif branch[0] == 'else':
+                branches.append((None, branch[1]))
+                break
+
+        exits = []
+        for condition, body in branches:
+            if condition is None:
+                self.statement(body, scope)
+                break
+            self.expr(condition, scope)
+            skip = self.emit(JUMP_IF_FALSE)
+            self.statement(body, scope)
+            exits.append(self.emit(JUMP))
+            self.patch(skip)
+
+        for position in exits:
+            self.patch(position)
+
+    def foriLoop(self, node, scope):
+        setup = node[1]
+        name = setup[1][1]
+        loopScope = Scope('fori', scope)
+        slot = loopScope.declare(name)
+        loopScope.collect(node[2])
+
+        # the slots of the expressions the optimizer hoisted out of the body
+        for hoisted in node[3] if len(node) > 3 else ():
+            loopScope.declare(hoisted, certain=True)
+
+        # the scope size is only known after the body is compiled
+        enter = self.emit(ENTER_SCOPE)
+
+        # the iterator is only certain once the start value is assigned
+        self.expr(setup[1][2], loopScope)
+        self.store(name, loopScope)
+        loopScope.declare(name, certain=True)
+
+        self.expr(setup[2], loopScope)
+        self.emit(SETUP_FORI, slot, name, node)
+
+        self.bulkLoop(node, loopScope, slot)
+        self.loopBody(name, node[2], loopScope)
+        self.patch(enter, loopScope.size)
+
+    def foreachLoop(self, node, scope):
+        setup = node[1]
+
+        # the list is looked up before the loop scope holds anything
+        self.load(setup[2], scope, node)
+
+        loopScope = Scope('foreach', scope)
+        loopScope.declare(setup[1], certain=True)
+        loopScope.collect(node[2])
+
+        # a body that can not push leaves a number list in its array
+        enter = self.emit(ENTER_SCOPE)
+        self.bulkLoop(node, loopScope)
+        self.emit(SETUP_FOREACH, int(not mutatedLists(node[2]) and not hasCalls(node[2])), node=node)
+        self.loopBody(setup[1], node[2], loopScope)
+        self.patch(enter, loopScope.size)
+
+    # a loop s_idioms recognizes, the iterator slot of a fori loop gives the start of its range
+    def bulkLoop(self, node, scope, iterator=None):
+        idiom = recognize(node)
+        if idiom is None:
+            return
+        reads = tuple(scope.resolve(name)[0] for name in idiom.names)
+        slot = scope.slots[idiom.target] if idiom.kind == 'sum' else None
+        self.emit(BULK_LOOP, self.addConst((BulkLoop(idiom), reads, slot, iterator)))
+
+    def loopBody(self, name, body, scope):
+        start = len(self.code)
+        exit = self.emit(FOR_ITER)
+        self.store(name, scope)
+
+        self.loops.append((start, []))
+        self.statement(body, scope)
+        _, breaks = self.loops.pop()
+
+        self.emit(JUMP, start)
+        self.patch(exit)
+        for position in breaks:
+            self.patch(position)
+        self.emit(EXIT_SCOPE)
+
+    # ===================================================
+    # EXPRESSIONS
+    # ===================================================
+    def expr(self, node, scope):
+        kind = node[0]
+        if kind in ('num', 'float', 'str'):
+            self.emit(LOAD_CONST, self.addConst(node[1]))
+
+        elif kind == 'var':
+            self.load(node[1], scope, node)
+
+        elif kind == '+':
+            self.expr(node[1], scope)
+            self.expr(node[2], scope)
+            self.emit(BINARY_ADD, node=node)
+
+        elif kind in ARITHMETIC:
+            self.expr(node[1], scope)
+            self.expr(node[2], scope)
+            self.emit(BINARY_OP, ARITHMETIC_NAMES.index(kind), node=node)
+
+        elif kind in CONDITIONS:
+            self.expr(node[1], scope)
+            self.expr(node[2], scope)
+            self.emit(COMPARE, COMPARISONS.index(kind))
+
+        elif kind == 'list_index':
+            self.load(node[1], scope, node)
+            self.expr(node[2], scope)
+            self.emit(LIST_INDEX, self.addConst(node[1]), node=node)
+
+        elif kind == 'pop':
+            self.load(node[1], scope, node)
+            self.emit(POP_LIST, self.addConst(node[1]), node=node)
+
+        elif kind == 'len':
+            self.expr(node[1], scope)
+            self.emit(LEN, node=node)
+
+        elif kind == 'func_call':
+            self.call(node, scope)
+
+        elif kind == 'hoisted':
+            # the ref is filled in once the end of the expression is known
+            (depth, slot), = scope.resolve(node[1])[0]
+            self.refs.append(None)
+            ref = len(self.refs) - 1
+            self.emit(LOAD_HOISTED, ref, node[1])
+            self.expr(node[2], scope)
+            self.emit(STORE_HOISTED, ref, node[1])
+            self.refs[ref] = (node[1], depth, slot, len(self.code))
+
+        else:
+            self.emit(LOAD_CONST, self.addConst(None))
+
+    def call(self, node, scope, opcode=CALL_FUNCTION):
+        args = asList(node[2])
+        for x in args:
+            self.expr(x, scope)
+        candidates, _ = scope.resolve(node[1])
+        self.emit(opcode, self.addConst((node[1], candidates, len(args))), node=node)
+
+
+# memoize is the cache size of every pure function, 0 turns it off, seeded as for pureFunctions of s_memo
+def compileTree(tree, memoize=0, positions=None, seeded=False):
+    pure = pureFunctions(tree, seeded) if memoize else frozenset()
+    return BytecodeCompiler(memoize=memoize, pure=pure, positions=positions).compileProgram(tree)
+
+
+# the caches of the pure functions defined anywhere in a code object
+def memoCaches(codeObject):
+    memos = []
+    for value in codeObject.consts:
+        if isinstance(value, CodeObject):
+            if value.memo is not None:
+                memos.append(value.memo)
+            memos.extend(memoCaches(value))
+    return memos
+
+
+# the code object a code list belongs to, looked for only when an error is reported
+def findCode(codeObject, code):
+    if codeObject.code is code:
+        return codeObject
+    for value in codeObject.consts:
+        if isinstance(value, CodeObject):
+            found = findCode(value, code)
+            if found is not None:
+                return found
+    return None
+
+
+# =================================================================
+# DISASSEMBLER
+# =================================================================
+def disassemble(codeObject):
+    lines = [f"code object {codeObject.name}"
+             + (f" ({', '.join(codeObject.parameters)})" if codeObject.parameters else '')]
+    nested = []
+    code = codeObject.code
+
+    for pc in range(0, len(code), 2):
+        opcode, arg = code[pc], code[pc + 1]
+        detail = ''
+
+        if opcode in (LOAD_CONST, DEF_FUNCTION, CALL_FUNCTION, TAIL_CALL, LIST_INDEX, POP_LIST):
+            value = codeObject.consts[arg]
+            if isinstance(value, CodeObject):
+                nested.append(value)
+                detail = f'<code {value.name}>'
+            else:
+                detail = repr(value)
+        elif opcode == COMPARE:
+            detail = COMPARISONS[arg]
+        elif opcode == BINARY_OP:
+            detail = ARITHMETIC_NAMES[arg]
+        elif opcode in (JUMP, JUMP_IF_FALSE, FOR_ITER):
+            detail = f'to {arg}'
+        elif opcode == BULK_LOOP:
+            detail = repr(codeObject.consts[arg][0])
+        elif pc in codeObject.notes:
+            detail = codeObject.notes[pc]
+
+        lines.append(f'{pc:>6} {OPNAMES[opcode]:<15} {arg:>4}  {detail}'.rstrip())
+
+    for function in nested:
+        lines.append('')
+        lines.append(disassemble(function))
+    return '\n'.join(lines)
+
+
+# =================================================================
+# VIRTUAL MACHINE
+# =================================================================
+class VirtualMachine:
+
+    # budget is the Budget of s_budget the run is held to, None runs without limits
+    def run(self, codeObject, env, budget=None):
+        self.program = codeObject
+        budget = budget or Budget()
+        budget.start()
+        frame = globalFrame(codeObject.slots, env, budget)
+        self.execute(codeObject, frame)
+        storeGlobals(codeObject.slots, frame, env)
+
+    # the position suffix of an error of the instruction before pc
+    def where(self, code, pc):
+        codeObject = findCode(self.program, code)
+        if codeObject is None:
+            return ''
+        position = codeObject.positions.get(pc - 2)
+        return where((None,) + position) if position else ''
+
+    # frame is the program frame, its parent slot holds the Budget of the run
+    def execute(self, codeObject, frame):
+        for _ in self.slices(codeObject, frame):
+            pass
+
+    '''
+    runs the code one slice at a time, the generator stops after every
+    check of the budget, every CHECK_INTERVAL loop iterations and calls,
+    and goes on from there when it is resumed. the state of the run is all
+    in its locals, so thousands of runs can be interleaved in one thread
+    '''
+    def slices(self, codeObject, frame):
+        budget = frame[0]
+        deepest = budget.deepest
+        code = codeObject.code
+        consts = codeObject.consts
+        refs = codeObject.refs
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        frames = []
+        pc = 0
+
+        while True:
+            opcode = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+
+            if opcode == LOAD_FAST:
+                push(frame[arg])
+
+            elif opcode == LOAD_VAR:
+                name, candidates = refs[arg]
+                value = lookup(frame, candidates)
+                if value is UNSET:
+                    writeLine("LookupError: Undefined variable '" + name + "' found!" + self.where(code, pc))
+                    exit()
+                push(value)
+
+            elif opcode == LOAD_CONST:
+                push(consts[arg])
+
+            elif opcode == STORE_FAST:
+                frame[arg] = pop()
+
+            elif opcode == FOR_ITER:
+                for item in stack[-1]:
+                    budget.left -= 1
+                    if budget.left < 0:
+                        budget.check()
+                        yield
+                    push(item)
+                    break
+                else:
+                    pop()
+                    pc = arg
+
+            elif opcode == JUMP:
+                pc = arg
+
+            elif opcode == JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+
+            elif opcode == BINARY_ADD:
+                res2 = pop()
+                res1 = stack[-1]
+
+                # numbers and short strings need no checks
+                if type(res1) is int or type(res1) is float:
+                    if type(res2) is int or type(res2) is float:
+                        stack[-1] = res1 + res2
+                        continue
+                elif type(res1) is str and type(res2) is str and len(res1) + len(res2) < ROPE_SIZE:
+                    stack[-1] = res1 + res2
+                    continue
+
+                # type checking
+                if isinstance(res1, STRINGS):
+                    if isinstance(res2, (int, float)):
+                        writeLine(f"Type Error: Cannot do arithmetic operation On Type {typeOf(res1)} and {typeOf(res2)}"
+                              + self.where(code, pc))
+                        stack[-1] = -1
+                        continue
+                    res = concat(res1, res2) if type(res1) is str and type(res2) is str else res1 + res2
+                    if type(res) is Rope:
+                        budget.allocate(addedSize(res1, res))
+                    stack[-1] = res
+                    continue
+                elif isinstance(res2, STRINGS):
+                    if isinstance(res1, (int, float)):
+                        writeLine(f"Type Error: Cannot do arithmetic operation On Type {typeOf(res1)} and {typeOf(res2)}"
+                              + self.where(code, pc))
+                        stack[-1] = -1
+                        continue
+                res = res1 + res2
+                if type(res) in SIZED:
+                    budget.allocate(addedSize(res1, res))
+                stack[-1] = res
+
+            elif opcode == BINARY_OP:
+                res2 = pop()
+                res1 = stack[-1]
+                if type(res1) is int or type(res1) is float:
+                    if type(res2) is int or type(res2) is float:
+                        stack[-1] = ARITHMETIC_OPS[arg](res1, res2)
+                        continue
+                if isinstance(res1, STRINGS) or isinstance(res2, STRINGS):
+                    writeLine(f'Type Error: cannot do subtraction of string type' + self.where(code, pc))
+                    stack[-1] = -1
+                else:
+                    # a list repeated by a number is counted before it is made
+                    if arg == MULTIPLY:
+                        budget.allocate(repeatSize(res1, res2))
+                    stack[-1] = ARITHMETIC_OPS[arg](res1, res2)
+
+            elif opcode == COMPARE:
+                res2 = pop()
+                stack[-1] = CONDITIONS[COMPARISONS[arg]](stack[-1], res2)
+
+            elif opcode == LIST_INDEX:
+                index = pop()
+                value = stack[-1]
+
+                # ckeck if holder is list, number lists are indexed in their array
+                if type(value) is not list:
+                    if type(value) is not NumberList:
+                        writeLine('Index Error: only var of type list can be accessed by index' + self.where(code, pc))
+                        exit()
+                    value = value.items
+                try:
+                    stack[-1] = value[index]
+                except IndexError:
+                    writeLine("Index Error: index out of bound of array: " + consts[arg] + self.where(code, pc))
+                    stack[-1] = -1
+
+            elif opcode == PUSH_LIST:
+                value = pop()
+                pushed = pop()
+                if not isinstance(pushed, LISTS):
+                    writeLine("TypeError: push method is only defined for list type" + self.where(code, pc))
+                    exit()
+                budget.allocate(ITEM_SIZE)
+                pushed.append(value)
+
+            elif opcode == POP_LIST:
+                popped = stack[-1]
+                if not isinstance(popped, LISTS):
+                    writeLine("TypeError: pop method is only defined for list type" + self.where(code, pc))
+                    exit()
+                try:
+                    stack[-1] = popped.pop()
+                except IndexError:
+                    # the walker reports an empty list like a missing one
+                    writeLine("LookupError: Undefined variable '" + consts[arg] + "' found!" + self.where(code, pc))
+                    stack[-1] = -1
+                    continue
+                budget.release(ITEM_SIZE)
+
+            elif opcode == BUILD_LIST:
+                budget.allocate(ITEM_SIZE * arg)
+                if arg:
+                    items = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    items = []
+                push(makeList(items))
+
+            elif opcode == LEN:
+                res = stack[-1]
+                if not isinstance(res, (str, Rope, list, NumberList)):
+                    writeLine('TypeError: len() only accepts list and strings' + self.where(code, pc))
+                    exit()
+                stack[-1] = len(res)
+
+            elif opcode == LOAD_HOISTED:
+                _, depth, slot, end = refs[arg]
+                holder = frame
+                for _ in range(depth):
+                    holder = holder[0]
+                value = holder[slot]
+                if value is UNSET:
+                    push(linesWritten())
+                else:
+                    push(value)
+                    pc = end
+
+            elif opcode == STORE_HOISTED:
+                value = pop()
+                # an expression that printed an error is worked out again next time
+                if linesWritten() == stack[-1]:
+                    _, depth, slot, _ = refs[arg]
+                    holder = frame
+                    for _ in range(depth):
+                        holder = holder[0]
+                    holder[slot] = value
+                stack[-1] = value
+
+            elif opcode == PRINT:
+                writeLine(display(pop()))
+
+            elif opcode == POP_TOP:
+                pop()
+
+            elif opcode == ENTER_SCOPE:
+                frame = newFrame(frame, arg)
+
+            elif opcode == EXIT_SCOPE:
+                frame = frame[0]
+
+            elif opcode == SETUP_FORI:
+                limit = pop()
+
+                # check if the loop is valid
+                if not isinstance(limit, int):
+                    writeLine("TypeError: Cannot iterate of variable type: " + str(typeOf(limit)) + self.where(code, pc))
+                    exit()
+                push(iter(range(frame[arg], limit)))
+
+            elif opcode == BULK_LOOP:
+                loop, reads, slot, iterator = consts[arg]
+                items = stack[-1]
+                if iterator is not None:
+                    items = range(frame[iterator], frame[iterator] + length_hint(items))
+                elif not isinstance(items, (list, str, Rope, NumberList)):
+                    # SETUP_FOREACH reports what can not be looped over
+                    continue
+
+                # iterations and the items of a fill are counted before and given back if it does not run
+                count = len(items)
+                size = ITEM_SIZE * count if slot is None else 0
+                budget.charge(count)
+                budget.allocate(size)
+                result = loop.run([lookup(frame, candidates) for candidates in reads], items)
+                if result is FALLBACK:
+                    budget.left += count
+                    budget.release(size)
+                else:
+                    if slot is not None:
+                        frame[slot] = result
+                    stack[-1] = iter(()) if iterator is not None else []
+
+            elif opcode == SETUP_FOREACH:
+                items = pop()
+
+                # for loop is only for list and str
+                if not isinstance(items, (list, str, Rope)):
+                    if type(items) is not NumberList:
+                        writeLine("TypeError: foreach loop is only for list or string type" + self.where(code, pc))
+                        exit()
+                    if arg:
+                        items = items.items
+                push(iter(items))
+
+            elif opcode == CALL_FUNCTION or opcode == TAIL_CALL:
+                name, candidates, argc = consts[arg]
+                function = lookup(frame, candidates)
+                if argc:
+                    values = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    values = ()
+
+                if not isinstance(function, Function):
+                    # builtins of s_lists run when no function of their name is defined
+                    if function is UNSET and name in BUILTINS:
+                        arity, builtin = BUILTINS[name]
+                        if arity != argc:
+                            writeLine('ParameterError: Given parameters don\'t match inputs' + self.where(code, pc))
+                            exit()
+                        res = builtin(*values)
+                        budget.allocate(sizeOf(res))
+                        push(res)
+                        continue
+                    writeLine("LookupError -> Undefined function '%s'" % name + self.where(code, pc))
+                    push(-1)
+                    continue
+
+                # comparing parameters satisfaction
+                if function.arity != argc:
+                    writeLine('ParameterError: Given parameters don\'t match inputs' + self.where(code, pc))
+                    exit()
+
+                budget.left -= 1
+                if budget.left < 0:
+                    budget.check()
+                    yield
+
+                memo = function.memo
+                if memo is not None:
+                    key = memoKey(values)
+                    res = memo.get(key)
+                    if res is not UNSET:
+                        push(res)
+                        continue
+
+                if opcode == TAIL_CALL:
+                    # the current function gives its frame back and f returns straight to its caller,
+                    # the result is stored for every memoized function of the chain when it comes back
+                    returnTo = frames[-1]
+                    base = returnTo[7]
+                    pending = returnTo[8]
+                    if memo is not None:
+                        if pending is None:
+                            pending = []
+                        pending.append((memo, key, linesWritten()))
+                    del stack[base:]
+                    returnTo[5].leave(returnTo[6])
+                    callee = function.enter(values)
+                    frames[-1] = returnTo[:5] + (function, callee, base, pending)
+                else:
+                    # every call runs in a frame of its own
+                    if len(frames) >= deepest:
+                        budget.tooDeep(len(frames) + 1)
+                    pending = None if memo is None else [(memo, key, linesWritten())]
+                    callee = function.enter(values)
+                    frames.append((code, consts, refs, pc, frame, function, callee, len(stack), pending))
+                frame = callee
+                body = function.body
+                code = body.code
+                consts = body.consts
+                refs = body.refs
+                pc = 0
+
+            elif opcode == DEF_FUNCTION:
+                body = consts[arg]
+                push(Function(body.name, len(body.parameters), None, body.size, body, frame, body.pooled, body.memo))
+
+            elif opcode == RETURN_VALUE or opcode == END:
+                res = pop() if opcode == RETURN_VALUE else None
+                if not frames:
+                    return
+
+                # loop frames and iterators of the function are dropped with it
+                code, consts, refs, pc, frame, function, callee, base, pending = frames.pop()
+                del stack[base:]
+                function.leave(callee)
+                if pending is not None:
+                    storeResult(pending, res)
+                push(res)
+
+
+if __name__ == '__main__':
+    import sys
+    from s_lexer import SadeqLexer, readFile
+    from s_parser import SadeqParser
+
+    script = readFile(sys.argv[1])
+    print(disassemble(compileTree(SadeqParser().parse(SadeqLexer().tokenize(script)))))
@@ -0,0 +1,156 @@
+import hashlib
+import marshal
+import mmap
+import os
+import sys
+
+'''
+on disk cache of what the front end makes out of a script
+
+an entry is the marshal dump of one form of a script, 'ast' for the tree
+of SadeqParser or 'optimized<level>' for the optimized tree and report,
+each with the dump of its PositionTable of s_positions,
+its file is named after the key, the sha256 of the source from
+sourceHash or fileHash, and the form
+
+every entry starts with the version of the front end that wrote it, the
+hash of the lexer, parser and optimizer sources and the python version,
+so a changed grammar reads its old entries as stale and deletes them
+
+entries are written to a temporary file and renamed in place, so several
+processes can share a directory, and the least recently used entries are
+removed once the directory holds more than the size cap
+'''
+
+CACHE_DIR = 'CACHE'
+
+# bytes kept on disk before the least recently used entries are removed
+CACHE_LIMIT = 64 * 1024 * 1024
+
+# bump when the shape of the cached values changes
+FORMAT_VERSION = 2
+
+# sources whose changes make every entry stale
+FRONT_END = ('s_lexer.py', 's_parser.py', 's_optimizer.py', 's_positions.py')
+
+SUFFIX = '.marshal'
+
+
+class Missing:
+
+    def __repr__(self):
+        return '<missing>'
+
+
+# what load returns when there is no usable entry, None is a valid tree
+MISSING = Missing()
+
+_version = None
+
+
+def frontEndVersion():
+    global _version
+    if _version is None:
+        digest = hashlib.sha256(f'{FORMAT_VERSION}:{sys.version_info[:2]}'.encode())
+        folder = os.path.dirname(os.path.abspath(__file__))
+        for name in FRONT_END:
+            with open(os.path.join(folder, name), 'rb') as f:
+                digest.update(f.read())
+        _version = digest.hexdigest()
+    return _version
+
+
+def sourceHash(script):
+    return hashlib.sha256(script.encode('utf-8')).hexdigest()
+
+
+# the hash of a script file without reading it into memory, None when it can not be read
+def fileHash(filename):
+    digest = hashlib.sha256()
+    try:
+        with open(filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    digest.update(view)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class CompileCache:
+
+    def __init__(self, directory=CACHE_DIR, limit=CACHE_LIMIT):
+        self.directory = directory
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, form):
+        return os.path.join(self.directory, f'{key}-{form}{SUFFIX}')
+
+    def load(self, key, form='ast'):
+        path = self.path(key, form)
+        try:
+            with open(path, 'rb') as f:
+                version, value = marshal.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return MISSING
+        except (EOFError, ValueError, TypeError):
+            # a torn or foreign file is as good as stale
+            version = None
+
+        if version != frontEndVersion():
+            self.stale += 1
+            self.misses += 1
+            self.remove(path)
+            return MISSING
+
+        self.hits += 1
+        # the modification time orders the entries for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def store(self, key, value, form='ast'):
+        path = self.path(key, form)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            marshal.dump((frontEndVersion(), value), f)
+        os.replace(temporary, path)
+        self.prune()
+
+    # removing the least recently used entries until the cap is met
+    def prune(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX):
+                info = entry.stat()
+                entries.append((info.st_mtime, info.st_size, entry.path))
+                total += info.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.limit:
+                break
+            self.remove(path)
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX):
+                self.remove(entry.path)
+
+    def report(self):
+        return f'compile cache {self.directory}: {self.hits} hits, {self.misses} misses, {self.stale} stale'
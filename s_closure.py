@@ -0,0 +1,835 @@
+import operator
+import sys
+import threading
+from contextlib import contextmanager
+
+from s_budget import ITEM_SIZE, Budget, BudgetExceeded, addedSize, repeatSize, sizeOf
+from s_frames import BREAK, CONTINUE, RETURNED, Function, TailCall
+from s_idioms import FALLBACK, BulkLoop, recognize
+from s_lists import BUILTINS, LISTS, NumberList, makeList
+from s_memo import MemoCache, memoKey, pureFunctions, storeResult
+from s_optimizer import hasCalls, mutatedLists
+from s_output import display, linesWritten, writeLine
+from s_positions import where
+from s_resolver import UNSET, RETURN, Scope, asList, definesFunction, globalFrame, lookup, newFrame, storeGlobals
+from s_strings import ROPE_SIZE, STRINGS, Rope, concat, typeOf
+
+'''
+compiles the tuple tree of SadeqParser into nested python closures
+every node is looked at once, its handler is chosen once and its
+children are bound as closures, so running the program never compares
+node names again
+
+every closure takes the frame of the scope it runs in, variables are
+resolved to frame slots by s_resolver while compiling
+
+expression closures return their value, statement closures return None
+or one of the signals of s_frames, which every enclosing block, loop and
+call checks and passes outward until it is consumed
+'''
+
+CONDITIONS = {
+    'condition_==': operator.eq,
+    'condition_!=': operator.ne,
+    'condition_>': operator.gt,
+    'condition_<': operator.lt,
+    'condition_>=': operator.ge,
+    'condition_<=': operator.le,
+}
+
+
+# statements that may hand a signal to the statements around them
+SIGNALLING = {'if_stmt', 'fori_loop', 'foreach_loop', 'return', 'break', 'continue'}
+
+STATEMENTS = SIGNALLING | {'var_assign', 'list_assign', 'push', 'print', 'func_def'}
+
+
+# values a sum or product can make that the memory budget counts
+SIZED = frozenset((list, NumberList, Rope))
+
+
+# python frames a call of a script may take, with the statements and expressions it is nested in
+FRAMES_PER_CALL = 16
+
+# calls a run may have in progress when its budget has no depth limit
+CALL_DEPTH = 20000
+
+
+def nothing(frame):
+    return None
+
+
+def undefined(name, at=''):
+    writeLine("LookupError: Undefined variable '" + name + "' found!" + at)
+    exit()
+
+
+# =================================================================
+# RECURSION
+# =================================================================
+'''
+the engine recurses in python, a few frames for every call of a script
+and one for every statement and expression the call is nested in. while
+runs are going the recursion limit is raised so they can nest the depth
+of their budget in calls, CALL_DEPTH when it has none, and it is set back
+once the last one ends. from python 3.11 on a python function calling
+another does not grow the C stack, older versions keep their limit
+'''
+raised = {'runs': 0, 'limit': None}
+raising = threading.Lock()
+
+
+@contextmanager
+def deepStack(budget):
+    if sys.version_info < (3, 11):
+        yield
+        return
+
+    calls = budget.depth if budget.depth is not None else CALL_DEPTH
+    with raising:
+        if not raised['runs']:
+            raised['limit'] = sys.getrecursionlimit()
+        raised['runs'] += 1
+        wanted = raised['limit'] + FRAMES_PER_CALL * calls
+        if wanted > sys.getrecursionlimit():
+            sys.setrecursionlimit(wanted)
+    try:
+        yield
+    finally:
+        with raising:
+            raised['runs'] -= 1
+            if not raised['runs']:
+                sys.setrecursionlimit(raised['limit'])
+
+
+class ClosureCompiler:
+
+    # memoize is the cache size of every pure function, 0 turns it off
+    # a Profiler of s_profiler times every closure, without one nothing is wrapped
+    # positions of s_positions add the line and column of a node to its runtime errors
+    # seeded programs have their globals set before every run, see pureFunctions of s_memo
+    def __init__(self, memoize=0, profiler=None, positions=None, seeded=False):
+        self.memoize = memoize
+        self.seeded = seeded
+        self.profiler = profiler
+        self.positions = positions or {}
+        self.pure = set()
+        self.memos = []
+
+        self.handlers = {
+            'num': self.compileConstant,
+            'float': self.compileConstant,
+            'str': self.compileConstant,
+            'var_assign': self.compileVarAssign,
+            'var': self.compileVar,
+            'list_assign': self.compileListAssign,
+            'list_index': self.compileListIndex,
+            'pop': self.compilePop,
+            'push': self.compilePush,
+            'if_stmt': self.compileIf,
+            'func_def': self.compileFuncDef,
+            'func_call': self.compileFuncCall,
+            'return': self.compileReturn,
+            'break': self.compileJump,
+            'continue': self.compileJump,
+            '+': self.compileAdd,
+            '-': self.compileArithmetic,
+            '*': self.compileArithmetic,
+            '/': self.compileArithmetic,
+            '%': self.compileArithmetic,
+            'fori_loop': self.compileForiLoop,
+            'foreach_loop': self.compileForeachLoop,
+            'print': self.compilePrint,
+            'len': self.compileLen,
+            'hoisted': self.compileHoisted,
+        }
+        for name in CONDITIONS:
+            self.handlers[name] = self.compileCondition
+
+    # the returned program runs against an env dict of global variables
+    # the body of a program and the slots of its globals, for callers that fill and read its frame themselves
+    def compileBody(self, tree):
+        scope = Scope('program')
+        scope.collect(tree)
+        if self.memoize:
+            self.pure = pureFunctions(tree, self.seeded)
+        body = self.compileBlock(tree, scope)
+        if self.profiler is not None:
+            body = self.profiler.function('<program>', body)
+        return body, scope.slots
+
+    # budget is the Budget of s_budget the run is held to, None runs without limits
+    def compileProgram(self, tree):
+        body, slots = self.compileBody(tree)
+
+        def program(env, budget=None):
+            budget = budget or Budget()
+            budget.start()
+            frame = globalFrame(slots, env, budget)
+            try:
+                with deepStack(budget):
+                    body(frame)
+            except RecursionError:
+                raise BudgetExceeded('depth', None, budget.calls) from None
+            storeGlobals(slots, frame, env)
+        return program
+
+    # the position suffix of the errors of a node, worked out once while compiling
+    def where(self, node):
+        return where(self.positions.get(id(node)))
+
+    # the Budget of the run, from a frame of scope through its parents
+    def compileMeter(self, scope):
+        depth = scope.rootDepth()
+        if depth == 0:
+            return operator.itemgetter(0)
+        if depth == 1:
+            def meter(frame):
+                return frame[0][0]
+            return meter
+
+        def meter(frame):
+            for _ in range(depth):
+                frame = frame[0]
+            return frame[0]
+        return meter
+
+    def compile(self, node, scope):
+        if node is None:
+            return nothing
+
+        handler = self.handlers.get(node[0])
+        if handler is None:
+            return nothing
+        if self.profiler is not None:
+            return self.profiler.node(node, handler(node, scope))
+        return handler(node, scope)
+
+    # ===================================================
+    # ADJACENT STATEMENTS
+    # ===================================================
+    def compileBlock(self, nodes, scope):
+        nodes = asList(nodes)
+        steps = tuple(self.compileStatement(x, scope) for x in nodes)
+
+        if len(steps) == 1:
+            return steps[0]
+
+        if not any(x[0] in SIGNALLING for x in nodes):
+            def block(frame):
+                for step in steps:
+                    step(frame)
+            return block
+
+        def block(frame):
+            for step in steps:
+                signal = step(frame)
+                if signal is not None:
+                    return signal
+        return block
+
+    # the value of an expression used as a statement is dropped
+    def compileStatement(self, node, scope):
+        if node[0] in STATEMENTS:
+            step = self.compile(node, scope)
+        else:
+            expr = self.compile(node, scope)
+
+            def step(frame):
+                expr(frame)
+
+        if self.profiler is not None:
+            return self.profiler.statement(node, step)
+        return step
+
+    # ===================================================
+    # BASE Nodes
+    # ===================================================
+    def compileConstant(self, node, scope):
+        value = node[1]
+
+        def constant(frame):
+            return value
+        return constant
+
+    def compileVarAssign(self, node, scope):
+        name = node[1]
+        slot = scope.declare(name)
+        expr = self.compile(node[2], scope)
+
+        def varAssign(frame):
+            frame[slot] = expr(frame)
+        return varAssign
+
+    # ---------------------
+    # getting variable values based on scope hierarchy
+    def compileVar(self, node, scope):
+        return self.compileLookup(node[1], scope, node)
+
+    def compileLookup(self, name, scope, node):
+        candidates, certain = scope.resolve(name)
+        at = self.where(node)
+
+        if len(candidates) == 1:
+            depth, slot = candidates[0]
+
+            if certain and depth == 0:
+                def var(frame):
+                    return frame[slot]
+                return var
+
+            if depth == 0:
+                def var(frame):
+                    value = frame[slot]
+                    if value is UNSET:
+                        undefined(name, at)
+                    return value
+                return var
+
+            if depth == 1:
+                def var(frame):
+                    value = frame[0][slot]
+                    if value is UNSET:
+                        undefined(name, at)
+                    return value
+                return var
+
+        # search for var from current to top
+        def var(frame):
+            value = lookup(frame, candidates)
+            if value is UNSET:
+                undefined(name, at)
+            return value
+        return var
+
+    # ===================================================
+    # ARRAY CONTROLS
+    # ===================================================
+    def compileListAssign(self, node, scope):
+        name = node[1]
+        slot = scope.declare(name)
+        items = tuple(self.compile(x, scope) for x in asList(node[2]))
+        meter = self.compileMeter(scope)
+
+        def listAssign(frame):
+            meter(frame).allocate(ITEM_SIZE * len(items))
+            frame[slot] = makeList([item(frame) for item in items])
+        return listAssign
+
+    # ---------------------
+    # getting index like some_array[3]
+    def compileListIndex(self, node, scope):
+        name = node[1]
+        holder = self.compileLookup(name, scope, node)
+        index = self.compile(node[2], scope)
+        at = self.where(node)
+
+        def listIndex(frame):
+            value = holder(frame)
+
+            # ckeck if holder is list, number lists are indexed in their array
+            if type(value) is not list:
+                if type(value) is not NumberList:
+                    writeLine('Index Error: only var of type list can be accessed by index' + at)
+                    exit()
+                value = value.items
+
+            try:
+                return value[index(frame)]
+            except IndexError:
+                writeLine("Index Error: index out of bound of array: " + name + at)
+                return -1
+        return listIndex
+
+    # ---------------------
+    # pop from list
+    def compilePop(self, node, scope):
+        name = node[1]
+        holder = self.compileLookup(name, scope, node)
+        meter = self.compileMeter(scope)
+        at = self.where(node)
+
+        def pop(frame):
+            popped = holder(frame)
+            if not isinstance(popped, LISTS):
+                writeLine("TypeError: pop method is only defined for list type" + at)
+                exit()
+            try:
+                value = popped.pop()
+            except IndexError:
+                # the walker reports an empty list like a missing one
+                writeLine("LookupError: Undefined variable '" + name + "' found!" + at)
+                return -1
+            meter(frame).release(ITEM_SIZE)
+            return value
+        return pop
+
+    # ---------------------
+    # push for list
+    def compilePush(self, node, scope):
+        name = node[1]
+        holder = self.compileLookup(name, scope, node)
+        expr = self.compile(node[2], scope)
+        meter = self.compileMeter(scope)
+        at = self.where(node)
+
+        def push(frame):
+            pushed = holder(frame)
+            if not isinstance(pushed, LISTS):
+                writeLine("TypeError: push method is only defined for list type" + at)
+                exit()
+            meter(frame).allocate(ITEM_SIZE)
+            pushed.append(expr(frame))
+        return push
+
+    # ===================================================
+    # IF STATEMENTS
+    # ===================================================
+    def compileIf(self, node, scope):
+        # every branch becomes a (condition, body) pair, else has no condition
+        branches = [(self.compile(node[1][1], scope), self.compileBlock(node[1][2], scope))]
+        for branch in asList(node[1][3]):
+            if branch[0] == 'else_if':
+                branches.append((self.compile(branch[1], scope), self.compileBlock(branch[2], scope)))
+            elif branch[0] == 'else':
+                branches.append((None, self.compileBlock(branch[1], scope)))
+                break
+        branches = tuple(branches)
+
+        def ifStmt(frame):
+            for condition, body in branches:
+                if condition is None or condition(frame):
+                    return body(frame)
+        return ifStmt
+
+    # ===================================================
+    # CONDITIONS
+    # ===================================================
+    def compileCondition(self, node, scope):
+        op = CONDITIONS[node[0]]
+        left = self.compile(node[1], scope)
+        right = self.compile(node[2], scope)
+
+        def condition(frame):
+            return op(left(frame), right(frame))
+        return condition
+
+    # ===================================================
+    # FUNCTIONS
+    # ===================================================
+    def compileFuncDef(self, node, scope):
+        name = node[1]
+        slot = scope.declare(name)
+        parameters = tuple(asList(node[2]))
+
+        functionScope = Scope('function', scope, parameters)
+        functionScope.collect(node[3])
+        definition = self.compileBlock(node[3], functionScope)
+        if self.profiler is not None:
+            definition = self.profiler.function(name, definition)
+
+        size = functionScope.size
+        returnSlot = functionScope.slots.get(RETURN)
+        pooled = not definesFunction(node[3])
+
+        memo = None
+        if id(node) in self.pure:
+            memo = MemoCache(name, self.memoize)
+            self.memos.append(memo)
+
+        def funcDef(frame):
+            frame[slot] = Function(name, len(parameters), returnSlot, size, definition, frame, pooled, memo)
+        return funcDef
+
+    def compileFuncCall(self, node, scope):
+        name = node[1]
+        candidates, _ = scope.resolve(name)
+        args = tuple(self.compile(x, scope) for x in asList(node[2]))
+        argc = len(args)
+        meter = self.compileMeter(scope)
+        at = self.where(node)
+
+        builtin = BUILTINS.get(name)
+
+        def funcCall(frame):
+            function = lookup(frame, candidates)
+            if not isinstance(function, Function):
+                # builtins of s_lists run when no function of their name is defined
+                if builtin is not None and function is UNSET:
+                    if builtin[0] != argc:
+                        writeLine('ParameterError: Given parameters don\'t match inputs' + at)
+                        exit()
+                    res = builtin[1](*[arg(frame) for arg in args])
+                    meter(frame).allocate(sizeOf(res))
+                    return res
+                writeLine("LookupError -> Undefined function '%s'" % name + at)
+                return -1
+
+            # comparing parameters satisfaction
+            if function.arity != argc:
+                writeLine('ParameterError: Given parameters don\'t match inputs' + at)
+                exit()
+
+            budget = meter(frame)
+            budget.left -= 1
+            if budget.left < 0:
+                budget.check()
+
+            values = [arg(frame) for arg in args]
+            memo = function.memo
+            pending = None
+            if memo is not None:
+                key = memoKey(values)
+                res = memo.get(key)
+                if res is not UNSET:
+                    return res
+                pending = [(memo, key, linesWritten())]
+
+            # every call runs in a frame of its own
+            budget.calls += 1
+            if budget.calls > budget.deepest:
+                budget.tooDeep(budget.calls)
+            callee = function.enter(values)
+            function.body(callee)
+            res = function.leave(callee)
+
+            # a tail call runs in the frame just given back, at the same depth
+            while type(res) is TailCall:
+                budget.left -= 1
+                if budget.left < 0:
+                    budget.check()
+                function = res.function
+                values = res.values
+                memo = function.memo
+                if memo is not None:
+                    key = memoKey(values)
+                    res = memo.get(key)
+                    if res is not UNSET:
+                        break
+                    if pending is None:
+                        pending = []
+                    pending.append((memo, key, linesWritten()))
+                callee = function.enter(values)
+                function.body(callee)
+                res = function.leave(callee)
+            budget.calls -= 1
+
+            # the result of every memoized function of the chain
+            if pending is not None:
+                storeResult(pending, res)
+            return res
+        return funcCall
+
+    # return f(...) in a function hands the call back to the call running the function,
+    # builtins and calls that fail are called as they are
+    def compileTailCall(self, node, scope):
+        call = self.compile(node, scope)
+        candidates, _ = scope.resolve(node[1])
+        args = tuple(self.compile(x, scope) for x in asList(node[2]))
+        argc = len(args)
+
+        def tailCall(frame):
+            function = lookup(frame, candidates)
+            if type(function) is not Function or function.arity != argc:
+                return call(frame)
+            return TailCall(function, [arg(frame) for arg in args])
+        return tailCall
+
+    # the value goes to the frame of the function, however deep in loops
+    def compileReturn(self, node, scope):
+        functionScope, depth = scope.function()
+        slot = functionScope.declare(RETURN)
+        if node[1][0] == 'func_call' and functionScope.kind == 'function':
+            expr = self.compileTailCall(node[1], scope)
+        else:
+            expr = self.compile(node[1], scope)
+
+        if depth == 0:
+            def ret(frame):
+                frame[slot] = expr(frame)
+                return RETURNED
+            return ret
+
+        def ret(frame):
+            holder = frame
+            for _ in range(depth):
+                holder = holder[0]
+            holder[slot] = expr(frame)
+            return RETURNED
+        return ret
+
+    def compileJump(self, node, scope):
+        if scope.kind not in ('fori', 'foreach'):
+            writeLine(f"SyntaxError: '{node[0]}' outside loop" + self.where(node))
+            exit()
+
+        signal = BREAK if node[0] == 'break' else CONTINUE
+
+        def jump(frame):
+            return signal
+        return jump
+
+    # ===================================================
+    # EXPRESSIONS
+    # ===================================================
+    def compileAdd(self, node, scope):
+        left = self.compile(node[1], scope)
+        right = self.compile(node[2], scope)
+        meter = self.compileMeter(scope)
+        at = self.where(node)
+
+        def add(frame):
+            res1 = left(frame)
+            res2 = right(frame)
+
+            # numbers and short strings need no checks
+            if type(res1) is int or type(res1) is float:
+                if type(res2) is int or type(res2) is float:
+                    return res1 + res2
+            elif type(res1) is str and type(res2) is str and len(res1) + len(res2) < ROPE_SIZE:
+                return res1 + res2
+
+            # type checking
+            if isinstance(res1, STRINGS):
+                if isinstance(res2, (int, float)):
+                    writeLine(f"Type Error: Cannot do arithmetic operation On Type {typeOf(res1)} and {typeOf(res2)}{at}")
+                    return -1
+                res = concat(res1, res2) if type(res1) is str and type(res2) is str else res1 + res2
+                if type(res) is Rope:
+                    meter(frame).allocate(addedSize(res1, res))
+                return res
+            elif isinstance(res2, STRINGS):
+                if isinstance(res1, (int, float)):
+                    writeLine(f"Type Error: Cannot do arithmetic operation On Type {typeOf(res1)} and {typeOf(res2)}{at}")
+                    return -1
+            res = res1 + res2
+            if type(res) in SIZED:
+                meter(frame).allocate(addedSize(res1, res))
+            return res
+        return add
+
+    def compileArithmetic(self, node, scope):
+        op = {
+            '-': operator.sub,
+            '*': operator.mul,
+            '/': operator.truediv,
+            '%': operator.mod,
+        }[node[0]]
+        left = self.compile(node[1], scope)
+        right = self.compile(node[2], scope)
+        meter = self.compileMeter(scope)
+        at = self.where(node)
+
+        def arithmetic(frame):
+            res1 = left(frame)
+            res2 = right(frame)
+            if type(res1) is int or type(res1) is float:
+                if type(res2) is int or type(res2) is float:
+                    return op(res1, res2)
+            if isinstance(res1, STRINGS) or isinstance(res2, STRINGS):
+                writeLine(f'Type Error: cannot do subtraction of string type{at}')
+                return -1
+            return op(res1, res2)
+
+        if node[0] != '*':
+            return arithmetic
+
+        # a list repeated by a number is counted before it is made
+        def multiply(frame):
+            res1 = left(frame)
+            res2 = right(frame)
+            if type(res1) is int or type(res1) is float:
+                if type(res2) is int or type(res2) is float:
+                    return res1 * res2
+            if isinstance(res1, STRINGS) or isinstance(res2, STRINGS):
+                writeLine(f'Type Error: cannot do subtraction of string type{at}')
+                return -1
+            meter(frame).allocate(repeatSize(res1, res2))
+            return res1 * res2
+        return multiply
+
+    # ===================================================
+    # FOR I LOOP
+    # ===================================================
+    def compileForiLoop(self, node, scope):
+        setup = node[1]
+        loopScope = Scope('fori', scope)
+        slot = loopScope.declare(setup[1][1])
+        loopScope.collect(node[2])
+
+        # the slots of the expressions the optimizer hoisted out of the body
+        for name in node[3] if len(node) > 3 else ():
+            loopScope.declare(name, certain=True)
+
+        # the iterator is only certain once the start value is assigned
+        start = self.compile(setup[1][2], loopScope)
+        loopScope.declare(setup[1][1], certain=True)
+        limit = self.compile(setup[2], loopScope)
+
+        body = self.compileBlock(node[2], loopScope)
+        bulk = self.compileBulk(node, loopScope)
+        size = loopScope.size
+        meter = self.compileMeter(scope)
+        at = self.where(node)
+
+        def foriLoop(frame):
+            budget = meter(frame)
+            loopFrame = newFrame(frame, size)
+
+            # set variable i and get the limit of the loop
+            loopFrame[slot] = start(loopFrame)
+            stop = limit(loopFrame)
+
+            # check if the loop is valid
+            if not isinstance(stop, int):
+                writeLine("TypeError: Cannot iterate of variable type: " + str(typeOf(stop)) + at)
+                exit()
+
+            if bulk is not None and bulk(loopFrame, range(loopFrame[slot], stop), budget):
+                return None
+
+            # main logic of the loop
+            for iterator in range(loopFrame[slot], stop):
+                budget.left -= 1
+                if budget.left < 0:
+                    budget.check()
+                loopFrame[slot] = iterator
+                signal = body(loopFrame)
+                if signal is not None:
+                    if signal is BREAK:
+                        break
+                    if signal is RETURNED:
+                        return signal
+        return foriLoop
+
+    # ---------------------
+    # an expression hoisted out of a loop, its value is kept in the loop frame
+    # once it was worked out without printing an error
+    def compileHoisted(self, node, scope):
+        (depth, slot), = scope.resolve(node[1])[0]
+        expr = self.compile(node[2], scope)
+
+        def evaluate(holder, frame):
+            written = linesWritten()
+            value = expr(frame)
+            if linesWritten() == written:
+                holder[slot] = value
+            return value
+
+        if depth == 0:
+            def hoisted(frame):
+                value = frame[slot]
+                if value is UNSET:
+                    return evaluate(frame, frame)
+                return value
+            return hoisted
+
+        def hoisted(frame):
+            holder = frame
+            for _ in range(depth):
+                holder = holder[0]
+            value = holder[slot]
+            if value is UNSET:
+                return evaluate(holder, frame)
+            return value
+        return hoisted
+
+    # ===================================================
+    # FOR EACH LOOP
+    # ===================================================
+    def compileForeachLoop(self, node, scope):
+        setup = node[1]
+
+        # the list is looked up before the loop scope holds anything
+        iterable = self.compileLookup(setup[2], scope, node)
+        at = self.where(node)
+
+        loopScope = Scope('foreach', scope)
+        slot = loopScope.declare(setup[1], certain=True)
+        loopScope.collect(node[2])
+        body = self.compileBlock(node[2], loopScope)
+        bulk = self.compileBulk(node, loopScope)
+        size = loopScope.size
+        meter = self.compileMeter(scope)
+
+        # a body that can not push leaves a number list in its array, which is walked directly
+        steady = not mutatedLists(node[2]) and not hasCalls(node[2])
+
+        def foreachLoop(frame):
+            # for loop is only for list and str
+            items = iterable(frame)
+            if not isinstance(items, (list, str, Rope)) and type(items) is not NumberList:
+                writeLine("TypeError: foreach loop is only for list or string type" + at)
+                exit()
+
+            budget = meter(frame)
+            loopFrame = newFrame(frame, size)
+            if bulk is not None and bulk(loopFrame, items, budget):
+                return None
+            if steady and type(items) is NumberList:
+                items = items.items
+
+            for x in items:
+                budget.left -= 1
+                if budget.left < 0:
+                    budget.check()
+                loopFrame[slot] = x
+                signal = body(loopFrame)
+                if signal is not None:
+                    if signal is BREAK:
+                        break
+                    if signal is RETURNED:
+                        return signal
+        return foreachLoop
+
+    # ---------------------
+    # a loop s_idioms recognizes, runs it in bulk and tells if it did
+    # its iterations and the items a fill pushes are counted before it runs and given back if it does not
+    def compileBulk(self, node, scope):
+        idiom = recognize(node)
+        if idiom is None:
+            return None
+        loop = BulkLoop(idiom)
+        reads = tuple(scope.resolve(name)[0] for name in idiom.names)
+        # a sum leaves its total where the first assignment of the body would have
+        slot = scope.slots[idiom.target] if idiom.kind == 'sum' else None
+
+        def bulk(frame, items, budget):
+            count = len(items)
+            size = ITEM_SIZE * count if slot is None else 0
+            budget.charge(count)
+            budget.allocate(size)
+            result = loop.run([lookup(frame, candidates) for candidates in reads], items)
+            if result is FALLBACK:
+                budget.left += count
+                budget.release(size)
+                return False
+            if slot is not None:
+                frame[slot] = result
+            return True
+        return bulk
+
+    # ===================================================
+    # PRINT COMMAND
+    # ===================================================
+    def compilePrint(self, node, scope):
+        expr = self.compile(node[1], scope)
+
+        def printStmt(frame):
+            writeLine(display(expr(frame)))
+        return printStmt
+
+    # ===================================================
+    # LEN FOR STRINGS AND LISTS
+    # ===================================================
+    def compileLen(self, node, scope):
+        expr = self.compile(node[1], scope)
+        at = self.where(node)
+
+        def length(frame):
+            res = expr(frame)
+            if isinstance(res, (str, Rope, list, NumberList)):
+                return len(res)
+            writeLine('TypeError: len() only accepts list and strings' + at)
+            exit()
+        return length
@@ -2,51 +2,146 @@
 # DRIVER OF THE PROGRAM
 # ==========================================================================================
 import os
+import sys
 
+from s_cache import MISSING, CompileCache, fileHash
 from s_interpreter import Interpreter
-from s_lexer import SadeqLexer, readFile, stringifyTokens
-from s_parser import SadeqParser, makeTreeHandler
+from s_optimizer import Optimizer
+from s_output import OutputBuffer
+from s_lexer import SadeqLexer, dumpTokens, tokenizeFile
+from s_parser import SadeqParser
+from s_positions import PositionTable
+
+# 0 runs the tree as parsed, see s_optimizer.py for what every level adds
+OPTIMIZATION_LEVEL = 3
+
+# cache size of every pure function, 0 runs every call, see s_memo.py
+MEMOIZE = 0
+
+# keeps the trees of unchanged scripts in CACHE, see s_cache.py
+USE_CACHE = True
+
+# writes every token to OUTPUT/tokens.txt while the parser reads them
+DUMP_TOKENS = True
+
+# bytes the token dump collects before writing them out
+DUMP_BUFFER = 1 << 20
+
+# writes the json and a drawing of the tree to OUTPUT/treeRepresentation.txt, see s_dump.py
+DUMP_TREE = False
+
+# times the run by function, node kind and line into OUTPUT/profile.txt and
+# OUTPUT/profile.folded, see s_profiler.py
+PROFILE = False
+
+# characters the output of a script collects before they are written, see s_output.py
+OUTPUT_BUFFER = 1 << 16
+
+# seconds after which collected output is written even when the buffer is not full, None waits for it
+FLUSH_INTERVAL = 0.5
+
+OUTPUT_DIR = 'OUTPUT'
+
+
+def outputPath(name):
+    return os.path.join(OUTPUT_DIR, name)
+
+
+# the tree of a script file and its PositionTable, from the cache when the script is unchanged
+# the tokens are written to the file tokenDump names while the parser reads them, only when it runs
+def parseScript(path, lexer, parser, cache=None, tokenDump=None):
+    key = fileHash(path) if cache is not None else None
+    parsed = cache.load(key) if key is not None else MISSING
+    if parsed is not MISSING:
+        tupleTree, positionTable = parsed
+        return tupleTree, PositionTable.load(positionTable), key
+
+    # tokenizing the input as the parser asks for tokens, tee'd to the dump
+    # ---------------------------------------
+    tokens = tokenizeFile(lexer, path)
+    dump = None
+    if tokenDump is not None:
+        dump = open(tokenDump, "w+", buffering=DUMP_BUFFER)
+        tokens = dumpTokens(tokens, dump)
+
+    # parsing and generating AST
+    # ---------------------------------------
+    try:
+        tupleTree = parser.parse(tokens)
+    finally:
+        if dump is not None:
+            dump.close()
+    positionTable = PositionTable.fromParser(parser, lexer, tupleTree)
+
+    # broken trees are never cached, key None tells the optimized form not to be either
+    if parser.errors:
+        return tupleTree, positionTable, None
+    if key is not None:
+        cache.store(key, (tupleTree, positionTable.dump()))
+    return tupleTree, positionTable, key
+
+
+# the optimized tree, the optimizer report and the positions of the optimized nodes
+def optimizeScript(tupleTree, positionTable, level=OPTIMIZATION_LEVEL, cache=None, key=None):
+    form = f'optimized{level}'
+    optimized = cache.load(key, form) if key is not None else MISSING
+    if optimized is MISSING:
+        positions = positionTable.positions(tupleTree)
+        optimizer = Optimizer(level, positions)
+        tupleTree = optimizer.optimize(tupleTree)
+        optimized = (tupleTree, optimizer.report(), PositionTable.fromPositions(tupleTree, positions).dump())
+        if key is not None:
+            cache.store(key, optimized, form)
+
+    tupleTree, optimizerReport, positionTable = optimized
+    return tupleTree, optimizerReport, PositionTable.load(positionTable).positions(tupleTree)
+
 
 if __name__ == '__main__':
     lexer = SadeqLexer()
     parser = SadeqParser()
 
-    # reading the file
+    # choosing the file, it is streamed and never read whole
     # ---------------------------------------
     print('----------------------------------------------')
     fileName = input('PARSE FILE ==> ')
-    script = readFile(f'INPUT/{fileName}')
+    path = os.path.join('INPUT', fileName)
 
     # empty space
     print('\n\n')
 
-    # tokenizing the input
-    # ---------------------------------------
-    tokens = lexer.tokenize(script)
-    tokenString = stringifyTokens(tokens)
-    f = open('OUTPUT\\tokens.txt', "w+")
-    f.write(tokenString)
-    f.close()
+    # an unchanged script skips lexing and parsing, tokens.txt is then left as it was
+    # the tree is cached with the line and column of its nodes, see s_positions.py
+    cache = CompileCache() if USE_CACHE else None
+    tupleTree, positionTable, key = parseScript(path, lexer, parser, cache,
+                                                outputPath('tokens.txt') if DUMP_TOKENS else None)
 
-    # parsing and generating AST
-    # ---------------------------------------
-    tupleTree = parser.parse(lexer.tokenize(script))
-    if tupleTree is not None:
-        tree = makeTreeHandler(tupleTree)
-
-        # writing to file
-        os.remove('OUTPUT\\treeRepresentation.txt')
-        f = open('OUTPUT\\treeRepresentation.txt', "w+")
-        import json
-        f.write(json.dumps(tupleTree) + '\n\n\n')
-        f.close()
+    if DUMP_TREE and tupleTree is not None:
+        from s_dump import dumpTree
+        dumpTree(tupleTree, outputPath('treeRepresentation.txt'))
 
-        tree.save2file(filename='OUTPUT\\treeRepresentation.txt', reverse=True)
+    # optimizing the tree
+    # ---------------------------------------
+    tupleTree, optimizerReport, positions = optimizeScript(tupleTree, positionTable, OPTIMIZATION_LEVEL, cache, key)
+    f = open(outputPath('optimizer.txt'), "w+")
+    f.write(optimizerReport + '\n')
+    f.close()
 
     # setting up env and execute
     # ---------------------------------------
     env = {}
-    Interpreter(tupleTree, env)
-
-
-    
+    profiler = None
+    if PROFILE:
+        from s_profiler import Profiler
+        profiler = Profiler(positions)
+    output = OutputBuffer(sys.stdout, OUTPUT_BUFFER, FLUSH_INTERVAL)
+    interpreter = Interpreter(tupleTree, env, memoize=MEMOIZE, profile=profiler, positions=positions, output=output)
+    if MEMOIZE:
+        f = open(outputPath('memo.txt'), "w+")
+        f.write(interpreter.memoReport() + '\n')
+        f.close()
+    if PROFILE:
+        f = open(outputPath('profile.txt'), "w+")
+        f.write(profiler.report())
+        f.close()
+        profiler.writeCollapsed(outputPath('profile.folded'))
@@ -0,0 +1,131 @@
+import json
+from json.encoder import encode_basestring_ascii
+
+'''
+writers of the tuple tree of SadeqParser for people to read
+
+writeJson writes the same text as json.dumps and writeTree draws the
+tree with one line per node, lists are transparent so the statements of
+a block are siblings. both walk the tree once with a stack of their own
+and write through a buffer of parts, so the cost is linear in the size
+of the tree and its depth never meets the recursion limit
+'''
+
+# parts collected before they are written out
+BUFFER_PARTS = 4096
+
+
+class Buffer:
+
+    def __init__(self, out):
+        self.out = out
+        self.parts = []
+
+    def write(self, part):
+        self.parts.append(part)
+        if len(self.parts) >= BUFFER_PARTS:
+            self.flush()
+
+    def flush(self):
+        self.out.write(''.join(self.parts))
+        self.parts.clear()
+
+
+def encodeValue(value):
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if value is None:
+        return 'null'
+    if type(value) is int:
+        return repr(value)
+    return json.dumps(value)
+
+
+# =================================================================
+# JSON
+# =================================================================
+def writeJson(tree, out):
+    buffer = Buffer(out)
+    if not isinstance(tree, (list, tuple)):
+        buffer.write(encodeValue(tree))
+        buffer.flush()
+        return
+
+    buffer.write('[')
+    stack = [iter(tree)]
+    first = True
+    while stack:
+        for value in stack[-1]:
+            if not first:
+                buffer.write(', ')
+            if isinstance(value, (list, tuple)):
+                buffer.write('[')
+                stack.append(iter(value))
+                first = True
+                break
+            buffer.write(encodeValue(value))
+            first = False
+        else:
+            stack.pop()
+            buffer.write(']')
+            first = False
+    buffer.flush()
+
+
+# =================================================================
+# INDENTED TREE
+# =================================================================
+END = object()
+
+
+# the children of a node, the items of nested lists are children of their own
+def children(items):
+    stack = [iter(items)]
+    while stack:
+        for value in stack[-1]:
+            if isinstance(value, list):
+                stack.append(iter(value))
+                break
+            yield value
+        else:
+            stack.pop()
+
+
+def label(node):
+    if isinstance(node, tuple):
+        return str(node[0]) if node else '()'
+    if node is None:
+        return 'none'
+    return str(node)
+
+
+def writeTree(tree, out, root='PROGRAM'):
+    buffer = Buffer(out)
+    buffer.write(root + '\n')
+
+    top = children(tree if isinstance(tree, list) else [tree])
+    # every level keeps its children, the next one to draw and the prefix of its lines
+    stack = [[top, next(top, END), '']]
+    while stack:
+        level = stack[-1]
+        node = level[1]
+        if node is END:
+            stack.pop()
+            continue
+
+        level[1] = next(level[0], END)
+        last = level[1] is END
+        buffer.write(f"{level[2]}{'└── ' if last else '├── '}{label(node)}\n")
+
+        if isinstance(node, tuple) and len(node) > 1:
+            nested = children(node[1:])
+            stack.append([nested, next(nested, END), level[2] + ('    ' if last else '│   ')])
+    buffer.flush()
+
+
+# the json of the tree followed by its drawing, the layout of OUTPUT/treeRepresentation.txt
+def dumpTree(tree, fileName):
+    with open(fileName, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        writeJson(tree, f)
+        f.write('\n\n\n')
+        writeTree(tree, f)
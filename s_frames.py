@@ -0,0 +1,100 @@
+from s_resolver import UNSET, newFrame
+
+'''
+call frames of the compiled engines
+
+every call gets a frame of its own, its parent is the frame the function
+was defined in and the arguments fill the first slots in order. frames
+are taken from a pool kept by each function and given back on return,
+so recursive and call heavy programs reuse the same few lists
+'''
+
+class Signal:
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f'<{self.name}>'
+
+
+# handed outward by statements instead of raising, see s_closure
+BREAK = Signal('break')
+CONTINUE = Signal('continue')
+RETURNED = Signal('return')
+
+# the value of return f(...) in a function, the call running the function
+# runs f in its place once it gave its frame back, so tail calls do not nest
+class TailCall:
+
+    __slots__ = ('function', 'values')
+
+    def __init__(self, function, values):
+        self.function = function
+        self.values = values
+
+
+# frames kept per function, deeper recursion allocates beyond this
+POOL_LIMIT = 64
+
+
+class FramePool:
+
+    def __init__(self, size, limit=POOL_LIMIT):
+        self.size = size
+        self.limit = limit
+        self.blank = [UNSET] * size
+        self.free = []
+
+    def acquire(self, parent):
+        if self.free:
+            frame = self.free.pop()
+            frame[0] = parent
+            return frame
+        return newFrame(parent, self.size)
+
+    def release(self, frame):
+        if len(self.free) < self.limit:
+            frame[0] = None
+            frame[1:] = self.blank
+            self.free.append(frame)
+
+
+class Function:
+
+    '''
+    parameters are the first slots of the function scope, arity is their count
+    closure is the frame the function was defined in, functions that define
+    other functions get no pool as their frames may outlive the call
+    memo is the MemoCache of the definition when the function is pure and
+    memoization is on, see s_memo
+    '''
+    def __init__(self, name, arity, returnSlot, size, body, closure, pooled=True, memo=None):
+        self.name = name
+        self.arity = arity
+        self.returnSlot = returnSlot
+        self.size = size
+        self.body = body
+        self.closure = closure
+        self.pool = FramePool(size) if pooled else None
+        self.memo = memo
+
+    def __repr__(self):
+        return f'<function {self.name}>'
+
+    def enter(self, values):
+        if self.pool is not None:
+            frame = self.pool.acquire(self.closure)
+        else:
+            frame = newFrame(self.closure, self.size)
+        frame[1:self.arity + 1] = values
+        return frame
+
+    # reads the return value and hands the frame back to the pool
+    def leave(self, frame):
+        res = None
+        if self.returnSlot is not None and frame[self.returnSlot] is not UNSET:
+            res = frame[self.returnSlot]
+        if self.pool is not None:
+            self.pool.release(frame)
+        return res
@@ -0,0 +1,271 @@
+from functools import reduce
+from operator import add
+
+from s_lists import LISTS, NumberList
+from s_resolver import asList
+from s_strings import STRINGS
+
+'''
+loops the compiled engines run as one bulk operation instead of one
+iteration at a time
+
+a fori or foreach loop whose body is a single statement of one of these
+shapes is an idiom:
+    fill    push(L, term)        the terms of every iteration pushed at once
+    sum     s = s + term         the terms added up in order with reduce
+
+a term is arithmetic of numbers, the iterator, variables the body does
+not assign, their len and, in fori loops, items of lists at the iterator
+plus or minus a constant. it becomes a python comprehension over the iterator,
+so the loop runs at the speed of python itself
+
+before running, every variable is looked up once and the bulk run only
+goes ahead when the loop could not have printed or failed: every value
+is a number and no bool, every list holds only numbers and every index
+stays in range, divisors are not zero and the filled list is not one
+the term reads. otherwise the engine runs the loop as it always did
+
+the language keeps variables assigned in a loop in the loop's own scope,
+so the total of a sum ends up in the loop scope like it would have
+'''
+
+NUMBERS = (int, float)
+
+ARITHMETIC = ('+', '-', '*', '/', '%')
+
+
+class Fallback:
+
+    def __repr__(self):
+        return '<fallback>'
+
+
+# what a bulk run returns when the loop has to run one iteration at a time
+FALLBACK = Fallback()
+
+
+# =================================================================
+# RECOGNIZING
+# =================================================================
+class Idiom:
+
+    '''
+    kind is 'fill' or 'sum', target the list filled or the variable summed
+    reads are (name, role) pairs in the order the engines look them up:
+    the target first, then 'scalar' and 'list' variables of the term
+    source is the term in python over the iterator i and parameters named
+    after the reads, constants are passed in too so every float survives
+    '''
+    def __init__(self, kind, target, fori):
+        self.kind = kind
+        self.target = target
+        self.fori = fori
+        self.reads = [(target, 'target')]
+        self.parameters = ['t']
+        self.constants = []
+        self.divisors = set()
+        # offsets from the iterator every list is indexed at, by parameter
+        self.offsets = {}
+        self.source = None
+
+    @property
+    def names(self):
+        return [name for name, _ in self.reads]
+
+    def read(self, name, role):
+        for position, (known, knownRole) in enumerate(self.reads):
+            if known == name:
+                return self.parameters[position] if knownRole == role else None
+        self.reads.append((name, role))
+        self.parameters.append(f'v{len(self.parameters)}')
+        return self.parameters[-1]
+
+    def constant(self, value):
+        self.constants.append(value)
+        return f'c{len(self.constants) - 1}'
+
+
+# the offset of an index that is the iterator plus or minus a constant
+def offset(index, iterator):
+    if index == ('var', iterator):
+        return 0
+    if index[0] in ('+', '-') and index[1] == ('var', iterator) and index[2][0] == 'num':
+        return index[2][1] if index[0] == '+' else -index[2][1]
+    if index[0] == '+' and index[2] == ('var', iterator) and index[1][0] == 'num':
+        return index[1][1]
+    return None
+
+
+def translate(idiom, expr, iterator):
+    kind = expr[0]
+    if kind in ('num', 'float'):
+        if type(expr[1]) not in NUMBERS:
+            return None
+        return idiom.constant(expr[1])
+
+    if kind == 'var':
+        if expr[1] == iterator:
+            return 'i'
+        if expr[1] == idiom.target:
+            return None
+        return idiom.read(expr[1], 'scalar')
+
+    if kind in ARITHMETIC:
+        left = translate(idiom, expr[1], iterator)
+        right = translate(idiom, expr[2], iterator)
+        if left is None or right is None:
+            return None
+        if kind in ('/', '%'):
+            # a divisor is a constant or a variable, checked not to be zero before running
+            divisor = expr[2]
+            if divisor[0] in ('num', 'float'):
+                if not divisor[1]:
+                    return None
+            elif divisor[0] == 'var' and divisor[1] != iterator:
+                idiom.divisors.add(right)
+            else:
+                return None
+        return f'({left} {kind} {right})'
+
+    # the optimizer hoisted it, the term works it out every time
+    if kind == 'hoisted':
+        return translate(idiom, expr[2], iterator)
+
+    if kind == 'len' and expr[1][0] == 'var' and expr[1][1] not in (iterator, idiom.target):
+        return idiom.read(expr[1][1], 'length')
+
+    if kind == 'list_index' and idiom.fori and expr[1] != idiom.target:
+        shift = offset(expr[2], iterator)
+        if shift is None or type(shift) is not int:
+            return None
+        parameter = idiom.read(expr[1], 'list')
+        if parameter is None:
+            return None
+        idiom.offsets.setdefault(parameter, set()).add(shift)
+        return f'{parameter}[i + {shift}]'
+
+    return None
+
+
+# the Idiom of a fori_loop or foreach_loop node, or None when its body is none
+def recognize(node):
+    if node[0] == 'fori_loop':
+        iterator = node[1][1][1]
+        fori = True
+    elif node[0] == 'foreach_loop':
+        iterator = node[1][1]
+        fori = False
+    else:
+        return None
+
+    body = asList(node[2])
+    if len(body) != 1:
+        return None
+    statement = body[0]
+
+    if statement[0] == 'push':
+        idiom = Idiom('fill', statement[1], fori)
+        term = statement[2]
+    elif statement[0] == 'var_assign' and statement[2][0] == '+':
+        target = statement[1]
+        left, right = statement[2][1], statement[2][2]
+        if left == ('var', target):
+            term = right
+        elif right == ('var', target):
+            term = left
+        else:
+            return None
+        idiom = Idiom('sum', target, fori)
+    else:
+        return None
+
+    if idiom.target == iterator or (not fori and node[1][2] == idiom.target):
+        return None
+    idiom.source = translate(idiom, term, iterator)
+    if idiom.source is None:
+        return None
+    return idiom
+
+
+# =================================================================
+# RUNNING
+# =================================================================
+# the items of a list of numbers only, None for anything else
+def numbers(value):
+    if isinstance(value, NumberList):
+        if value.kind is not None:
+            return value.items
+        value = value.items
+    elif not isinstance(value, list):
+        return None
+    for x in value:
+        if type(x) not in NUMBERS:
+            return None
+    return value
+
+
+class BulkLoop:
+
+    def __init__(self, idiom):
+        self.idiom = idiom
+        parameters = ', '.join(['items'] + idiom.parameters[1:] + [f'c{k}' for k in range(len(idiom.constants))])
+        if idiom.kind == 'fill':
+            source = f'lambda {parameters}: [{idiom.source} for i in items]'
+        else:
+            source = f'lambda {parameters}: ({idiom.source} for i in items)'
+        # the source is made of generated names only, the values come in as arguments
+        self.terms = eval(source, {})
+
+    def __repr__(self):
+        return f'<{self.idiom.kind} {self.idiom.target}: {self.idiom.source}>'
+
+    '''
+    values are those of idiom.reads looked up in the loop frame before the
+    first iteration, items the range of a fori loop or the list of a
+    foreach loop. returns the total of a sum, None for a fill, or FALLBACK
+    '''
+    def run(self, values, items):
+        idiom = self.idiom
+        if not isinstance(items, (range, list, NumberList)) or not len(items):
+            return FALLBACK
+
+        target = values[0]
+        if idiom.kind == 'fill':
+            if not isinstance(target, LISTS):
+                return FALLBACK
+        elif type(target) not in NUMBERS:
+            return FALLBACK
+
+        if not idiom.fori:
+            if items is target:
+                return FALLBACK
+            items = numbers(items)
+            if items is None:
+                return FALLBACK
+
+        arguments = [items]
+        for (name, role), parameter, value in zip(idiom.reads[1:], idiom.parameters[1:], values[1:]):
+            if role == 'scalar':
+                if type(value) not in NUMBERS or (parameter in idiom.divisors and not value):
+                    return FALLBACK
+            elif role == 'length':
+                if value is target or not isinstance(value, STRINGS + LISTS):
+                    return FALLBACK
+                value = len(value)
+            else:
+                if value is target:
+                    return FALLBACK
+                value = numbers(value)
+                if value is None:
+                    return FALLBACK
+                shifts = idiom.offsets[parameter]
+                if items.start + min(shifts) < -len(value) or items.stop - 1 + max(shifts) >= len(value):
+                    return FALLBACK
+            arguments.append(value)
+        arguments.extend(idiom.constants)
+
+        terms = self.terms(*arguments)
+        if idiom.kind == 'sum':
+            return reduce(add, terms, target)
+        target.extend(terms)
+        return None
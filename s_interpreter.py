@@ -1,25 +1,117 @@
 import sys
-from pydash import set_, get, unset
+
+from s_budget import Budget
+from s_lists import BUILTINS, LISTS, makeList
+from s_output import display, redirected, writeLine
+
+# only the reference walker uses pydash, it is imported the first time it runs
+pydash = None
+
+
+def importPydash():
+    global pydash
+    if pydash is None:
+        import pydash
 
 
 def getFromDict(dataDict, mapList):
-    return get(dataDict, mapList)
+    return pydash.get(dataDict, mapList)
 
 
 def setInDict(dataDict, mapList, value):
-    return set_(dataDict, mapList, value)
+    return pydash.set_(dataDict, mapList, value)
 
 
 def deleteFromDict(dataDict, mapList):
-    unset(dataDict, mapList)
+    pydash.unset(dataDict, mapList)
 
 
 class Interpreter:
+    '''
+    mode 'closure' compiles the tree into closures once and runs them,
+    mode 'vm' compiles it to bytecode for the stack machine in s_bytecode,
+    mode 'walk' is the reference tree walker below
+
+    memoize is the LRU size of every pure function of the compiled engines,
+    0 leaves it off and the reference walker never memoizes, see s_memo
+
+    profile is a Profiler of s_profiler the closure engine reports its
+    time to, the other engines can not be profiled
+
+    positions maps the nodes of the tree to their source positions as
+    PositionTable.positions of s_positions makes it, the compiled engines
+    add them to their runtime errors
+
+    output is what the run prints to, an OutputBuffer of s_output or any
+    stream, flushed when the run ends however it ends. it is only written to
+    by this run, other threads keep their own. None prints to sys.stdout
+
+    budget is the Budget of s_budget the compiled engines hold the run to,
+    a run past one of its limits raises its BudgetExceeded. None runs
+    without limits, the steps and memory of the run are counted anyway
+    in self.budget
+    '''
+    MODES = ('closure', 'vm', 'walk')
+
+    def __init__(self, tree, env, mode='closure', memoize=0, profile=None, positions=None, output=None, budget=None):
+        if mode not in self.MODES:
+            raise ValueError(f"unknown interpreter mode '{mode}', expected one of {self.MODES}")
+        if profile is not None and mode != 'closure':
+            raise ValueError(f"mode '{mode}' can not be profiled, only 'closure' can")
+        if budget is not None and mode == 'walk':
+            raise ValueError("mode 'walk' can not be held to a budget, only the compiled engines can")
 
-    def __init__(self, tree, env):
         self.env = env
+        self.memos = []
+        self.budget = budget or Budget()
         self.currentNode = []
-        self.walkTree(tree)
+
+        # 'return', 'break' or 'continue' while statements are being skipped
+        self.signal = None
+        # length of currentNode at the start of every running function
+        self.functionDepths = [0]
+
+        try:
+            if output is None:
+                self.run(tree, env, mode, memoize, profile, positions)
+            else:
+                with redirected(output):
+                    self.run(tree, env, mode, memoize, profile, positions)
+        finally:
+            self.budget.stop()
+            if output is not None:
+                output.flush()
+
+    def run(self, tree, env, mode, memoize, profile, positions):
+        if mode == 'walk':
+            importPydash()
+            self.walkTree(tree)
+        elif mode == 'vm':
+            from s_bytecode import VirtualMachine, compileTree, memoCaches
+            program = compileTree(tree, memoize, positions)
+            self.memos = memoCaches(program)
+            VirtualMachine().run(program, env, self.budget)
+        else:
+            from s_closure import ClosureCompiler
+            compiler = ClosureCompiler(memoize, profile, positions)
+            program = compiler.compileProgram(tree)
+            self.memos = compiler.memos
+            program(env, self.budget)
+
+    # hits and misses of the memoized functions of the run
+    def memoReport(self):
+        from s_memo import memoReport
+        return memoReport(self.memos)
+
+    # consumes break and continue, a return is left for the function
+    def loopStopped(self):
+        signal = self.signal
+        if signal == 'continue':
+            self.signal = None
+        elif signal == 'break':
+            self.signal = None
+            return True
+        return signal == 'return'
 
     def walkTree(self, node):
 
@@ -27,6 +119,8 @@ class Interpreter:
         if isinstance(node, list):
             for x in node:
                 self.walkTree(x)
+                if self.signal is not None:
+                    return None
 
         # ===================================================
         # BASE Nodes
@@ -70,7 +164,7 @@ class Interpreter:
                 return self.env[node[1]]
 
             except LookupError:
-                print("LookupError: Undefined variable '" + node[1] + "' found!")
+                writeLine("LookupError: Undefined variable '" + node[1] + "' found!")
                 exit()
 
         # ===================================================
@@ -78,13 +172,13 @@ class Interpreter:
         # ===================================================
         if node[0] == 'list_assign':
             if node[2] is None:
-                setInDict(self.env, self.currentNode + [node[1]], [])
+                setInDict(self.env, self.currentNode + [node[1]], makeList([]))
                 return node[1]
             else:
                 holder = []
                 for x in node[2]:
                     holder.append(self.walkTree(x))
-                setInDict(self.env, self.currentNode + [node[1]], holder)
+                setInDict(self.env, self.currentNode + [node[1]], makeList(holder))
 
         # ---------------------
         # getting index like some_array[3]
@@ -93,18 +187,18 @@ class Interpreter:
                 holder = self.walkTree(('var', node[1]))
 
                 # ckeck if holder is list
-                if not isinstance(holder, list):
-                    print('Index Error: only var of type list can be accessed by index')
+                if not isinstance(holder, LISTS):
+                    writeLine('Index Error: only var of type list can be accessed by index')
                     exit()
 
                 holder = holder[self.walkTree(node[2])]
                 return holder
 
             except IndexError:
-                print("Index Error: index out of bound of array: " + node[1])
+                writeLine("Index Error: index out of bound of array: " + node[1])
                 return -1
             except LookupError:
-                print("LookupError: Undefined variable '" + node[1] + "' found!")
+                writeLine("LookupError: Undefined variable '" + node[1] + "' found!")
                 return -1
 
         # ---------------------
@@ -114,15 +208,15 @@ class Interpreter:
                 popped = getFromDict(self.env, self.currentNode + [node[1]])
                 if popped is None:
                     raise LookupError
-                elif not isinstance(popped, list):
+                elif not isinstance(popped, LISTS):
                     raise TypeError
                 return popped.pop()
 
             except LookupError:
-                print("LookupError: Undefined variable '" + node[1] + "' found!")
+                writeLine("LookupError: Undefined variable '" + node[1] + "' found!")
                 return -1
             except TypeError:
-                print("TypeError: pop method is only defined for list type")
+                writeLine("TypeError: pop method is only defined for list type")
                 exit()
 
         # ---------------------
@@ -132,16 +226,16 @@ class Interpreter:
                 pushed = self.walkTree(('var', node[1]))
                 if pushed is None:
                     raise LookupError
-                elif not isinstance(pushed, list):
+                elif not isinstance(pushed, LISTS):
                     raise TypeError
                 pushed.append(self.walkTree(node[2]))
 
             except LookupError:
-                print("LookupError: Undefined variable '" + node[1] + "' found!")
+                writeLine("LookupError: Undefined variable '" + node[1] + "' found!")
                 exit()
 
             except TypeError as e:
-                print("TypeError: push method is only defined for list type")
+                writeLine("TypeError: push method is only defined for list type")
                 exit()
 
         # ===================================================
@@ -193,6 +287,15 @@ class Interpreter:
                 setInDict(self.env, self.currentNode + [node[1]] + ['%pars%'], tuple(node[2]))
 
         if node[0] == 'func_call':
+            # builtins of s_lists run when no function of their name is defined
+            if node[1] in BUILTINS and getFromDict(self.env, self.currentNode + [node[1], '%def%']) is None:
+                arity, builtin = BUILTINS[node[1]]
+                args = node[2] if isinstance(node[2], list) else [x for x in [node[2]] if x is not None]
+                if arity != len(args):
+                    writeLine('ParameterError: Given parameters don\'t match inputs')
+                    exit()
+                return builtin(*[self.walkTree(x) for x in args])
+
             try:
                 self.currentNode.append(node[1])
                 definition = getFromDict(self.env, self.currentNode + ['%def%'])
@@ -201,7 +304,7 @@ class Interpreter:
                 # comparing parameters satisfaction
                 if parameters is not None and node[2] is not None:
                     if len(parameters) is not len(node[2]) and isinstance(node[2][0], tuple):
-                        print('ParameterError: Given parameters don\'t match inputs')
+                        writeLine('ParameterError: Given parameters don\'t match inputs')
                         exit()
                     else:
                         if isinstance(node[2][0], tuple):
@@ -212,7 +315,10 @@ class Interpreter:
 
                         # set parameters as variables
 
+                self.functionDepths.append(len(self.currentNode))
                 self.walkTree(definition)
+                self.functionDepths.pop()
+                self.signal = None
                 res = getFromDict(self.env, self.currentNode + ["%return%"])
 
                 # deleting from scope
@@ -227,14 +333,20 @@ class Interpreter:
                 return res
 
             except LookupError as e:
-                print("LookupError -> Undefined function '%s'" % node[1])
+                writeLine("LookupError -> Undefined function '%s'" % node[1])
                 return -1
 
         if node[0] == 'return':
             res = self.walkTree(node[1])
-            setInDict(self.env, self.currentNode + ['%return%'], res)
+            function = self.currentNode[:self.functionDepths[-1]]
+            setInDict(self.env, function + ['%return%'], res)
+            self.signal = 'return'
             return res
 
+        if node[0] == 'break' or node[0] == 'continue':
+            self.signal = node[0]
+            return None
+
         # ===================================================
         # EXPRESSIONS
         # ===================================================
@@ -245,11 +357,11 @@ class Interpreter:
             # type checking
             if isinstance(res1, str):
                 if isinstance(res2, (int, float)):
-                    print(f"Type Error: Cannot do arithmetic operation On Type {type(res1)} and {type(res2)}")
+                    writeLine(f"Type Error: Cannot do arithmetic operation On Type {type(res1)} and {type(res2)}")
                     return -1
             elif isinstance(res2, str):
                 if isinstance(res1, (int, float)):
-                    print(f"Type Error: Cannot do arithmetic operation On Type {type(res1)} and {type(res2)}")
+                    writeLine(f"Type Error: Cannot do arithmetic operation On Type {type(res1)} and {type(res2)}")
                     return -1
 
             return res1 + res2
@@ -258,7 +370,7 @@ class Interpreter:
             res1 = self.walkTree(node[1])
             res2 = self.walkTree(node[2])
             if isinstance(res1, str) or isinstance(res2, str):
-                print(f'Type Error: cannot do subtraction of string type')
+                writeLine(f'Type Error: cannot do subtraction of string type')
                 return -1
             return res1 - res2
 
@@ -266,7 +378,7 @@ class Interpreter:
             res1 = self.walkTree(node[1])
             res2 = self.walkTree(node[2])
             if isinstance(res1, str) or isinstance(res2, str):
-                print(f'Type Error: cannot do subtraction of string type')
+                writeLine(f'Type Error: cannot do subtraction of string type')
                 return -1
             return res1 * res2
 
@@ -274,7 +386,7 @@ class Interpreter:
             res1 = self.walkTree(node[1])
             res2 = self.walkTree(node[2])
             if isinstance(res1, str) or isinstance(res2, str):
-                print(f'Type Error: cannot do subtraction of string type')
+                writeLine(f'Type Error: cannot do subtraction of string type')
                 return -1
             return res1 / res2
 
@@ -282,7 +394,7 @@ class Interpreter:
             res1 = self.walkTree(node[1])
             res2 = self.walkTree(node[2])
             if type(res1) == str or type(res2) == str:
-                print(f'Type Error: cannot do subtraction of string type')
+                writeLine(f'Type Error: cannot do subtraction of string type')
                 return -1
             return res1 % res2
 
@@ -305,17 +417,19 @@ class Interpreter:
 
                     # check if the loop is valid
                     if not isinstance(limit, int):
-                        print("TypeError: Cannot iterate of variable type: " + type(limit))
+                        writeLine("TypeError: Cannot iterate of variable type: " + type(limit))
                         exit()
 
                     # main logic of the loop
                     for iterator in range(iterator, limit):
                         setInDict(self.env, self.currentNode + [node[1][1][1]], iterator)
                         self.walkTree(node[2])
+                        if self.loopStopped():
+                            break
 
                 except LookupError as e:
                     if isinstance(node[1][2], str):
-                        print("LookupError: variable not found " + node[1][2])
+                        writeLine("LookupError: variable not found " + node[1][2])
                     exit()
 
                 deleteFromDict(self.env, self.currentNode)
@@ -331,15 +445,17 @@ class Interpreter:
 
                     # for loop is only for list and str
                     if not isinstance(node[1][2], (list, str)):
-                        print("TypeError: foreach loop is only for list or string type")
+                        writeLine("TypeError: foreach loop is only for list or string type")
                         exit()
 
                     for x in self.walkTree(('var', node[1][2])):
                         setInDict(self.env, self.currentNode + [node[1][1]], x)
                         self.walkTree(node[2])
+                        if self.loopStopped():
+                            break
 
                 except LookupError:
-                    print("LookupError: variable not found " + node[1][2])
+                    writeLine("LookupError: variable not found " + node[1][2])
                     sys.exit()
 
                 deleteFromDict(self.env, self.currentNode)
@@ -350,15 +466,22 @@ class Interpreter:
         # ===================================================
         if node[0] == 'print':
             res = self.walkTree(node[1])
-            print(str(res).replace('"', "").replace("'", ''))
+            writeLine(display(res))
 
         # ===================================================
         # LEN FOR STRINGS AND LISTS
         # ===================================================
         if node[0] == 'len':
             res = self.walkTree(node[1])
-            if isinstance(res, str) or isinstance(res, list):
+            if isinstance(res, str) or isinstance(res, LISTS):
                 return len(res)
             else:
-                print('TypeError: len() only accepts list and strings')
+                writeLine('TypeError: len() only accepts list and strings')
                 exit()
+
+        # ===================================================
+        # HOISTED EXPRESSIONS
+        # ===================================================
+        # the compiled engines keep the value, the walker works it out every time
+        if node[0] == 'hoisted':
+            return self.walkTree(node[2])
@@ -1,3 +1,8 @@
+import mmap
+import os
+import re
+from array import array
+
 from sly import Lexer
 
 
@@ -10,7 +15,7 @@ class SadeqLexer(Lexer):
     tokens = {ID, NUMBER, STRING, FLOAT,
               EQUAL, NEQUAL, GRT, SMT, GREQ, SMEQ,
               ASSIGN,
-              IF, ELSE, FOR, FOREACH, TO, IN, FUNC, RETURN,
+              IF, ELSE, FOR, FOREACH, TO, IN, FUNC, RETURN, BREAK, CONTINUE,
               PRINT, POP, PUSH, LEN}
 
     literals = {'+', '-', '*', '/', '(', ')', '{', '}', ";", "%", "[", ",", "]"}
@@ -20,7 +25,6 @@ class SadeqLexer(Lexer):
 
     # Regular expression rules for tokens
     ID = r'[a-zA-Z_][a-zA-Z0-9_]*'
-    STRING = r'[\"|\'].*?[\"|\']'
 
     EQUAL = r'=='
     NEQUAL = r'!='
@@ -44,6 +48,14 @@ class SadeqLexer(Lexer):
     ID['pop'] = POP
     ID['len'] = LEN
     ID['return'] = RETURN
+    ID['break'] = BREAK
+    ID['continue'] = CONTINUE
+
+    # the quotes only delimit a literal, its value is what is between them
+    @_(r'[\"|\'].*?[\"|\']')
+    def STRING(self, t):
+        t.value = t.value[1:-1]
+        return t
 
     @_(r'\d+\.\d+')
     def FLOAT(self, t):
@@ -56,10 +68,28 @@ class SadeqLexer(Lexer):
         t.value = int(t.value)
         return t
 
+    '''
+    tokens carry their line in lineno and their offset in index, the offset
+    every line starts at is kept in lineStarts so the column of a token is
+    found without storing it, offset is where the text being tokenized
+    starts in the whole input when it comes in chunks
+    '''
+    def tokenize(self, text, lineno=1, index=0, offset=0):
+        if offset == 0:
+            self.lineStarts = array('q', [0])
+        self.offset = offset
+        return super().tokenize(text, lineno, index)
+
+    # 1 based column of the character at offset on its line
+    def column(self, offset, lineno):
+        return offset - self.lineStarts[lineno - 1] + 1
+
     # Line number tracking
     @_(r'\n+')
     def newline(self, t):
-        self.lineno = t.value.count('\n')
+        self.lineno += len(t.value)
+        start = self.offset + t.index + 1
+        self.lineStarts.extend(range(start, start + len(t.value)))
         # token is discarded by default
 
     # Ignoring comments
@@ -81,11 +111,92 @@ def readFile(filename):
         print(f"failed to read file '{fn}' : \n" + str(e))
 
 
+# =================================================================
+# STREAMING THE INPUT FILE
+# =================================================================
+'''
+the file is memory mapped and handed to the lexer in chunks of about
+CHUNK_SIZE bytes, so neither the script nor its tokens are ever held
+whole. a chunk ends after a line break, or for a line longer than a
+chunk after a comma outside strings and comments, where no token can
+be cut in two
+'''
+CHUNK_SIZE = 1 << 20
+
+# what may hide a comma: strings as STRING matches them, and comments
+CUTS = re.compile(rb'[\"|\'][^\n]*?[\"|\']|#[^\n]*|,')
+
+
+def chunkEnd(view, start, chunkSize):
+    size = len(view)
+    limit = start + chunkSize
+    if limit >= size:
+        return size
+
+    newline = view.rfind(b'\n', start, limit)
+    if newline != -1:
+        return newline + 1
+
+    cut = -1
+    for match in CUTS.finditer(view, start):
+        if match.start() >= limit:
+            break
+        if match.end() - match.start() == 1 and view[match.start()] == 44:
+            cut = match.end()
+    if cut != -1:
+        return cut
+
+    # a single string or comment longer than a chunk, the line is kept whole
+    newline = view.find(b'\n', limit)
+    return size if newline == -1 else newline + 1
+
+
+def readChunks(filename, chunkSize=CHUNK_SIZE):
+    try:
+        f = open(filename, 'rb')
+    except OSError as e:
+        print(f"failed to read file '{filename}' : \n" + str(e))
+        return
+
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            start = 0
+            while start < len(view):
+                end = chunkEnd(view, start, chunkSize)
+                # the same newlines reading the file in text mode gives
+                yield view[start:end].decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+                start = end
+
+
+# tokens of a whole file, their index counts from the start of the file
+def tokenizeFile(lexer, filename, chunkSize=CHUNK_SIZE):
+    lineno = 1
+    offset = 0
+    for chunk in readChunks(filename, chunkSize):
+        lexer.lineno = lineno
+        for tok in lexer.tokenize(chunk, lineno, 0, offset):
+            tok.index += offset
+            tok.end += offset
+            yield tok
+        lineno = lexer.lineno
+        offset += len(chunk)
+
+
 # =================================================================
 # # PRODUCE STRING OUT OF TOKENS
 # =================================================================
+def formatToken(tok):
+    return 'type=%r, value=%r\n' % (tok.type, tok.value)
+
+
 def stringifyTokens(tokens):
-    output = ''
+    return ''.join(formatToken(tok) for tok in tokens)
+
+
+# passes the tokens on while writing them to a file, so one stream feeds the parser and tokens.txt
+def dumpTokens(tokens, out):
     for tok in tokens:
-        output += f'type=%r, value=%r' % (tok.type, tok.value) + '\n'
-    return output
+        out.write(formatToken(tok))
+        yield tok
@@ -0,0 +1,294 @@
+import operator
+from array import array
+
+'''
+lists of the language and the builtins that work on whole lists
+
+a list whose items are all ints or all floats is a NumberList, its items
+are kept in an array of machine numbers ('q' or 'd') instead of a python
+list of boxed ones. it prints, compares, indexes and iterates like a list,
+and the first item of another type turns its items into a python list in
+place, so every variable holding it sees the change. ints and floats are
+never mixed in one array, 1 and 1.0 print differently
+
+the builtins run when no user function of their name is defined:
+    sum(list)                   the sum of a list of numbers
+    min(list), max(list)        the smallest and largest item
+    map(list, op, value)        a new list of item op value, op one of '+' '-' '*' '/' '%'
+    slice(list, start, stop)    a new list of the items from start to stop
+they loop in C over the arrays, numpy, when it is installed, takes large
+lists where its results are the same as python's
+'''
+
+TYPECODES = {int: 'q', float: 'd'}
+
+INT_MAX = (1 << 63) - 1
+
+# lists shorter than this are not worth handing to numpy
+NUMPY_SIZE = 4096
+
+# numpy is optional, it is imported the first time a large list is mapped or summed
+numpy = None
+
+
+def importNumpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+    return numpy
+
+
+class NumberList:
+
+    __slots__ = ('items', 'kind')
+
+    def __init__(self, items):
+        # an array while every item has the type kind, a list with kind None after that
+        self.items = items
+        self.kind = (int if items.typecode == 'q' else float) if isinstance(items, array) else None
+
+    def generic(self):
+        if self.kind is not None:
+            self.items = list(self.items)
+            self.kind = None
+        return self.items
+
+    def append(self, value):
+        if type(value) is self.kind:
+            try:
+                self.items.append(value)
+                return
+            except OverflowError:
+                pass
+        elif self.kind is not None and not self.items and type(value) in TYPECODES:
+            self.items = array(TYPECODES[type(value)], (value,))
+            self.kind = type(value)
+            return
+        self.generic().append(value)
+
+    # the list appending every value one by one would leave
+    def extend(self, values):
+        if self.kind is not None and values:
+            kind = type(values[0])
+            if (kind is self.kind or not self.items and kind in TYPECODES) and all(type(x) is kind for x in values):
+                try:
+                    items = array(TYPECODES[kind], values)
+                except OverflowError:
+                    pass
+                else:
+                    if self.items:
+                        self.items.extend(items)
+                    else:
+                        self.items = items
+                        self.kind = kind
+                    return
+        self.generic().extend(values)
+
+    def pop(self):
+        return self.items.pop()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    # reads self.items every step, so a list turned generic while it is walked goes on where it was
+    def __iter__(self):
+        index = 0
+        try:
+            while True:
+                yield self.items[index]
+                index += 1
+        except IndexError:
+            return
+
+    def __repr__(self):
+        return repr(list(self.items))
+
+    __str__ = __repr__
+    __hash__ = None
+
+    def __eq__(self, other):
+        return list(self.items) == asPlain(other)
+
+    def __ne__(self, other):
+        return list(self.items) != asPlain(other)
+
+    def __lt__(self, other):
+        return list(self.items) < asPlain(other)
+
+    def __le__(self, other):
+        return list(self.items) <= asPlain(other)
+
+    def __gt__(self, other):
+        return list(self.items) > asPlain(other)
+
+    def __ge__(self, other):
+        return list(self.items) >= asPlain(other)
+
+    def __add__(self, other):
+        if isinstance(other, NumberList) and self.kind is not None and self.kind is other.kind:
+            return NumberList(self.items + other.items)
+        if isinstance(other, (list, NumberList)):
+            return makeList(list(self.items) + asPlain(other))
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return makeList(other + list(self.items))
+        return NotImplemented
+
+    def __mul__(self, count):
+        if type(count) is not int:
+            return NotImplemented
+        return NumberList(self.items * count)
+
+    __rmul__ = __mul__
+
+    def copy(self):
+        return NumberList(self.items[:])
+
+
+LISTS = (list, NumberList)
+
+
+def asPlain(value):
+    if isinstance(value, NumberList):
+        return list(value.items)
+    return value
+
+
+# the list a literal, push target or builtin result is kept in
+def makeList(values):
+    if not values:
+        return NumberList(array('q'))
+    kind = type(values[0])
+    if kind is not int and kind is not float:
+        return values
+    for x in values:
+        if type(x) is not kind:
+            return values
+    try:
+        return NumberList(array(TYPECODES[kind], values))
+    except OverflowError:
+        return values
+
+
+# =================================================================
+# BUILTINS
+# =================================================================
+def failed(message):
+    # s_output imports this module for LISTS
+    from s_output import writeLine
+    writeLine(message)
+    exit()
+
+
+def checkList(name, value):
+    if not isinstance(value, LISTS):
+        failed(f'TypeError: {name}() only accepts lists')
+    return value.items if isinstance(value, NumberList) else value
+
+
+def listSum(values):
+    items = checkList('sum', values)
+    if isinstance(items, array):
+        # int64 sums that can not overflow are left to numpy, float sums keep python's rounding
+        if items.typecode == 'q' and len(items) >= NUMPY_SIZE and importNumpy():
+            buffer = numpy.frombuffer(items, dtype=numpy.int64)
+            if max(-int(buffer.min()), int(buffer.max())) * len(items) <= INT_MAX:
+                return int(buffer.sum())
+        return sum(items)
+    for x in items:
+        if type(x) not in TYPECODES:
+            failed('TypeError: sum() only accepts lists of numbers')
+    return sum(items)
+
+
+def extreme(name, function):
+    def builtin(values):
+        items = checkList(name, values)
+        if not items:
+            failed(f'ValueError: {name}() of an empty list')
+        try:
+            return function(items)
+        except TypeError:
+            failed(f'TypeError: {name}() can not compare the items of the list')
+    return builtin
+
+
+MAP_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+}
+
+# operators numpy computes exactly as python does for two numbers of the same type
+NUMPY_OPERATORS = {'+': 'add', '-': 'subtract', '*': 'multiply'}
+
+
+def listMap(values, op, value):
+    items = checkList('map', values)
+    if op not in MAP_OPERATORS:
+        failed(f"TypeError: map() operator must be one of {', '.join(MAP_OPERATORS)}")
+    if type(value) not in TYPECODES:
+        failed('TypeError: map() only applies numbers')
+
+    if isinstance(items, array):
+        mapped = numpyMap(items, op, value)
+        if mapped is not None:
+            return mapped
+    else:
+        for x in items:
+            if type(x) not in TYPECODES:
+                failed('TypeError: map() only accepts lists of numbers')
+
+    function = MAP_OPERATORS[op]
+    return makeList([function(x, value) for x in items])
+
+
+# None when numpy is missing or could give another result than python
+def numpyMap(items, op, value):
+    if len(items) < NUMPY_SIZE or op not in NUMPY_OPERATORS:
+        return None
+    kind = int if items.typecode == 'q' else float
+    if type(value) is not kind or not importNumpy():
+        return None
+
+    buffer = numpy.frombuffer(items, dtype=numpy.int64 if kind is int else numpy.float64)
+    if kind is int:
+        # python ints never overflow, the bounds of the result must fit int64
+        low, high = int(buffer.min()), int(buffer.max())
+        function = MAP_OPERATORS[op]
+        bounds = [function(low, value), function(high, value)]
+        if max(-min(bounds), max(bounds)) > INT_MAX:
+            return None
+    result = getattr(numpy, NUMPY_OPERATORS[op])(buffer, value)
+    mapped = array(items.typecode)
+    mapped.frombytes(result.tobytes())
+    return NumberList(mapped)
+
+
+def listSlice(values, start, stop):
+    items = checkList('slice', values)
+    if type(start) is not int or type(stop) is not int:
+        failed('TypeError: slice() bounds must be ints')
+    if isinstance(items, array):
+        return NumberList(items[start:stop])
+    return makeList(items[start:stop])
+
+
+# arity and function of every builtin by name
+BUILTINS = {
+    'sum': (1, listSum),
+    'min': (1, extreme('min', min)),
+    'max': (1, extreme('max', max)),
+    'map': (3, listMap),
+    'slice': (3, listSlice),
+}
@@ -0,0 +1,201 @@
+from collections import Counter, OrderedDict
+
+from s_lists import BUILTINS, NumberList
+from s_optimizer import walkNodes
+from s_output import linesWritten
+from s_resolver import UNSET, asList
+from s_strings import Rope
+
+'''
+memoization of pure functions for the compiled engines
+
+a function is pure when its result only depends on its arguments: it does
+not print, it only pushes to and pops from lists it creates itself, it does
+not define functions, and every name it reads is a parameter, one of its
+own variables, or a name nothing outside it ever assigns. when the globals
+are given values before every run, as Program does with its inputs, a name
+it neither takes nor assigns is never pure, its value can change between
+runs that share the cache. language rules
+already keep it from writing to outer scopes. the functions it calls must
+be pure too and be defined exactly once, so the name always means them
+
+calls to a pure function go through an LRU cache of its definition keyed
+by the argument values, lists are compared by content and handed out as
+copies so callers can not change what the cache holds. a call that
+printed a runtime error, in it or in a function it called, is not kept,
+so the next call prints it again. tail calls go on in place as for any
+function, the result is kept for every memoized call of the chain
+'''
+
+# entries kept per function when no size is given
+MEMO_SIZE = 1024
+
+
+# =================================================================
+# PURITY
+# =================================================================
+# every name a subtree gives a value, with how many places do
+def assignments(node):
+    names = Counter()
+    for x in walkNodes(node):
+        if x[0] in ('var_assign', 'list_assign'):
+            names[x[1]] += 1
+        elif x[0] == 'func_def':
+            names[x[1]] += 1
+            names.update(asList(x[2]))
+        elif x[0] == 'foreach_loop':
+            names[x[1][1]] += 1
+    return names
+
+
+# the names of the functions a definition calls, or None when it can not be pure
+def purityCheck(definition, everywhere, seeded=False):
+    parameters = set(asList(definition[2]))
+    inside = assignments(definition[3])
+
+    def outer(name):
+        return everywhere[name] > inside[name]
+
+    # a name read that is not its own, its value may differ from call to call
+    def foreign(name):
+        return name not in parameters and (outer(name) or seeded and not inside[name])
+
+    # lists it makes itself, names every assignment inside gives a new list literal
+    literals = Counter(x[1] for x in walkNodes(definition[3]) if x[0] == 'list_assign')
+    created = {name for name, count in literals.items() if count == inside[name]}
+    calls = set()
+    for x in walkNodes(definition[3]):
+        kind = x[0]
+        if kind in ('print', 'func_def'):
+            return None
+        if kind in ('push', 'pop'):
+            if x[1] in parameters or x[1] not in created or outer(x[1]):
+                return None
+        elif kind in ('var', 'list_index'):
+            if foreign(x[1]):
+                return None
+        elif kind == 'foreach_loop':
+            if foreign(x[1][2]):
+                return None
+        elif kind == 'func_call':
+            if x[1] in parameters or x[1] in inside:
+                return None
+            calls.add(x[1])
+    return calls
+
+
+# builtins of s_lists are pure while no definition takes their name
+def callsPure(name, definitions, candidates, everywhere):
+    if name in definitions:
+        return id(definitions[name]) in candidates
+    return name in BUILTINS and not everywhere[name]
+
+
+# identities of the func_def nodes of a tree that are pure, seeded when its globals get values before it runs
+def pureFunctions(tree, seeded=False):
+    everywhere = assignments(tree)
+    definitions = {}
+    for x in walkNodes(tree):
+        if x[0] == 'func_def' and everywhere[x[1]] == 1:
+            definitions[x[1]] = x
+
+    candidates = {}
+    for x in walkNodes(tree):
+        if x[0] == 'func_def':
+            calls = purityCheck(x, everywhere, seeded)
+            if calls is not None:
+                candidates[id(x)] = calls
+
+    # a function stops being pure once a function it calls is not
+    changed = True
+    while changed:
+        changed = False
+        for identity, calls in list(candidates.items()):
+            if any(not callsPure(name, definitions, candidates, everywhere) for name in calls):
+                del candidates[identity]
+                changed = True
+    return set(candidates)
+
+
+# =================================================================
+# CACHE
+# =================================================================
+# values of different types never share an entry, 1 and 1.0 print differently
+def freeze(value):
+    if isinstance(value, (list, NumberList)):
+        return list, tuple(freeze(x) for x in value)
+    if isinstance(value, Rope):
+        return str, str(value)
+    return type(value), value
+
+
+def memoKey(values):
+    return tuple(freeze(x) for x in values)
+
+
+def copyValue(value):
+    if isinstance(value, list):
+        return [copyValue(x) for x in value]
+    if isinstance(value, NumberList):
+        return value.copy() if value.kind is not None else NumberList([copyValue(x) for x in value.items])
+    return value
+
+
+class MemoCache:
+
+    def __init__(self, name, size=MEMO_SIZE):
+        self.name = name
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # the cached result or UNSET
+    def get(self, key):
+        res = self.entries.get(key, UNSET)
+        if res is UNSET:
+            self.misses += 1
+            return UNSET
+        self.hits += 1
+        # a program shared by threads may have evicted it since
+        try:
+            self.entries.move_to_end(key)
+        except KeyError:
+            pass
+        return copyValue(res)
+
+    def put(self, key, res):
+        self.entries[key] = copyValue(res)
+        if len(self.entries) > self.size:
+            try:
+                self.entries.popitem(last=False)
+            except KeyError:
+                pass
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
+# pending holds (cache, key, lines written when the call started) for the memoized calls
+# a result comes back to, a call that printed an error leaves it out of its cache
+def storeResult(pending, res):
+    written = linesWritten()
+    for memo, key, start in pending:
+        if start == written:
+            memo.put(key, res)
+
+
+def memoReport(memos):
+    if not memos:
+        return 'memoization: no pure functions'
+
+    lines = [f'memoization: {len(memos)} pure functions']
+    for memo in memos:
+        calls = memo.hits + memo.misses
+        rate = f'{100 * memo.hits / calls:.1f}%' if calls else '-'
+        lines.append(f'  {memo.name:<20} hits {memo.hits:<8} misses {memo.misses:<8} hit rate {rate:<7}'
+                     f' evictions {memo.evictions:<6} entries {len(memo.entries)}/{memo.size}')
+    return '\n'.join(lines)
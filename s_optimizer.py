@@ -0,0 +1,544 @@
+import operator
+
+from s_resolver import asList
+
+'''
+rewrites the tuple tree of SadeqParser before it is executed
+
+level 1 folds arithmetic, len and comparisons of constants
+level 2 also drops if branches and fori loops that can never run and
+        statements after return, break and continue
+level 3 also hoists loop invariant expressions out of fori bodies
+
+a hoisted expression becomes ('hoisted', name, expr) where it was, and the
+names of the hoisted expressions of a loop are kept as a fourth element of
+its fori_loop node. the compiled engines give every name a slot in the
+loop scope, evaluate expr the first time they get to the node in a run of
+the loop and keep the value for the rest of the run when evaluating it
+printed nothing. the walker evaluates expr every time
+'''
+
+LEVELS = {
+    0: 'no optimization',
+    1: 'constant folding',
+    2: 'dead branch elimination',
+    3: 'loop invariant hoisting',
+}
+
+ARITHMETIC = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+}
+
+CONDITIONS = {
+    'condition_==': operator.eq,
+    'condition_!=': operator.ne,
+    'condition_>': operator.gt,
+    'condition_<': operator.lt,
+    'condition_>=': operator.ge,
+    'condition_<=': operator.le,
+}
+
+CONSTANTS = ('num', 'float', 'str')
+
+# statements nothing after them in the same block can run
+JUMPS = ('return', 'break', 'continue')
+
+# types of the values the hoisting evaluates an expression on
+VALUES = (int, float, str)
+
+# an expression the hoisting can not prove to run without an error
+UNSAFE = object()
+
+# an item of a list whose size is all that is known
+UNKNOWN = object()
+
+
+def constant(value):
+    if isinstance(value, str):
+        return 'str', value
+    if isinstance(value, float):
+        return 'float', value
+    return 'num', value
+
+
+def isConstant(node):
+    return isinstance(node, tuple) and node[0] in CONSTANTS
+
+
+# =================================================================
+# TREE QUERIES
+# =================================================================
+def walkNodes(node, intoFunctions=True):
+    if isinstance(node, list):
+        for x in node:
+            yield from walkNodes(x, intoFunctions)
+    elif isinstance(node, tuple) and node and isinstance(node[0], str):
+        yield node
+        if node[0] == 'func_def' and not intoFunctions:
+            return
+        for x in node[1:]:
+            yield from walkNodes(x, intoFunctions)
+
+
+# names a loop body may give a new value, function bodies assign their own scope
+def assignedNames(body):
+    names = set()
+    for node in walkNodes(body, intoFunctions=False):
+        if node[0] in ('var_assign', 'list_assign', 'func_def'):
+            names.add(node[1])
+        elif node[0] == 'foreach_loop':
+            names.add(node[1][1])
+    return names
+
+
+def mutatedLists(body):
+    return {node[1] for node in walkNodes(body) if node[0] in ('push', 'pop')}
+
+
+def hasCalls(body):
+    return any(node[0] == 'func_call' for node in walkNodes(body))
+
+
+# names a scope gives a value that is not a new list literal
+def boundNames(body):
+    names = set()
+    for node in walkNodes(body, intoFunctions=False):
+        if node[0] in ('var_assign', 'func_def'):
+            names.add(node[1])
+        elif node[0] == 'foreach_loop':
+            names.add(node[1][1])
+    return names
+
+
+# the expression an inner loop hoisted
+def unwrap(expr):
+    while expr[0] == 'hoisted':
+        expr = expr[2]
+    return expr
+
+
+'''
+the values variables are known to have after a statement, for the
+hoisting: a constant last assigned to a name, or for a list literal a
+list of its size whose items are unknown. any other statement may change
+any variable or list, through a call or an alias, and forgets them all
+'''
+def learn(values, statement):
+    kind = statement[0]
+    if kind == 'var_assign' and not hasCalls(statement[2]):
+        value = statement[2]
+        if isConstant(value) and type(value[1]) in VALUES:
+            values[statement[1]] = value[1]
+        else:
+            values.pop(statement[1], None)
+    elif kind == 'list_assign' and not hasCalls(statement[2]):
+        values[statement[1]] = [UNKNOWN] * len(asList(statement[2]))
+    elif kind != 'print' or hasCalls(statement[1]):
+        values.clear()
+
+
+# the values a nested block starts with, those of its names that are not assigned in it and no lists
+def inherited(values, node):
+    assigned = assignedNames(node)
+    return {name: value for name, value in values.items() if name not in assigned and type(value) is not list}
+
+
+class Optimizer:
+
+    # positions of s_positions are carried over to the nodes that replace the parsed ones
+    def __init__(self, level=3, positions=None):
+        if level not in LEVELS:
+            raise ValueError(f"unknown optimization level {level}, expected one of {tuple(LEVELS)}")
+
+        self.level = level
+        self.positions = positions
+        self.changes = []
+        self.hoisted = 0
+
+        # boundNames of the function or program being optimized
+        self.bound = set()
+
+    def note(self, level, message):
+        self.changes.append((LEVELS[level], message))
+
+    def report(self):
+        if not self.changes:
+            return 'optimizer: nothing changed'
+
+        lines = [f'optimizer level {self.level}: {len(self.changes)} changes']
+        for name, message in self.changes:
+            lines.append(f'  [{name}] {message}')
+        return '\n'.join(lines)
+
+    def optimize(self, tree):
+        if tree is None or self.level == 0:
+            return tree
+        self.bound = boundNames(tree)
+        return self.block(tree, {}) or None
+
+    # ===================================================
+    # STATEMENTS
+    # ===================================================
+    # values are what learn knows of the variables when the block starts
+    def block(self, node, values):
+        nodes = asList(node)
+        statements = []
+        for position, x in enumerate(nodes):
+            replaced = self.statement(x, values)
+            statements.extend(replaced)
+            for y in replaced:
+                self.carry(x, y)
+                learn(values, y)
+
+            if self.level >= 2 and statements and statements[-1][0] in JUMPS and position < len(nodes) - 1:
+                self.note(2, f"dropped statements after '{statements[-1][0]}'")
+                break
+        return statements
+
+    # the node keeps the position of the one it replaces unless it has one of its own
+    def carry(self, old, new):
+        if self.positions is not None and id(old) in self.positions:
+            self.positions.setdefault(id(new), (new,) + self.positions[id(old)][1:])
+        return new
+
+    # a statement becomes a list of statements, dropped branches leave none
+    def statement(self, node, values):
+        kind = node[0]
+
+        if kind in ('var_assign', 'push'):
+            return [(kind, node[1], self.expr(node[2]))]
+
+        if kind == 'list_assign':
+            items = node[2]
+            if isinstance(items, list):
+                items = [self.expr(x) for x in items]
+            elif items is not None:
+                items = self.expr(items)
+            return [(kind, node[1], items)]
+
+        if kind in ('print', 'return'):
+            return [(kind, self.expr(node[1]))]
+
+        if kind == 'func_def':
+            outer, self.bound = self.bound, boundNames(node[3])
+            body = self.block(node[3], {}) or None
+            self.bound = outer
+            return [(kind, node[1], node[2], body)]
+
+        if kind == 'if_stmt':
+            return self.ifStatement(node[1], values)
+
+        if kind == 'fori_loop':
+            return self.foriLoop(node, values)
+
+        if kind == 'foreach_loop':
+            return [(kind, node[1], self.block(node[2], inherited(values, node)) or None)]
+
+        if kind in ('break', 'continue', 'pop'):
+            return [node]
+
+        return [self.expr(node)]
+
+    def ifStatement(self, node, values):
+        branches = [(self.expr(node[1]), node[2])]
+        for branch in asList(node[3]):
+            if branch[0] == 'else_if':
+                branches.append((self.expr(branch[1]), branch[2]))
+            elif branch[0] == 'else':
+                branches.append((None, branch[1]))
+                break
+
+        kept = []
+        for condition, body in branches:
+            decided = self.decide(condition) if self.level >= 2 else None
+            if decided is False:
+                self.note(2, 'dropped a branch whose condition is always false')
+                continue
+            if decided is True:
+                if condition is not None:
+                    self.note(2, 'made a branch whose condition is always true unconditional')
+                kept.append((None, body))
+                break
+            kept.append((condition, body))
+
+        if not kept:
+            return []
+        if kept[0][0] is None:
+            # if shares the scope around it, so its body can take its place
+            return self.block(kept[0][1], values.copy())
+
+        elseIf = []
+        for condition, body in kept[1:]:
+            if condition is None:
+                elseIf.append(('else', self.block(body, inherited(values, body)) or None))
+            else:
+                elseIf.append(('else_if', condition, self.block(body, inherited(values, body)) or None))
+
+        first = kept[0]
+        return [('if_stmt', ('if', first[0], self.block(first[1], inherited(values, first[1])) or None, elseIf or None))]
+
+    # True or False when a condition is known before running, else None
+    def decide(self, condition):
+        if condition is None:
+            return True
+        if condition[0] in CONDITIONS and isConstant(condition[1]) and isConstant(condition[2]):
+            try:
+                return bool(CONDITIONS[condition[0]](condition[1][1], condition[2][1]))
+            except TypeError:
+                return None
+        return None
+
+    def foriLoop(self, node, values):
+        setup = node[1]
+        assign = setup[1]
+        start = self.expr(assign[2])
+        limit = self.expr(setup[2])
+        body = self.block(node[2], inherited(values, node))
+        hoists = list(node[3]) if len(node) > 3 else []
+
+        if (self.level >= 2 and start[0] == 'num' and limit[0] == 'num' and start[1] >= limit[1]
+                and not isinstance(start[1], bool)):
+            self.note(2, f"dropped the loop over '{assign[1]}' from {start[1]} to {limit[1]}")
+            return []
+
+        if self.level >= 3 and body:
+            body, hoists = self.hoist(assign[1], body, hoists, values)
+
+        loop = ('fori_loop', ('fori_loop_setup', ('var_assign', assign[1], start), limit), body or None)
+        if hoists:
+            loop += (hoists,)
+        return [loop]
+
+    # ===================================================
+    # LOOP INVARIANT HOISTING
+    # ===================================================
+    '''
+    an expression is hoisted when it can not change while the loop runs:
+    no variable it uses is assigned in the body, and a list it measures or
+    indexes can not grow or shrink. the body calls nothing then, and the
+    lists it pushes to or pops from were made by a list literal before the
+    loop under names no other list is ever put in, or the list is only
+    named by its own list literals or not assigned at all, like a
+    parameter, so it is never one of them
+
+    a hoisted expression stays where it is, as a hoisted node, and is
+    worked out there the first time the loop run gets to it. its value is
+    kept in a slot of the loop scope for the rest of the run unless it
+    printed an error, so every line is printed as before. one whose value
+    is known from the values learn knows before the loop is folded instead
+    '''
+    def hoist(self, iterator, body, hoists, values):
+        assigned = assignedNames(body) | {iterator}
+        mutated = mutatedLists(body)
+        calls = hasCalls(body)
+        # lists made by a literal before the loop, in the same scope
+        owned = {name for name, value in values.items() if type(value) is list}
+        known = {}
+
+        # a list the body can not change through its name or any other
+        def unchanged(name):
+            if calls or name in mutated:
+                return False
+            return not mutated or name not in self.bound and mutated <= owned and not mutated & self.bound
+
+        # the value of the expression on the known values, UNKNOWN for an item of a list, or UNSAFE
+        def evaluate(expr):
+            kind = expr[0]
+            if kind in CONSTANTS:
+                return expr[1] if type(expr[1]) in VALUES else UNSAFE
+            if kind == 'var':
+                return values.get(expr[1], UNSAFE) if expr[1] not in assigned else UNSAFE
+            if kind in ARITHMETIC or kind in CONDITIONS:
+                left, right = evaluate(expr[1]), evaluate(expr[2])
+                if type(left) not in VALUES or type(right) not in VALUES:
+                    return UNSAFE
+                # the engines add strings to strings only and do no other arithmetic on them
+                if kind in ARITHMETIC and str in (type(left), type(right)) and (kind != '+' or type(left) is not type(right)):
+                    return UNSAFE
+                try:
+                    return (ARITHMETIC.get(kind) or CONDITIONS[kind])(left, right)
+                except (ArithmeticError, TypeError):
+                    return UNSAFE
+            if kind == 'len':
+                inner = evaluate(expr[1])
+                if type(inner) is str or type(inner) is list and unchanged(unwrap(expr[1])[1]):
+                    return len(inner)
+                return UNSAFE
+            if kind == 'list_index':
+                items = evaluate(('var', expr[1]))
+                index = evaluate(expr[2])
+                if type(items) is list and unchanged(expr[1]) and type(index) is int and -len(items) <= index < len(items):
+                    return UNKNOWN
+                return UNSAFE
+            if kind == 'hoisted':
+                return evaluate(expr[2])
+            return UNSAFE
+
+        def invariant(expr):
+            kind = expr[0]
+            if kind in CONSTANTS:
+                return True
+            if kind == 'var':
+                return expr[1] not in assigned
+            if kind in ARITHMETIC or kind in CONDITIONS:
+                return invariant(expr[1]) and invariant(expr[2])
+            if kind == 'len':
+                inner = unwrap(expr[1])
+                if not invariant(inner):
+                    return False
+                if inner[0] == 'var':
+                    return type(evaluate(inner)) is str or unchanged(inner[1])
+                if inner[0] == 'list_index':
+                    # the item may be a list any name of the body holds
+                    return not mutated and not calls
+                # arithmetic makes numbers and strings
+                return True
+            if kind == 'list_index':
+                return expr[1] not in assigned and unchanged(expr[1]) and invariant(expr[2])
+            if kind == 'hoisted':
+                return invariant(expr[2])
+            return False
+
+        def replace(expr):
+            kind = expr[0]
+            if kind in CONSTANTS or kind == 'var':
+                return expr
+            # a condition is only ever the test of an if, its operands are hoisted
+            if kind not in CONDITIONS and invariant(expr):
+                value = evaluate(expr)
+                if type(value) in VALUES:
+                    self.note(3, f'folded {describe(expr)} to {value!r} in the loop over {iterator!r}')
+                    return self.carry(expr, constant(value))
+                if expr not in known:
+                    self.hoisted += 1
+                    known[expr] = f'%hoisted{self.hoisted}%'
+                    hoists.append(known[expr])
+                    self.note(3, f'hoisted {describe(expr)} out of the loop over {iterator!r}')
+                return self.carry(expr, ('hoisted', known[expr], expr))
+            if kind in ARITHMETIC or kind in CONDITIONS:
+                new = kind, replace(expr[1]), replace(expr[2])
+            elif kind == 'len':
+                new = kind, replace(expr[1])
+            elif kind == 'list_index':
+                new = kind, expr[1], replace(expr[2])
+            elif kind == 'hoisted':
+                new = kind, expr[1], replace(expr[2])
+            elif kind == 'func_call':
+                new = kind, expr[1], [replace(x) for x in asList(expr[2])] or None
+            else:
+                return expr
+            return self.carry(expr, new)
+
+        # function bodies are left alone, they do not run in the loop scope
+        def within(statement):
+            kind = statement[0]
+            if kind in ('var_assign', 'push'):
+                new = kind, statement[1], replace(statement[2])
+            elif kind == 'list_assign':
+                new = kind, statement[1], [replace(x) for x in asList(statement[2])] or None
+            elif kind in ('print', 'return'):
+                new = kind, replace(statement[1])
+            elif kind == 'if_stmt':
+                node = statement[1]
+                branches = []
+                for branch in asList(node[3]):
+                    if branch[0] == 'else_if':
+                        branches.append(self.carry(branch, ('else_if', replace(branch[1]), inside(branch[2]))))
+                    else:
+                        branches.append(self.carry(branch, ('else', inside(branch[1]))))
+                new = kind, self.carry(node, ('if', replace(node[1]), inside(node[2]), branches or None))
+            elif kind == 'fori_loop':
+                setup = statement[1]
+                start = self.carry(setup[1], ('var_assign', setup[1][1], replace(setup[1][2])))
+                new = (kind, self.carry(setup, ('fori_loop_setup', start, replace(setup[2]))),
+                       inside(statement[2])) + statement[3:]
+            elif kind == 'foreach_loop':
+                new = kind, statement[1], inside(statement[2])
+            elif kind == 'func_call':
+                new = replace(statement)
+            else:
+                return statement
+            return self.carry(statement, new)
+
+        def inside(nodes):
+            return [within(x) for x in asList(nodes)] or None
+
+        return [within(x) for x in body], hoists
+
+    # ===================================================
+    # EXPRESSIONS
+    # ===================================================
+    def expr(self, node):
+        return self.carry(node, self.rewrite(node))
+
+    def rewrite(self, node):
+        kind = node[0]
+
+        if kind in ARITHMETIC:
+            left = self.expr(node[1])
+            right = self.expr(node[2])
+            if isConstant(left) and isConstant(right):
+                folded = self.fold(kind, left[1], right[1])
+                if folded is not None:
+                    self.note(1, f'folded {describe((kind, left, right))} to {folded[1]!r}')
+                    return folded
+            return kind, left, right
+
+        if kind in CONDITIONS:
+            return kind, self.expr(node[1]), self.expr(node[2])
+
+        if kind == 'len':
+            inner = self.expr(node[1])
+            if inner[0] == 'str':
+                self.note(1, f'folded len({inner[1]})')
+                return 'num', len(inner[1])
+            return kind, inner
+
+        if kind == 'list_index':
+            return kind, node[1], self.expr(node[2])
+
+        if kind == 'func_call':
+            args = node[2]
+            if isinstance(args, list):
+                args = [self.expr(x) for x in args]
+            elif args is not None:
+                args = self.expr(args)
+            return kind, node[1], args
+
+        return node
+
+    # folds only what runs without a type error, those are reported at runtime
+    def fold(self, kind, left, right):
+        if kind == '+':
+            if isinstance(left, str) != isinstance(right, str):
+                return None
+        elif isinstance(left, str) or isinstance(right, str):
+            return None
+
+        try:
+            return constant(ARITHMETIC[kind](left, right))
+        except ZeroDivisionError:
+            return None
+
+
+def describe(node):
+    kind = node[0]
+    if kind in CONSTANTS:
+        return str(node[1])
+    if kind == 'var':
+        return node[1]
+    if kind in ARITHMETIC:
+        return f'({describe(node[1])} {kind} {describe(node[2])})'
+    if kind in CONDITIONS:
+        return f'({describe(node[1])} {kind[len("condition_"):]} {describe(node[2])})'
+    if kind == 'len':
+        return f'len({describe(node[1])})'
+    if kind == 'list_index':
+        return f'{node[1]}[{describe(node[2])}]'
+    if kind == 'hoisted':
+        return describe(node[2])
+    return kind
@@ -0,0 +1,119 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from s_lists import LISTS
+
+'''
+what print writes and where it goes
+
+the engines write every printed line with writeLine, in one write, to the
+output of the run or to sys.stdout when it has none. the output is held in
+a context variable, so runs on other threads or in other asyncio tasks each
+write to their own output and sys.stdout is never swapped. it takes the
+lines and the error messages of the run alike, in the order they were
+printed
+
+an OutputBuffer collects the lines and hands them to its stream in large
+writes instead of one write per line, once it holds size characters or
+interval seconds have passed since it last did, and when it is flushed or
+closed. without a stream it captures everything for getvalue, for
+programs that embed the language and for tests
+
+    Interpreter(tree, {}, output=OutputBuffer(sys.stdout, 1 << 16, interval=0.5))
+    captured = OutputBuffer()
+    Interpreter(tree, {}, output=captured)
+    captured.getvalue()
+'''
+
+# characters collected before they are written out
+BUFFER_SIZE = 1 << 16
+
+# where the current thread or task writes, None for sys.stdout
+OUTPUT = ContextVar('output', default=None)
+
+# lines written by the runs of a thread
+class Written(threading.local):
+    lines = 0
+
+
+written = Written()
+
+
+def writeLine(text):
+    written.lines += 1
+    output = OUTPUT.get()
+    if output is None:
+        output = sys.stdout
+    output.write(text + '\n')
+
+
+def linesWritten():
+    return written.lines
+
+
+# sends what the runs in this thread or task write to output
+@contextmanager
+def redirected(output):
+    token = OUTPUT.set(output)
+    try:
+        yield output
+    finally:
+        OUTPUT.reset(token)
+
+
+# the text print shows for a value, strings lost their quotes when they were lexed
+def display(value):
+    if type(value) is str:
+        return value
+    text = str(value)
+    if isinstance(value, LISTS):
+        # the repr of a list quotes its strings
+        return text.replace('"', '').replace("'", '')
+    return text
+
+
+class OutputBuffer:
+
+    '''
+    stream is written to with one write per flush and flushed itself, None
+    captures the output. interval is checked when something is written, a
+    run that goes quiet keeps what it has until its next line or its end
+    '''
+    def __init__(self, stream=None, size=BUFFER_SIZE, interval=None):
+        self.stream = stream
+        self.size = size
+        self.interval = interval
+        self.parts = []
+        self.pending = 0
+        self.written = 0
+        self.flushed = time.monotonic()
+
+    def write(self, text):
+        self.parts.append(text)
+        self.pending += len(text)
+        if self.stream is not None:
+            if self.pending >= self.size:
+                self.flush()
+            elif self.interval is not None and time.monotonic() - self.flushed >= self.interval:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        self.flushed = time.monotonic()
+        if self.stream is None or not self.parts:
+            return
+        text = ''.join(self.parts)
+        self.parts.clear()
+        self.written += self.pending
+        self.pending = 0
+        self.stream.write(text)
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+    def getvalue(self):
+        return ''.join(self.parts)
@@ -1,10 +1,101 @@
+import hashlib
+import inspect
+import marshal
 import os
+import sly
 from sly import Parser
-from treelib import Tree
-from treelib.exceptions import DuplicatedNodeIdError
 from s_lexer import SadeqLexer
 
 
+# =================================================================
+# PRE-GENERATED PARSE TABLES
+# =================================================================
+'''
+sly builds the LALR tables of a parser every time its class is created,
+which is most of what importing this module costs. they are kept in
+PARSE_TABLES with the sly version and the signature of the grammar they
+belong to and loaded from there, a changed grammar or another sly builds
+them again and rewrites the file. the tables are slotted in between the
+private steps of sly's Parser._build, when a step is missing or takes other
+parameters sly builds the tables itself as it always does
+'''
+PARSE_TABLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parsetab.marshal')
+
+
+class ParseTables:
+
+    def __init__(self, action, goto, defaulted):
+        self.lr_action = action
+        self.lr_goto = goto
+        self.defaulted_states = defaulted
+        self.sr_conflicts = []
+        self.rr_conflicts = []
+
+
+def grammarSignature(grammar):
+    parts = [str(grammar.Start), repr(sorted(grammar.Precedence.items()))]
+    parts.extend(f'{production} %prec {production.prec}' for production in grammar.Productions)
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+
+def loadTables(signature, fileName=PARSE_TABLES):
+    try:
+        with open(fileName, 'rb') as f:
+            version, saved, action, goto, defaulted = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != sly.__version__ or saved != signature:
+        return None
+    return ParseTables(action, goto, defaulted)
+
+
+def saveTables(signature, tables, fileName=PARSE_TABLES):
+    try:
+        with open(fileName, 'wb') as f:
+            marshal.dump((sly.__version__, signature, tables.lr_action, tables.lr_goto, tables.defaulted_states), f)
+    except OSError:
+        # a read only install keeps building them
+        pass
+
+
+# the private steps of sly's Parser._build with the parameters they take
+SLY_STEPS = {
+    '_Parser__collect_rules': ['definitions'],
+    '_Parser__validate_specification': [],
+    '_Parser__build_grammar': ['rules'],
+    '_Parser__build_lrtables': [],
+}
+
+
+def slyStepsMatch(parser=Parser):
+    for name, parameters in SLY_STEPS.items():
+        step = getattr(parser, name, None)
+        if step is None:
+            return False
+        try:
+            if list(inspect.signature(step).parameters) != parameters:
+                return False
+        except (TypeError, ValueError):
+            return False
+    return True
+
+
+# the steps of Parser._build with the LR tables read from PARSE_TABLES when they match
+def buildWithTables(cls, definitions):
+    rules = cls._Parser__collect_rules(definitions)
+    if not cls._Parser__validate_specification():
+        raise sly.yacc.YaccError('Invalid parser specification')
+    cls._Parser__build_grammar(rules)
+
+    signature = grammarSignature(cls._grammar)
+    tables = loadTables(signature)
+    if tables is None:
+        cls._Parser__build_lrtables()
+        saveTables(signature, cls._lrtable)
+    else:
+        cls._lrtable = tables
+
+
 class SadeqParser(Parser):
     # =================================================================
     # initializing and precedence
@@ -13,6 +104,9 @@ class SadeqParser(Parser):
     tokens = SadeqLexer.tokens
     # debugfile = 'OUTPUT\\parser.out'
 
+    if slyStepsMatch():
+        _build = classmethod(buildWithTables)
+
     # this is used to avoid ambiguity in the grammer
     precedence = (
         ('nonassoc', GRT, SMT, GREQ, SMEQ),  # non-associative operators (wrong: 3 < x < 5)
@@ -21,13 +115,30 @@ class SadeqParser(Parser):
         ('right', UMINUS),  # unary minus operator (ex: -4)
     )
 
-    # flattens adjacent statements
-    def flatten(self, S):
-        if not S:
-            return S
-        if isinstance(S[0], list):
-            return self.flatten(S[0]) + self.flatten(S[1:])
-        return S[:1] + self.flatten(S[1:])
+    '''
+    sequences of one item are the item itself and longer ones a list, every
+    reduction appends to the list its sequence is being built in, so a
+    sequence of n items costs O(n) and nothing recurses over its length
+    '''
+    @staticmethod
+    def extend(items, item):
+        if isinstance(items, list):
+            items.append(item)
+            return items
+        return [items, item]
+
+    # sly recovers from syntax errors, counting them keeps broken trees out of the cache
+    def parse(self, tokens):
+        self.errors = 0
+        # sly only creates its position tables once and would keep every parse in them,
+        # s_positions reads the ones of the last parse
+        self._line_positions = {}
+        self._index_positions = {}
+        return super().parse(tokens)
+
+    def error(self, token):
+        self.errors += 1
+        super().error(token)
 
     # defines the staring rule
     start = 'init'
@@ -37,7 +148,7 @@ class SadeqParser(Parser):
     # ============================================================================================
     @_('init statement')
     def init(self, p):
-        return self.flatten([p.init, p.statement])
+        return self.extend(p.init, p.statement)
 
     @_('statement')
     def init(self, p):
@@ -89,15 +200,28 @@ class SadeqParser(Parser):
     def statement(self, p):
         return 'return', p.expr
 
+    # a new tuple every time, a constant one would be shared and have a single position
+    @_('BREAK')
+    def statement(self, p):
+        return p.BREAK,
+
+    @_('CONTINUE')
+    def statement(self, p):
+        return p.CONTINUE,
+
     # ====================================================
     # IF ELSE STATEMENT
     @_('IF condition "{" init "}" el_if')
     def if_else(self, p):
-        return 'if', p.condition, p.init, p.el_if
+        el_if = p.el_if
+        if isinstance(el_if, list):
+            el_if.reverse()
+        return 'if', p.condition, p.init, el_if
 
+    # the chain is reduced from its end, so its list is built backwards and turned around by if_else
     @_('ELSE IF condition "{" init "}" el_if')
     def el_if(self, p):
-        return self.flatten([('else_if', p.condition, p.init), p.el_if])
+        return self.extend(p.el_if, ('else_if', p.condition, p.init))
 
     @_('ELSE "{" init "}"')
     def el_if(self, p):
@@ -130,13 +254,9 @@ class SadeqParser(Parser):
 
     # ====================================================
     # id_list
-    @_('ID "," id_list')
-    def id_list(self, p):
-        return self.flatten([p.ID, p.id_list])
-
-    @_('ID')
+    @_('ids')
     def id_list(self, p):
-        return p.ID
+        return p.ids
 
     @_('')
     def id_list(self, p):
@@ -144,13 +264,9 @@ class SadeqParser(Parser):
 
     # ====================================================
     # list_generate
-    @_('expr "," list_generate')
+    @_('exprs')
     def list_generate(self, p):
-        return self.flatten([p.expr, p.list_generate])
-
-    @_('expr')
-    def list_generate(self, p):
-        return p.expr
+        return p.exprs
 
     @_('')
     def list_generate(self, p):
@@ -158,18 +274,32 @@ class SadeqParser(Parser):
 
     # ====================================================
     # expression List
-    @_('expr "," expr_list')
+    @_('exprs')
     def expr_list(self, p):
-        return self.flatten([p.expr, p.expr_list])
-
-    @_('expr')
-    def expr_list(self, p):
-        return p.expr
+        return p.exprs
 
     @_('')
     def expr_list(self, p):
         return None
 
+    # ====================================================
+    # comma separated items, left recursive so they are appended in order
+    @_('ids "," ID')
+    def ids(self, p):
+        return self.extend(p.ids, p.ID)
+
+    @_('ID')
+    def ids(self, p):
+        return p.ID
+
+    @_('exprs "," expr')
+    def exprs(self, p):
+        return self.extend(p.exprs, p.expr)
+
+    @_('expr')
+    def exprs(self, p):
+        return p.expr
+
     # ====================================================
     # expressions
     @_('expr "+" expr',
@@ -220,59 +350,3 @@ class SadeqParser(Parser):
     @_('ID "(" expr_list ")"')
     def expr(self, p):
         return 'func_call', p.ID, p.expr_list
-
-
-# CREATING REPRESENTATION USING TREELIB
-# =================================================================
-def makeTree(parent, tree, myList):
-    # index is used to number the adjacent & similar functions
-    index = 0
-
-    for node in myList:
-
-        # base states
-        if node is None:
-            tree.create_node('none', parent + f' {tree.depth()} ' + str(node), parent)
-        elif isinstance(node, (int, str)):
-            tree.create_node(node, parent + f' {tree.depth()} ' + str(node), parent)
-
-        # recursively go in depth
-        elif isinstance(node[0], str):
-            depth = tree.depth(parent)
-
-            try:
-                nodeId = parent + f' {depth} ' + node[0]
-                tree.create_node(node[0], nodeId, parent)
-                makeTree(nodeId, tree, node[1:])
-
-            except DuplicatedNodeIdError:
-                '''
-                triggers for 2 adjacent & similar nodes
-                for example when input is like this
-                print('sadeq')
-                print('sheikhi')
-                '''
-                index += 1
-                nodeId = parent + f'{depth}' + node[0] + " " + str(index)
-                tree.create_node(node[0], nodeId, parent)
-                makeTree(nodeId, tree, node[1:])
-        else:
-            # for nested adjacent nodes
-            makeTree(parent, tree, node)
-
-
-def makeTreeHandler(myList):
-    tree = Tree()
-    # creating base node
-    tree.create_node("PROGRAM", "program")
-
-    '''
-    the input functions accepts a list
-    if the input is not a list, make it one
-    '''
-    if not isinstance(myList, list):
-        myList = [myList]
-
-    # Recursive function to generate the treelib tree
-    makeTree('program', tree, myList)
-    return tree
\ No newline at end of file
@@ -0,0 +1,90 @@
+from array import array
+
+'''
+source positions of the tuple tree of SadeqParser, kept beside the tree
+instead of in its tuples so no node grows and no engine reads them while
+running
+
+a PositionTable holds the line and column of every node of a tree by its
+preorder index, the order nodes walks them in, as two arrays of unsigned
+ints, 0 where a node has no position. it is what the compile cache keeps
+
+the engines, the optimizer and the profiler look positions up by node
+while compiling, table.positions(tree) gives them a dict from id(node) to
+(node, line, column), holding the node keeps its id its own
+'''
+
+
+# every tuple node of a tree in preorder, lists are transparent
+def nodes(tree):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, tuple) and node and isinstance(node[0], str):
+            yield node
+            stack.extend(reversed(node[1:]))
+
+
+# the suffix of a runtime error raised by the node at position
+def where(position):
+    if position is None or not position[1]:
+        return ''
+    return f' (line {position[1]}, column {position[2]})'
+
+
+class PositionTable:
+
+    def __init__(self, lines=None, columns=None):
+        self.lines = lines if lines is not None else array('I')
+        self.columns = columns if columns is not None else array('I')
+
+    def __len__(self):
+        return len(self.lines)
+
+    # positions sly recorded for the last parse, its tree and the lexer that tokenized it
+    @classmethod
+    def fromParser(cls, parser, lexer, tree):
+        table = cls()
+        lineOf = parser._line_positions
+        indexOf = parser._index_positions
+        for node in nodes(tree):
+            line = lineOf.get(id(node))
+            if line:
+                table.lines.append(line)
+                table.columns.append(lexer.column(indexOf[id(node)][0], line))
+            else:
+                table.lines.append(0)
+                table.columns.append(0)
+        return table
+
+    # the table of a rewritten tree from the positions its nodes were given
+    @classmethod
+    def fromPositions(cls, tree, positions):
+        table = cls()
+        for node in nodes(tree):
+            position = positions.get(id(node))
+            table.lines.append(position[1] if position else 0)
+            table.columns.append(position[2] if position else 0)
+        return table
+
+    def positions(self, tree):
+        positions = {}
+        for index, node in enumerate(nodes(tree)):
+            if index < len(self.lines) and self.lines[index]:
+                positions[id(node)] = (node, self.lines[index], self.columns[index])
+        return positions
+
+    # ===================================================
+    # STORING
+    # ===================================================
+    def dump(self):
+        return self.lines.tobytes(), self.columns.tobytes()
+
+    @classmethod
+    def load(cls, data):
+        lines, columns = array('I'), array('I')
+        lines.frombytes(data[0])
+        columns.frombytes(data[1])
+        return cls(lines, columns)
@@ -0,0 +1,129 @@
+from time import perf_counter
+
+'''
+profiler of the closure engine, ClosureCompiler wraps the closures it
+compiles with the timers of a Profiler when it is given one and leaves
+them bare otherwise, so a run that is not profiled pays nothing
+
+three tables are kept, every entry holds calls, cumulative seconds, self
+seconds and how many runs of it are active:
+    kinds      every node by the name of its tuple, 'func_call', '+', ...
+    lines      every statement by the source line it starts on
+    functions  every user function and '<program>' for the top level
+
+self time is the time of a run minus the time of the runs of the same
+table inside it, cumulative time is only counted by the outermost of
+recursive runs so a recursive function is not counted once per depth
+
+the self time of every function is also kept by its call stack, the
+collapsed stacks 'program;f;g seconds' flamegraph tools read
+'''
+
+CALLS, CUMULATIVE, SELF, ACTIVE = range(4)
+
+
+def timer(entry, times, step):
+    clock = perf_counter
+
+    def timed(frame):
+        entry[CALLS] += 1
+        entry[ACTIVE] += 1
+        times.append(0.0)
+        start = clock()
+        try:
+            return step(frame)
+        finally:
+            elapsed = clock() - start
+            inner = times.pop()
+            entry[ACTIVE] -= 1
+            if not entry[ACTIVE]:
+                entry[CUMULATIVE] += elapsed
+            entry[SELF] += elapsed - inner
+            times[-1] += elapsed
+    return timed
+
+
+class Profiler:
+
+    # positions maps id(node) to (node, line, column) as PositionTable.positions makes it
+    def __init__(self, positions=None):
+        self.positions = positions or {}
+        self.kinds = {}
+        self.sourceLines = {}
+        self.functions = {}
+
+        # time of the inner runs of every active run, one stack per table
+        self.nodeTimes = [0.0]
+        self.lineTimes = [0.0]
+        self.callTimes = [0.0]
+
+        self.paths = ['']
+        self.stacks = {}
+
+    @staticmethod
+    def entry(table, key):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = [0, 0.0, 0.0, 0]
+        return entry
+
+    def node(self, node, step):
+        return timer(self.entry(self.kinds, node[0]), self.nodeTimes, step)
+
+    # statements the parser gave no line are left untimed
+    def statement(self, node, step):
+        position = self.positions.get(id(node))
+        if position is None:
+            return step
+        return timer(self.entry(self.sourceLines, position[1]), self.lineTimes, step)
+
+    def function(self, name, body):
+        entry = self.entry(self.functions, name)
+        times = self.callTimes
+        paths = self.paths
+        stacks = self.stacks
+        clock = perf_counter
+
+        def timed(frame):
+            path = f'{paths[-1]};{name}'
+            paths.append(path)
+            entry[CALLS] += 1
+            entry[ACTIVE] += 1
+            times.append(0.0)
+            start = clock()
+            try:
+                return body(frame)
+            finally:
+                elapsed = clock() - start
+                inner = times.pop()
+                entry[ACTIVE] -= 1
+                if not entry[ACTIVE]:
+                    entry[CUMULATIVE] += elapsed
+                entry[SELF] += elapsed - inner
+                times[-1] += elapsed
+                stacks[path] = stacks.get(path, 0.0) + elapsed - inner
+                paths.pop()
+        return timed
+
+    # ===================================================
+    # REPORTS
+    # ===================================================
+    def report(self, limit=20):
+        lines = []
+        for title, table in (('functions', self.functions), ('node kinds', self.kinds), ('source lines', self.sourceLines)):
+            lines.append(f'{title} by self time')
+            lines.append(f'  {"":<24}{"calls":>10}{"cumulative ms":>16}{"self ms":>12}')
+            ranked = sorted(table.items(), key=lambda item: item[1][SELF], reverse=True)
+            for key, entry in ranked[:limit]:
+                name = f'line {key}' if table is self.sourceLines else str(key)
+                lines.append(f'  {name:<24}{entry[CALLS]:>10}{entry[CUMULATIVE] * 1000:>16.3f}{entry[SELF] * 1000:>12.3f}')
+            if len(ranked) > limit:
+                lines.append(f'  ... {len(ranked) - limit} more')
+            lines.append('')
+        return '\n'.join(lines).rstrip() + '\n'
+
+    # one 'program;f;g microseconds' line per call stack, the input of flamegraph.pl and speedscope
+    def writeCollapsed(self, fileName):
+        with open(fileName, 'w') as f:
+            for path, seconds in sorted(self.stacks.items()):
+                f.write(f'{path[1:]} {round(seconds * 1e6)}\n')
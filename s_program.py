@@ -0,0 +1,210 @@
+import time
+
+from s_budget import Budget, BudgetExceeded
+from s_closure import deepStack
+from s_compiler import OPTIMIZATION_LEVEL
+from s_frames import Function
+from s_lexer import SadeqLexer, tokenizeFile
+from s_lists import NumberList, makeList
+from s_optimizer import Optimizer
+from s_output import redirected
+from s_parser import SadeqParser
+from s_positions import PositionTable
+from s_resolver import UNSET, newFrame
+from s_strings import Rope
+
+'''
+scripts compiled once and run as often as wanted, for programs that embed
+the language instead of running files through s_compiler.py
+
+    rule = Program("total = price * count\nif total > 100 { total = total * 0.9 }")
+    rule.run({'price': 2.5, 'count': 50}, ('total',))   # {'total': 112.5}
+
+a Program holds the optimized tree compiled for one engine, 'closure' or
+'vm', and nothing a run changes: every run gets a frame of its own seeded
+with copies of the inputs and prints to the output it is given, so one
+Program can be run by many threads at once. inputs are ints, floats, bools, strings and lists of them, outputs
+come back as the same python types, or None for a name the run never set.
+the caches of memoized functions are kept from run to run, a function
+that reads a global is not memoized as inputs may change it
+
+a script that stops at an error has printed it and raises ScriptError
+
+a Program of the vm can be run as a task of asyncio too, runAsync runs it
+TIME_SLICE seconds at a time and lets the other tasks of the loop have a
+turn in between, so thousands of scripts share one thread and a long one
+holds up none of the others. cancelling the task stops the run
+
+    await asyncio.gather(*(rule.runAsync(inputs) for inputs in requests))
+'''
+
+# seconds a run of runAsync goes on before the other tasks have their turn
+TIME_SLICE = 0.005
+
+
+class ScriptError(Exception):
+    pass
+
+
+def toScript(value):
+    kind = type(value)
+    if kind is int or kind is float or kind is bool or kind is str:
+        return value
+    if isinstance(value, (list, tuple, NumberList)):
+        return makeList([toScript(x) for x in value])
+    raise TypeError(f'a {kind.__name__} can not be an input of a script')
+
+
+def fromScript(value):
+    if isinstance(value, NumberList):
+        return list(value.items)
+    if isinstance(value, list):
+        return [fromScript(x) for x in value]
+    if isinstance(value, Rope):
+        return str(value)
+    return value
+
+
+class Program:
+
+    MODES = ('closure', 'vm')
+
+    def __init__(self, source=None, mode='closure', level=OPTIMIZATION_LEVEL, memoize=0, path=None):
+        if mode not in self.MODES:
+            raise ValueError(f"unknown program mode '{mode}', expected one of {self.MODES}")
+        lexer = SadeqLexer()
+        parser = SadeqParser()
+        tree = parser.parse(tokenizeFile(lexer, path) if path is not None else lexer.tokenize(source or ''))
+        if parser.errors:
+            raise ScriptError(f'{parser.errors} syntax errors in {path or "the script"}')
+
+        positions = PositionTable.fromParser(parser, lexer, tree).positions(tree)
+        optimizer = Optimizer(level, positions)
+        tree = optimizer.optimize(tree)
+        self.report = optimizer.report()
+        self.mode = mode
+
+        # the compilers print errors like break outside a loop and exit
+        try:
+            if mode == 'vm':
+                from s_bytecode import compileTree, memoCaches
+                self.code = compileTree(tree, memoize, positions, seeded=True)
+                self.memos = memoCaches(self.code)
+                self.slots = self.code.slots
+            else:
+                from s_closure import ClosureCompiler
+                compiler = ClosureCompiler(memoize, positions=positions, seeded=True)
+                self.body, self.slots = compiler.compileBody(tree)
+                self.memos = compiler.memos
+        except SystemExit:
+            raise ScriptError(f'{path or "the script"} can not be compiled, its output tells why') from None
+        self.size = len(self.slots)
+
+    @classmethod
+    def fromFile(cls, path, mode='closure', level=OPTIMIZATION_LEVEL, memoize=0):
+        return cls(mode=mode, level=level, memoize=memoize, path=path)
+
+    # the global variables of the script, inputs are read from these and outputs named by them
+    @property
+    def names(self):
+        return tuple(self.slots)
+
+    '''
+    inputs maps names to the values the script starts with, names it never
+    reads are ignored. outputs are the names whose values are returned,
+    when None every global the run set but its functions. budget is the
+    Budget of s_budget the run is held to, a run past it raises its
+    BudgetExceeded, None runs without limits. output is what the script
+    prints to, None prints to sys.stdout
+    '''
+    def run(self, inputs=None, outputs=None, budget=None, output=None):
+        budget = budget or Budget()
+        frame = self.frame(inputs, budget)
+        try:
+            with redirected(output):
+                if self.mode == 'vm':
+                    self.machine().execute(self.code, frame)
+                else:
+                    with deepStack(budget):
+                        self.body(frame)
+        except RecursionError:
+            raise BudgetExceeded('depth', None, budget.calls) from None
+        except SystemExit:
+            raise ScriptError('the script stopped at an error, its output tells which') from None
+        finally:
+            budget.stop()
+        return self.results(frame, outputs)
+
+    '''
+    run as a coroutine, for the vm only. the run goes on for timeSlice
+    seconds, at its next loop iteration or call after that, then waits a
+    turn of the event loop, and the seconds of its budget count only its
+    own slices. output is what the script prints to, None prints to
+    sys.stdout
+    '''
+    async def runAsync(self, inputs=None, outputs=None, budget=None, output=None, timeSlice=TIME_SLICE):
+        if self.mode != 'vm':
+            raise ValueError(f"mode '{self.mode}' can not run in slices, only 'vm' can")
+        import asyncio
+
+        budget = budget or Budget()
+        frame = self.frame(inputs, budget)
+        slices = self.machine().slices(self.code, frame)
+        try:
+            while True:
+                # the task has its own context, the tasks in between do not write here
+                try:
+                    with redirected(output):
+                        if runSlice(slices, time.monotonic() + timeSlice):
+                            break
+                except SystemExit:
+                    raise ScriptError('the script stopped at an error, its output tells which') from None
+                paused = time.monotonic()
+                await asyncio.sleep(0)
+                budget.waited(time.monotonic() - paused)
+        finally:
+            slices.close()
+            budget.stop()
+        return self.results(frame, outputs)
+
+    # the program frame of a new run, its inputs set
+    def frame(self, inputs, budget):
+        slots = self.slots
+        budget.start()
+        frame = newFrame(budget, self.size)
+        if inputs:
+            for name, value in inputs.items():
+                slot = slots.get(name)
+                if slot is not None:
+                    frame[slot] = toScript(value)
+        return frame
+
+    def machine(self):
+        from s_bytecode import VirtualMachine
+        machine = VirtualMachine()
+        machine.program = self.code
+        return machine
+
+    def results(self, frame, outputs):
+        slots = self.slots
+        if outputs is None:
+            return {name: fromScript(frame[slot]) for name, slot in slots.items()
+                    if frame[slot] is not UNSET and not isinstance(frame[slot], Function)}
+        values = {}
+        for name in outputs:
+            slot = slots.get(name)
+            value = frame[slot] if slot is not None else UNSET
+            values[name] = None if value is UNSET else fromScript(value)
+        return values
+
+    def memoReport(self):
+        from s_memo import memoReport
+        return memoReport(self.memos)
+
+
+# runs a vm run until its end, True, or until the slice is over
+def runSlice(slices, end):
+    for _ in slices:
+        if time.monotonic() >= end:
+            return False
+    return True
@@ -0,0 +1,158 @@
+'''
+static scope resolution for the compiled engines
+
+every program, function body, fori and foreach loop is a scope, the names
+assigned directly in a scope get numbered slots, and every variable use is
+bound ahead of time to the (depth, slot) pairs it may be found at
+
+at runtime a scope is a frame: a python list holding the parent frame at
+index 0 and the slot values after it, the program frame holds the Budget
+of its run there
+'''
+
+
+class Unset:
+
+    def __repr__(self):
+        return '<unset>'
+
+
+# value of a slot that has not been assigned yet
+UNSET = Unset()
+
+# the slot of a function scope its return statement stores the value in
+RETURN = '%return%'
+
+
+# the parser returns a single node instead of a list of one node
+def asList(node):
+    if node is None:
+        return []
+    if isinstance(node, list):
+        return [x for x in node if x is not None]
+    return [node]
+
+
+def newFrame(parent, size):
+    frame = [UNSET] * (size + 1)
+    frame[0] = parent
+    return frame
+
+
+class Scope:
+
+    def __init__(self, kind, parent=None, parameters=()):
+        self.kind = kind
+        self.parent = parent
+        self.slots = {}
+
+        # names that always hold a value while the scope is alive
+        self.certain = set()
+
+        for name in parameters:
+            self.declare(name, certain=True)
+
+    @property
+    def size(self):
+        return len(self.slots)
+
+    def declare(self, name, certain=False):
+        if name not in self.slots:
+            self.slots[name] = len(self.slots) + 1
+        if certain:
+            self.certain.add(name)
+        return self.slots[name]
+
+    # declaring the names assigned directly in this scope,
+    # loops and function bodies are scopes of their own
+    def collect(self, node):
+        for x in asList(node):
+            kind = x[0]
+            if kind in ('var_assign', 'list_assign', 'func_def'):
+                self.declare(x[1])
+            elif kind == 'if_stmt':
+                self.collect(x[1][2])
+                for branch in asList(x[1][3]):
+                    self.collect(branch[2] if branch[0] == 'else_if' else branch[1])
+
+    # how many parents the frames of this scope have before the program frame
+    def rootDepth(self):
+        scope = self
+        depth = 0
+        while scope.parent is not None:
+            scope = scope.parent
+            depth += 1
+        return depth
+
+    # the function or program scope around this one and how far out it is
+    def function(self):
+        scope = self
+        depth = 0
+        while scope.kind in ('fori', 'foreach'):
+            scope = scope.parent
+            depth += 1
+        return scope, depth
+
+    '''
+    a name assigned in an inner scope may not be set yet when it is read,
+    today's rules then continue the search outward, so every scope that
+    declares the name is a candidate, innermost first
+
+    returns the candidates and whether the last one is certain to be set,
+    names declared nowhere become global slots filled from the env
+    '''
+    def resolve(self, name):
+        candidates = []
+        scope = self
+        depth = 0
+        while scope is not None:
+            if name in scope.slots:
+                candidates.append((depth, scope.slots[name]))
+                if name in scope.certain:
+                    return tuple(candidates), True
+            if scope.parent is None and name not in scope.slots:
+                candidates.append((depth, scope.declare(name)))
+            scope = scope.parent
+            depth += 1
+        return tuple(candidates), False
+
+
+# nested functions keep the frame they are defined in alive after it returns
+def definesFunction(node):
+    if isinstance(node, list):
+        return any(definesFunction(x) for x in node)
+    if not isinstance(node, tuple) or not node:
+        return False
+    if node[0] == 'func_def':
+        return True
+    return any(definesFunction(x) for x in node[1:])
+
+
+# searching the candidate slots from the current frame outward
+def lookup(frame, candidates):
+    for depth, slot in candidates:
+        holder = frame
+        for _ in range(depth):
+            holder = holder[0]
+        value = holder[slot]
+        if value is not UNSET:
+            return value
+    return UNSET
+
+
+# =================================================================
+# GLOBALS
+# =================================================================
+# the program frame has no parent, the engines keep the Budget of s_budget there
+def globalFrame(slots, env, budget=None):
+    frame = newFrame(budget, len(slots))
+    for name, slot in slots.items():
+        if name in env:
+            frame[slot] = env[name]
+    return frame
+
+
+def storeGlobals(slots, frame, env):
+    for name, slot in slots.items():
+        if frame[slot] is not UNSET:
+            env[name] = frame[slot]
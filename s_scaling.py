@@ -0,0 +1,86 @@
+# ==========================================================================================
+# PARSER SCALING CHECK
+# ==========================================================================================
+import sys
+
+from s_lexer import SadeqLexer
+from s_parser import SadeqParser
+
+'''
+parses generated programs of growing size and checks the work per item
+stays flat. the python and builtin function calls made while lexing and
+parsing are counted, a parser that recurses or loops over what it built
+so far makes more calls per item with every step. the counts are the
+same on every machine and under any load, unlike times
+
+python s_scaling.py [largest statement count] [largest list length]
+'''
+
+# the calls per item of the largest input may be this many times the smallest
+TOLERANCE = 1.1
+
+
+# the result of work and the function calls it made
+def countCalls(work):
+    calls = 0
+
+    def profile(frame, event, arg):
+        nonlocal calls
+        if event == 'call' or event == 'c_call':
+            calls += 1
+
+    sys.setprofile(profile)
+    try:
+        result = work()
+    finally:
+        sys.setprofile(None)
+    return result, calls
+
+
+def statements(count):
+    lines = []
+    for i in range(count // 4):
+        lines.append(f'x{i % 100} = {i} * 2')
+        lines.append(f'if x{i % 100} > {i} {{ print(x{i % 100}) }} else if x{i % 100} == 0 {{ print(0) }}')
+        lines.append(f'push(L, x{i % 100})')
+        lines.append(f'f(x{i % 100}, {i}, "s")')
+    return 'L = []\n' + '\n'.join(lines) + '\n'
+
+
+def listLiteral(length):
+    return 'L = [' + ', '.join(str(i) for i in range(length)) + ']\nprint(len(L))\n'
+
+
+def check(name, make, sizes, count):
+    lexer = SadeqLexer()
+    parser = SadeqParser()
+    perItem = []
+    print(name)
+    for size in sizes:
+        script = make(size)
+        tree, calls = countCalls(lambda: parser.parse(lexer.tokenize(script)))
+
+        items = count(tree)
+        if items < size:
+            print(f'  {size} items parsed to {items}')
+            return False
+        perItem.append(calls / size)
+        print(f'  {size:>9} items {calls:>10} calls {calls / size:>8.2f} per item')
+
+    growth = perItem[-1] / perItem[0]
+    print(f'  calls per item grew {growth:.2f}x')
+    return growth <= TOLERANCE
+
+
+if __name__ == '__main__':
+    largestProgram = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    largestList = int(sys.argv[2]) if len(sys.argv) > 2 else 400000
+    sys.setrecursionlimit(1000)
+
+    linear = check('statements', statements, [largestProgram // 8, largestProgram // 4, largestProgram // 2, largestProgram],
+                   lambda tree: len(tree))
+    linear = check('list literal', listLiteral, [largestList // 8, largestList // 4, largestList // 2, largestList],
+                   lambda tree: len(tree[0][2])) and linear
+
+    print('linear' if linear else 'NOT LINEAR')
+    sys.exit(0 if linear else 1)
@@ -0,0 +1,473 @@
+# ==========================================================================================
+# SCRIPT SERVER
+# ==========================================================================================
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import socket
+import statistics
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from s_batch import MAX_OUTPUT, WARM_UP, WORKERS, CappedOutput, OutputLimit, ScriptTimeout, timedOut
+from s_budget import Budget, BudgetExceeded
+from s_cache import sourceHash
+from s_compiler import OPTIMIZATION_LEVEL
+from s_output import redirected
+from s_program import TIME_SLICE, Program, ScriptError, toScript
+
+'''
+a long running server that runs scripts for other programs, so they do
+not start python and parse a script for every evaluation
+
+requests and responses are json objects, one per line, over a unix socket
+or tcp. a request names the script by its source or its path, the inputs
+it starts with and the outputs wanted back. a path is only run when the
+server was started with a script root (--root) and it lies inside it,
+without one the server runs the sources it is sent and nothing else:
+
+    {"id": 1, "source": "y = x * 2", "inputs": {"x": 21}, "outputs": ["y"]}
+    {"id": 1, "ok": true, "outputs": {"y": 42}, "output": "", "cached": false, "ms": 0.41}
+
+"mode", "level", "timeout" (seconds), "steps" and "memory" (bytes) may be
+given too, the last two are limits of the Budget of s_budget the run is
+held to. {"op": "stats"} answers with the counters of the server. a failed
+request answers "ok": false with "status" timeout, output, budget, error
+or syntax and the output the script printed, a budget names the limit in
+"budget": {"kind": "steps", "limit": 1000, "used": 1001}. bad requests
+answer status request and the "error". every run answers the steps,
+seconds and memory it used in "usage"
+
+scripts run on a pool of worker processes, each keeps the Program of
+s_program of the scripts it last ran in an LRU cache keyed by the hash of
+the source, so a script is parsed once per worker and not per request.
+every run has a frame of its own, a timer of its worker stops it past its
+timeout, and requests of one connection run concurrently and are answered
+as they finish, matched by their id
+
+with --cooperative the scripts run on the event loop of the server instead,
+as tasks of Program.runAsync taking turns of --slice seconds, for many
+short scripts at once: a run costs a task and not a process, and a long
+one holds up none of the others. every script runs on the vm then, its
+timeout counts the seconds of its own turns and a cancelled server stops
+them all
+
+python s_server.py --unix /tmp/sadeq.sock
+python s_server.py --port 8765 --workers 4 --root scripts
+python s_server.py --port 8765 --cooperative --slice 0.002
+'''
+
+# programs every worker keeps
+CACHE_SIZE = 256
+
+# seconds a request may run when it does not say
+TIMEOUT = 5.0
+
+# longest request line read, scripts are sent whole
+LINE_LIMIT = 16 * 1024 * 1024
+
+# runs a cooperative server has in progress at once, the others wait their turn
+COOPERATIVE_RUNS = 4096
+
+# latencies the percentiles are taken over
+LATENCY_WINDOW = 10000
+
+
+# =================================================================
+# WORKERS
+# =================================================================
+# the compiled programs of the worker process by (hash, mode, level), least recently used first
+programs = OrderedDict()
+cacheSize = CACHE_SIZE
+
+
+def startWorker(size):
+    global cacheSize
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, timedOut)
+    cacheSize = size
+    with contextlib.redirect_stdout(CappedOutput(MAX_OUTPUT)):
+        Program(WARM_UP).run()
+
+
+def program(key, source, path, mode, level):
+    found = programs.get(key)
+    if found is not None:
+        programs.move_to_end(key)
+        return found, True
+    found = Program(source, mode, level, path=path)
+    programs[key] = found
+    if len(programs) > cacheSize:
+        programs.popitem(last=False)
+    return found, False
+
+
+def evaluate(key, source, path, mode, level, inputs, outputs, timeout, maxOutput, steps=None, memory=None):
+    output = CappedOutput(maxOutput)
+    budget = Budget(steps, None, memory)
+    timeout = timeout if hasattr(signal, 'setitimer') else 0
+    response = {'ok': False, 'cached': False}
+    # a ScriptError while compiling is a syntax error, while running an error of the script
+    failure = 'syntax'
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                compiled, response['cached'] = program(key, source, path, mode, level)
+                failure = 'error'
+                response['outputs'] = compiled.run(inputs, outputs, budget)
+                response['ok'] = True
+            finally:
+                if timeout:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+    except (ScriptError, SystemExit):
+        # an error of the language prints itself and exits, that must not end the worker or the server
+        response['status'] = failure
+    except ScriptTimeout:
+        response['status'] = 'timeout'
+    except BudgetExceeded as e:
+        response['status'] = 'budget'
+        response['budget'] = {'kind': e.kind, 'limit': e.limit, 'used': e.used}
+    except OutputLimit:
+        response['status'] = 'output'
+    except OSError as e:
+        response['status'], response['error'] = 'request', str(e)
+    except Exception as e:
+        response['status'], response['error'] = 'crash', type(e).__name__
+    response['output'] = output.getvalue()
+    if failure == 'error':
+        response['usage'] = budget.usage()
+    return response
+
+
+# evaluate as a task of the event loop, the timeout is a limit of the budget on the turns of the run
+async def evaluateCooperatively(key, source, path, level, inputs, outputs, timeout, maxOutput, steps, memory, timeSlice):
+    output = CappedOutput(maxOutput)
+    budget = Budget(steps, timeout or None, memory)
+    response = {'ok': False, 'cached': False}
+    failure = 'syntax'
+    try:
+        # sly and the lexer write to the streams themselves, compiling does not wait for the loop
+        with redirected(output), contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            compiled, response['cached'] = program(key, source, path, 'vm', level)
+        failure = 'error'
+        response['outputs'] = await compiled.runAsync(inputs, outputs, budget, output, timeSlice)
+        response['ok'] = True
+    except (ScriptError, SystemExit):
+        # an error of the language prints itself and exits, that must not end the worker or the server
+        response['status'] = failure
+    except BudgetExceeded as e:
+        if e.kind == 'seconds':
+            response['status'] = 'timeout'
+        else:
+            response['status'] = 'budget'
+            response['budget'] = {'kind': e.kind, 'limit': e.limit, 'used': e.used}
+    except OutputLimit:
+        response['status'] = 'output'
+    except OSError as e:
+        response['status'], response['error'] = 'request', str(e)
+    except Exception as e:
+        response['status'], response['error'] = 'crash', type(e).__name__
+    response['output'] = output.getvalue()
+    if failure == 'error':
+        response['usage'] = budget.usage()
+    return response
+
+
+# =================================================================
+# SERVER
+# =================================================================
+class Stats:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.failed = {}
+        self.hits = 0
+        self.misses = 0
+        self.running = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, response, seconds):
+        self.requests += 1
+        self.latencies.append(seconds)
+        if not response['ok']:
+            status = response.get('status', 'request')
+            self.failed[status] = self.failed.get(status, 0) + 1
+        if 'cached' in response:
+            if response['cached']:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def report(self):
+        uptime = time.perf_counter() - self.started
+        ordered = sorted(self.latencies)
+        report = {
+            'uptime': round(uptime, 3),
+            'requests': self.requests,
+            'failed': self.failed,
+            'running': self.running,
+            'throughput': round(self.requests / uptime, 3) if uptime else 0.0,
+            'cache_hits': self.hits,
+            'cache_misses': self.misses,
+            'cache_hit_rate': round(self.hits / (self.hits + self.misses), 4) if self.hits + self.misses else None,
+        }
+        if ordered:
+            report['latency_ms'] = {
+                'mean': round(statistics.mean(ordered) * 1000, 3),
+                'p50': round(ordered[len(ordered) // 2] * 1000, 3),
+                'p90': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))] * 1000, 3),
+                'p99': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+                'max': round(ordered[-1] * 1000, 3),
+            }
+        return report
+
+
+class ScriptServer:
+
+    '''
+    steps and memory are the limits of every run that does not give its
+    own, None leaves them off. cooperative runs the scripts on the event
+    loop in turns of timeSlice seconds instead of on the workers. root is
+    the directory the paths of requests are run from, None runs no paths
+    '''
+    def __init__(self, workers=WORKERS, cacheSize=CACHE_SIZE, timeout=TIMEOUT, maxOutput=MAX_OUTPUT, steps=None, memory=None,
+                 cooperative=False, timeSlice=TIME_SLICE, root=None):
+        self.workers = workers
+        self.cacheSize = cacheSize
+        self.timeout = timeout
+        self.maxOutput = maxOutput
+        self.steps = steps
+        self.memory = memory
+        self.cooperative = cooperative
+        self.timeSlice = timeSlice
+        self.root = os.path.realpath(root) if root is not None else None
+        self.stats = Stats()
+        self.pool = None
+        # requests handed to the pool at once, the others wait here instead of in its queue
+        self.slots = asyncio.Semaphore(COOPERATIVE_RUNS if cooperative else workers * 2)
+
+    def start(self):
+        global cacheSize
+        if self.cooperative:
+            # the server keeps the programs a worker would
+            cacheSize = self.cacheSize
+            return
+        self.pool = ProcessPoolExecutor(self.workers, initializer=startWorker, initargs=(self.cacheSize,))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    # the real path of a script under the root, links and '..' resolved, None for any other
+    def scriptPath(self, path):
+        if self.root is None:
+            return None
+        resolved = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, resolved]) != self.root:
+            return None
+        return resolved
+
+    async def handle(self, request):
+        if request.get('op') == 'stats':
+            return {'ok': True, 'stats': self.stats.report()}
+
+        source = request.get('source')
+        path = request.get('path')
+        if not isinstance(source, str) and not isinstance(path, str):
+            return {'ok': False, 'status': 'request', 'error': "a request needs a 'source' or a 'path'"}
+        mode = request.get('mode', 'closure')
+        if mode not in Program.MODES:
+            return {'ok': False, 'status': 'request', 'error': f"unknown mode '{mode}'"}
+        if self.cooperative:
+            mode = 'vm'
+        level = request.get('level', OPTIMIZATION_LEVEL)
+        inputs = request.get('inputs') or {}
+        outputs = request.get('outputs')
+        timeout = request.get('timeout', self.timeout)
+        if type(level) is not int or not isinstance(inputs, dict) or type(timeout) not in (int, float):
+            return {'ok': False, 'status': 'request', 'error': "'level' is an int, 'inputs' an object and 'timeout' a number"}
+        if outputs is not None and not (isinstance(outputs, list) and all(isinstance(x, str) for x in outputs)):
+            return {'ok': False, 'status': 'request', 'error': "'outputs' is a list of names"}
+        steps = request.get('steps', self.steps)
+        memory = request.get('memory', self.memory)
+        if any(limit is not None and type(limit) is not int for limit in (steps, memory)):
+            return {'ok': False, 'status': 'request', 'error': "'steps' and 'memory' are ints"}
+        try:
+            for value in inputs.values():
+                toScript(value)
+        except TypeError as e:
+            return {'ok': False, 'status': 'request', 'error': str(e)}
+
+        # a path is keyed by its name and modification time, a changed file is compiled again
+        if source is not None:
+            key = (sourceHash(source), mode, level)
+        else:
+            path = self.scriptPath(path)
+            if path is None:
+                return {'ok': False, 'status': 'request', 'error': "'path' is not under the script root of the server"}
+            try:
+                key = (os.path.abspath(path), os.stat(path).st_mtime_ns, mode, level)
+            except OSError as e:
+                return {'ok': False, 'status': 'request', 'error': str(e)}
+
+        if self.cooperative:
+            async with self.slots:
+                self.stats.running += 1
+                try:
+                    return await evaluateCooperatively(key, source, path, level, inputs, outputs, timeout,
+                                                       self.maxOutput, steps, memory, self.timeSlice)
+                finally:
+                    self.stats.running -= 1
+
+        loop = asyncio.get_running_loop()
+        async with self.slots:
+            self.stats.running += 1
+            pool = self.pool
+            try:
+                return await loop.run_in_executor(pool, evaluate, key, source, path, mode, level,
+                                                  inputs, outputs, timeout, self.maxOutput, steps, memory)
+            except BrokenProcessPool:
+                # a worker died, taking the script with it, the next requests get a new pool
+                if self.pool is pool:
+                    pool.shutdown(wait=False)
+                    self.start()
+                return {'ok': False, 'status': 'crash', 'error': 'the worker running the script died'}
+            finally:
+                self.stats.running -= 1
+
+    async def answer(self, line, writer, lock):
+        start = time.perf_counter()
+        request = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request is a json object')
+            response = await self.handle(request)
+        except ValueError as e:
+            response = {'ok': False, 'status': 'request', 'error': str(e)}
+        except Exception as e:
+            response = {'ok': False, 'status': 'crash', 'error': f'{type(e).__name__}: {e}'}
+        seconds = time.perf_counter() - start
+
+        if request.get('op') != 'stats':
+            self.stats.record(response, seconds)
+        response['ms'] = round(seconds * 1000, 3)
+        if 'id' in request:
+            response['id'] = request['id']
+        async with lock:
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+    async def connection(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # a line over the limit, the rest of the stream can not be trusted
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(self.answer(line, writer, lock))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def serve(self, unix=None, host='127.0.0.1', port=8765, ready=None):
+        self.start()
+        try:
+            if unix is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(unix)
+                server = await asyncio.start_unix_server(self.connection, unix, limit=LINE_LIMIT)
+            else:
+                server = await asyncio.start_server(self.connection, host, port, limit=LINE_LIMIT)
+            # interrupts and terminations stop serving and shut the workers down,
+            # only the main thread gets signals, a server on another thread is stopped by cancelling it
+            loop = asyncio.get_running_loop()
+            if threading.current_thread() is threading.main_thread():
+                with contextlib.suppress(NotImplementedError, RuntimeError):
+                    for number in (signal.SIGINT, signal.SIGTERM):
+                        loop.add_signal_handler(number, asyncio.current_task().cancel)
+            async with server:
+                if ready is not None:
+                    ready(server)
+                with contextlib.suppress(asyncio.CancelledError):
+                    await server.serve_forever()
+        finally:
+            self.close()
+            if unix is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(unix)
+
+
+# =================================================================
+# CLIENT
+# =================================================================
+# sends the requests over one connection and returns the responses in the order of the requests
+def query(requests, unix=None, host='127.0.0.1', port=8765):
+    if unix is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(unix)
+    else:
+        connection = socket.create_connection((host, port))
+    with connection, connection.makefile('rwb') as stream:
+        for number, request in enumerate(requests):
+            stream.write(json.dumps(dict(request, id=request.get('id', number))).encode() + b'\n')
+        stream.flush()
+        responses = {}
+        for _ in requests:
+            response = json.loads(stream.readline())
+            responses[response.get('id')] = response
+    return [responses.get(request.get('id', number)) for number, request in enumerate(requests)]
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description='runs scripts sent as line delimited json')
+    arguments.add_argument('--unix', help='unix socket to listen on instead of tcp')
+    arguments.add_argument('--host', default='127.0.0.1', help='tcp address to listen on')
+    arguments.add_argument('--port', type=int, default=8765, help='tcp port to listen on')
+    arguments.add_argument('--workers', type=int, default=WORKERS, help='worker processes')
+    arguments.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='programs every worker keeps')
+    arguments.add_argument('--timeout', type=float, default=TIMEOUT, help='seconds a request may run')
+    arguments.add_argument('--max-output', type=int, default=MAX_OUTPUT, help='characters a script may print')
+    arguments.add_argument('--max-steps', type=int, help='loop iterations and calls a request may make')
+    arguments.add_argument('--max-memory', type=int, help='bytes of lists and strings a request may build')
+    arguments.add_argument('--cooperative', action='store_true', help='run the scripts in turns on the event loop, not on workers')
+    arguments.add_argument('--slice', type=float, default=TIME_SLICE, help='seconds of a turn of a cooperative script')
+    arguments.add_argument('--root', help='directory scripts may be run from by path, none are without it')
+    options = arguments.parse_args(argv)
+
+    server = ScriptServer(options.workers, options.cache_size, options.timeout, options.max_output,
+                          options.max_steps, options.max_memory, options.cooperative, options.slice, options.root)
+    where = options.unix or f'{options.host}:{options.port}'
+    runs = 'in turns on the event loop' if options.cooperative else f'with {options.workers} workers'
+    try:
+        asyncio.run(server.serve(options.unix, options.host, options.port,
+                                 lambda _: print(f'serving on {where} {runs}', flush=True)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# ==========================================================================================
+# STARTUP BENCHMARK
+# ==========================================================================================
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+'''
+times how long fresh interpreter processes take to get going, every case
+runs in a new python process so nothing is already imported, the median
+of the runs is reported next to a bare python start for reference
+
+python s_startup.py [runs]
+'''
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+HELLO = "print('hello')"
+
+CASES = (
+    ('python', 'pass'),
+    ('import sly', 'import sly'),
+    ('import lexer and parser', 'import s_parser'),
+    ('import interpreter', 'import s_interpreter'),
+    ('import driver', 'import s_compiler'),
+    ('run hello', 'from s_lexer import SadeqLexer\n'
+                  'from s_parser import SadeqParser\n'
+                  'from s_interpreter import Interpreter\n'
+                  f'Interpreter(SadeqParser().parse(SadeqLexer().tokenize({HELLO!r})), {{}})'),
+    ('build parse tables', 'import s_parser, sly.yacc\n'
+                           'sly.yacc.LRTable(s_parser.SadeqParser._grammar)'),
+)
+
+
+def timeProcess(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=FOLDER, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def benchmark(runs=20):
+    # the first run writes the parse tables and the bytecode caches
+    for _, code in CASES:
+        timeProcess(code)
+
+    lines = [f'{"case":<26}{"median ms":>10}{"min ms":>10}']
+    for name, code in CASES:
+        times = [timeProcess(code) for _ in range(runs)]
+        lines.append(f'{name:<26}{statistics.median(times) * 1000:>10.1f}{min(times) * 1000:>10.1f}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    print(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,135 @@
+'''
+strings built up piece by piece, s = s + x in a loop
+
+python copies both sides of every + of two strings, a loop that keeps
+adding to the same string copies all of it every time. the compiled
+engines hand out a Rope instead once a sum of strings reaches ROPE_SIZE
+characters: its pieces are kept in a buffer and only joined when the
+text is needed, by print, comparisons, foreach or a python caller
+
+adding to a rope appends the piece to its buffer and gives a new rope one
+piece longer that shares it, so every rope still means the text it had
+when it was made. a rope added to after another one was made from it
+copies its text into a buffer of its own first
+
+a Rope acts as a str everywhere the language looks at values, len of a
+rope is its length without joining it and typeOf names it str in errors
+'''
+
+# characters a sum of two strings has before it becomes a rope
+ROPE_SIZE = 256
+
+# characters of small pieces joined into one chunk of the buffer
+CHUNK_SIZE = 4096
+
+
+class RopeBuffer:
+
+    __slots__ = ('chunks', 'tail', 'tailSize', 'size', 'text')
+
+    def __init__(self, text):
+        self.chunks = [text]
+        self.tail = []
+        self.tailSize = 0
+        self.size = len(text)
+        # the joined buffer while nothing was appended since
+        self.text = text
+
+    def append(self, piece):
+        self.tail.append(piece)
+        self.tailSize += len(piece)
+        self.size += len(piece)
+        self.text = None
+        if self.tailSize >= CHUNK_SIZE:
+            self.chunks.append(''.join(self.tail))
+            self.tail.clear()
+            self.tailSize = 0
+
+    def join(self):
+        if self.text is None:
+            if self.tail:
+                self.chunks.append(''.join(self.tail))
+                self.tail.clear()
+                self.tailSize = 0
+            self.text = ''.join(self.chunks)
+            self.chunks = [self.text]
+        return self.text
+
+
+class Rope:
+
+    __slots__ = ('buffer', 'length', 'text')
+
+    def __init__(self, buffer, length):
+        self.buffer = buffer
+        self.length = length
+        self.text = None
+
+    def __str__(self):
+        if self.text is None:
+            text = self.buffer.join()
+            self.text = text if len(text) == self.length else text[:self.length]
+        return self.text
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __len__(self):
+        return self.length
+
+    def __add__(self, other):
+        if type(other) is Rope:
+            other = str(other)
+        elif type(other) is not str:
+            return NotImplemented
+        buffer = self.buffer
+        if buffer.size != self.length:
+            # another rope grew the buffer past this one
+            buffer = RopeBuffer(str(self))
+        buffer.append(other)
+        return Rope(buffer, buffer.size)
+
+    def __radd__(self, other):
+        if type(other) is not str:
+            return NotImplemented
+        return concat(other, str(self))
+
+    def __iter__(self):
+        return iter(str(self))
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __eq__(self, other):
+        return str(self) == (str(other) if type(other) is Rope else other)
+
+    def __ne__(self, other):
+        return str(self) != (str(other) if type(other) is Rope else other)
+
+    def __lt__(self, other):
+        return str(self) < (str(other) if type(other) is Rope else other)
+
+    def __le__(self, other):
+        return str(self) <= (str(other) if type(other) is Rope else other)
+
+    def __gt__(self, other):
+        return str(self) > (str(other) if type(other) is Rope else other)
+
+    def __ge__(self, other):
+        return str(self) >= (str(other) if type(other) is Rope else other)
+
+
+STRINGS = (str, Rope)
+
+
+# the sum of two strings, a rope once it is long enough to be worth one
+def concat(left, right):
+    if len(left) + len(right) < ROPE_SIZE:
+        return left + right
+    rope = Rope(RopeBuffer(left), len(left))
+    return rope + right
+
+
+# the type errors name, a rope is a str to the language
+def typeOf(value):
+    return str if type(value) is Rope else type(value)
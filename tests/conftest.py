@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the modules of the language sit at the root of the repository, next to this folder
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,28 @@
+import os
+
+from s_interpreter import Interpreter
+from s_lexer import SadeqLexer
+from s_optimizer import Optimizer
+from s_output import OutputBuffer
+from s_parser import SadeqParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# every engine with the optimizer levels it is checked at
+ENGINES = ('walk', 'closure', 'vm')
+LEVELS = (0, 1, 2, 3)
+
+
+def parse(source):
+    return SadeqParser().parse(SadeqLexer().tokenize(source))
+
+
+# what a script prints, '<exit>' marks a run an error stopped
+def run(source, mode='closure', level=0, memoize=0, budget=None):
+    tree = Optimizer(level).optimize(parse(source))
+    output = OutputBuffer()
+    try:
+        Interpreter(tree, {}, mode=mode, memoize=memoize, output=output, budget=budget)
+    except SystemExit:
+        output.write('<exit>')
+    return output.getvalue()
@@ -0,0 +1,43 @@
+import pytest
+
+from helpers import run
+
+COMPILED = ('closure', 'vm')
+
+EVEN_ODD = '''function even(n) {
+    if n == 0 {
+        return 1
+    }
+    return odd(n - 1)
+}
+function odd(n) {
+    if n == 0 {
+        return 0
+    }
+    return even(n - 1)
+}
+print(even(100001))
+print(even(100001))
+'''
+
+FAILING = '''function f(s) {
+    return s - 1
+}
+function g(s) {
+    return f(s)
+}
+print(f("a"))
+print(f("a"))
+print(g("b"))
+print(g("b"))
+'''
+
+
+@pytest.mark.parametrize('mode', COMPILED)
+def test_memoized_functions_keep_their_tail_calls(mode):
+    assert run(EVEN_ODD, mode, memoize=64) == '0\n0\n'
+
+
+@pytest.mark.parametrize('mode', COMPILED)
+def test_calls_that_print_errors_print_them_every_time(mode):
+    assert run(FAILING, mode, memoize=64) == run(FAILING, mode) == 'Type Error: cannot do subtraction of string type\n-1\n' * 4
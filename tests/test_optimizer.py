@@ -0,0 +1,62 @@
+import pytest
+
+from helpers import ENGINES, LEVELS, parse, run
+from s_optimizer import Optimizer, walkNodes
+
+PARAMETERS = '''function f(x, n) {
+    r = []
+    for i = 0 to 3 {
+        push(r, len(x) * n + i)
+    }
+    return r
+}
+X = [1, 2]
+print(f(X, 10))
+'''
+
+ERRORS = '''L = [1, 2]
+s = "ab"
+for i = 0 to 3 {
+    print(i)
+    print(L[5] + 1)
+    print(s - 1)
+}
+'''
+
+
+def optimized(source, level=3):
+    optimizer = Optimizer(level)
+    return optimizer.optimize(parse(source)), optimizer
+
+
+def hoisted(tree):
+    return [node[2] for node in walkNodes(tree) if node[0] == 'hoisted']
+
+
+def test_expressions_over_parameters_are_hoisted():
+    tree, _ = optimized(PARAMETERS)
+    assert hoisted(tree) == [('*', ('len', ('var', 'x')), ('var', 'n'))]
+
+
+def test_known_values_are_folded_instead_of_hoisted():
+    tree, optimizer = optimized('k = 4\nfor i = 0 to 3 {\n    print(k * 2 + i)\n}')
+    assert not hoisted(tree)
+    assert ('num', 8) in walkNodes(tree)
+    assert 'folded (k * 2) to 8' in optimizer.report()
+
+
+def test_lists_a_parameter_may_be_are_not_measured():
+    tree, _ = optimized('function f(x, y) {\n    for i = 0 to 3 {\n        push(y, i)\n        print(len(x))\n    }\n}')
+    assert not hoisted(tree)
+
+
+@pytest.mark.parametrize('mode', ENGINES)
+def test_hoisted_parameters_print_the_same(mode):
+    assert run(PARAMETERS, mode, 3) == run(PARAMETERS, mode, 0) == '[20, 21, 22]\n'
+
+
+@pytest.mark.parametrize('level', LEVELS)
+@pytest.mark.parametrize('mode', ENGINES)
+def test_hoisted_expressions_that_fail_print_every_error(mode, level):
+    assert run(ERRORS, mode, level) == run(ERRORS, mode, 0)
+    assert run(ERRORS, mode, level).count('Index Error') == 3
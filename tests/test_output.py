@@ -0,0 +1,18 @@
+import pytest
+
+from helpers import ENGINES, run
+
+
+@pytest.mark.parametrize('mode', ENGINES)
+def test_strings_pushed_to_an_empty_list_print_without_quotes(mode):
+    assert run('R = []\npush(R, "s")\nprint(R)', mode) == '[s]\n'
+
+
+@pytest.mark.parametrize('mode', ENGINES)
+def test_a_number_list_given_a_string_prints_without_quotes(mode):
+    assert run('P = [1, 2]\npush(P, "x")\nprint(P)', mode) == '[1, 2, x]\n'
+
+
+@pytest.mark.parametrize('mode', ENGINES)
+def test_a_list_of_strings_prints_without_quotes(mode):
+    assert run('Q = ["a", "b"]\nprint(Q)', mode) == '[a, b]\n'
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+import sly
+from sly import Parser
+
+from helpers import ROOT, parse
+from s_parser import SadeqParser, slyStepsMatch
+
+
+def test_the_loaded_tables_are_the_ones_sly_builds():
+    built = sly.yacc.LRTable(SadeqParser._grammar)
+    assert SadeqParser._lrtable.lr_action == built.lr_action
+    assert SadeqParser._lrtable.lr_goto == built.lr_goto
+
+
+def test_a_missing_sly_step_falls_back_to_the_sly_build(monkeypatch):
+    assert slyStepsMatch()
+    monkeypatch.delattr(Parser, '_Parser__build_lrtables')
+    assert not slyStepsMatch()
+
+
+def test_a_sly_step_with_other_parameters_falls_back_to_the_sly_build(monkeypatch):
+    monkeypatch.setattr(Parser, '_Parser__build_grammar', classmethod(lambda cls, rules, start: None))
+    assert not slyStepsMatch()
+
+
+# a fresh interpreter where a step takes another parameter before s_parser is imported
+FALLBACK = """
+import sly
+step = sly.Parser._Parser__build_grammar.__func__
+sly.Parser._Parser__build_grammar = classmethod(lambda cls, productions: step(cls, productions))
+import s_parser
+assert '_build' not in vars(s_parser.SadeqParser)
+print(s_parser.SadeqParser().parse(s_parser.SadeqLexer().tokenize('x = [1, 2]\\nprint(len(x))')))
+"""
+
+
+def test_without_the_override_sly_builds_the_same_parser():
+    done = subprocess.run([sys.executable, '-c', FALLBACK], cwd=ROOT, capture_output=True, text=True)
+    assert done.returncode == 0, done.stderr
+    assert done.stdout == str(parse('x = [1, 2]\nprint(len(x))')) + '\n'
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+import pytest
+
+from s_output import OutputBuffer
+from s_program import Program
+
+LINES = 20000
+SCRIPT = f'for i = 0 to {LINES} {{\n    print(name)\n}}'
+
+
+@pytest.mark.parametrize('mode', Program.MODES)
+def test_runs_on_threads_print_to_their_own_output(mode):
+    program = Program(SCRIPT, mode)
+    outputs = {name: OutputBuffer() for name in 'abcd'}
+    threads = [threading.Thread(target=program.run, args=({'name': name}, (), None, output))
+               for name, output in outputs.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for name, output in outputs.items():
+        assert output.getvalue() == (name + '\n') * LINES
+
+
+def test_tasks_print_to_their_own_output():
+    program = Program(SCRIPT, 'vm')
+    outputs = {name: OutputBuffer() for name in 'abcd'}
+
+    async def runAll():
+        await asyncio.gather(*(program.runAsync({'name': name}, (), None, output, 0.0001)
+                               for name, output in outputs.items()))
+
+    asyncio.run(runAll())
+    for name, output in outputs.items():
+        assert output.getvalue() == (name + '\n') * LINES
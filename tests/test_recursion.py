@@ -0,0 +1,27 @@
+import pytest
+
+from helpers import run
+from s_budget import Budget, BudgetExceeded
+
+COMPILED = ('closure', 'vm')
+
+SUM = '''function sum(n) {
+    if n == 0 {
+        return 0
+    }
+    return n + sum(n - 1)
+}
+print(sum(DEPTH))
+'''
+
+
+@pytest.mark.parametrize('mode', COMPILED)
+def test_non_tail_recursion_thousands_deep(mode):
+    assert run(SUM.replace('DEPTH', '5000'), mode) == f'{5000 * 5001 // 2}\n'
+
+
+@pytest.mark.parametrize('mode', COMPILED)
+def test_the_depth_budget_still_stops_a_run(mode):
+    with pytest.raises(BudgetExceeded) as raised:
+        run(SUM.replace('DEPTH', '5000'), mode, budget=Budget(depth=1000))
+    assert raised.value.kind == 'depth'
@@ -0,0 +1,28 @@
+import glob
+import os
+
+import pytest
+
+from helpers import ENGINES, LEVELS, ROOT, run
+
+SAMPLES = sorted(glob.glob(os.path.join(ROOT, 'INPUT', '*.sa')))
+REFERENCE = {}
+
+
+# the walker on the unoptimized tree is what every other run must print
+def reference(path, source):
+    if path not in REFERENCE:
+        REFERENCE[path] = run(source, 'walk', 0)
+    return REFERENCE[path]
+
+
+@pytest.mark.parametrize('memoize', (0, 64))
+@pytest.mark.parametrize('level', LEVELS)
+@pytest.mark.parametrize('mode', ENGINES)
+@pytest.mark.parametrize('path', SAMPLES, ids=os.path.basename)
+def test_a_sample_prints_the_same_on_every_engine(path, mode, level, memoize):
+    with open(path) as file:
+        source = file.read()
+    expected = reference(path, source)
+    assert '<exit>' not in expected
+    assert run(source, mode, level, memoize) == expected
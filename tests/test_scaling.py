@@ -0,0 +1,9 @@
+from s_scaling import check, listLiteral, statements
+
+
+def test_parsing_statements_takes_the_same_calls_per_statement():
+    assert check('statements', statements, [500, 1000, 2000, 4000], lambda tree: len(tree))
+
+
+def test_parsing_a_list_literal_takes_the_same_calls_per_item():
+    assert check('list literal', listLiteral, [5000, 10000, 20000, 40000], lambda tree: len(tree[0][2]))
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from s_server import ScriptServer, query
+
+
+def handle(server, request):
+    return asyncio.run(server.handle(request))
+
+
+def test_paths_are_refused_without_a_script_root(tmp_path):
+    script = tmp_path / 'a.sa'
+    script.write_text('y = 1')
+    response = handle(ScriptServer(cooperative=True), {'path': str(script), 'outputs': ['y']})
+    assert response['status'] == 'request'
+
+
+def test_a_path_under_the_script_root_runs(tmp_path):
+    (tmp_path / 'a.sa').write_text('y = x * 2')
+    response = handle(ScriptServer(cooperative=True, root=str(tmp_path)), {'path': 'a.sa', 'inputs': {'x': 21}, 'outputs': ['y']})
+    assert response['ok'] and response['outputs'] == {'y': 42}
+
+
+def test_a_path_leading_out_of_the_script_root_is_refused(tmp_path):
+    root = tmp_path / 'root'
+    root.mkdir()
+    (tmp_path / 'b.sa').write_text('y = 1')
+    (root / 'link.sa').symlink_to(tmp_path / 'b.sa')
+    server = ScriptServer(cooperative=True, root=str(root))
+    for path in ('../b.sa', str(tmp_path / 'b.sa'), 'link.sa'):
+        assert handle(server, {'path': path, 'outputs': ['y']})['status'] == 'request'
+
+
+def test_a_server_serves_off_the_main_thread():
+    serving = {}
+    started = threading.Event()
+    failed = []
+
+    def ready(server):
+        serving['loop'] = asyncio.get_running_loop()
+        serving['task'] = asyncio.current_task()
+        serving['port'] = server.sockets[0].getsockname()[1]
+        started.set()
+
+    def serve():
+        try:
+            asyncio.run(ScriptServer(cooperative=True).serve(port=0, ready=ready))
+        except Exception as e:
+            failed.append(e)
+        started.set()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    started.wait(10)
+    try:
+        assert not failed
+        [response] = query([{'source': 'y = 2 + 3', 'outputs': ['y']}], port=serving['port'])
+        assert response['outputs'] == {'y': 5}
+    finally:
+        if 'task' in serving:
+            serving['loop'].call_soon_threadsafe(serving['task'].cancel)
+        thread.join(10)
+    assert not failed